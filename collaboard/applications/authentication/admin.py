@@ -1,5 +1,6 @@
 from django.contrib import admin
 
-from .models import CustomUser
+from .models import AccountDeletion, CustomUser
 
 admin.site.register(CustomUser)
+admin.site.register(AccountDeletion)
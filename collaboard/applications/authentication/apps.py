@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class AuthenticationConfig(AppConfig):
     name = "applications.authentication"
+
+    def ready(self) -> None:
+        from . import signals  # noqa: F401
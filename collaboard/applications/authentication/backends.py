@@ -0,0 +1,58 @@
+"""
+This module stores the authentication backend loading the signed in user from a
+short lived cache instead of the database on every request
+"""
+
+from typing import Any
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+
+from .. import caching
+from .models import CustomUser
+
+# Every concrete column, so cached rows rebuild complete users with `from_db`
+USER_FIELDS = [field.attname for field in CustomUser._meta.concrete_fields]
+
+user_cache = caching.VersionedCache(
+    "user",
+    max_entries=settings.USER_CACHE["LOCAL_MAX_ENTRIES"],
+    local_ttl=settings.USER_CACHE["LOCAL_TTL_SECONDS"],
+    timeout=settings.USER_CACHE["TIMEOUT_SECONDS"],
+)
+
+
+def invalidate_user(user_id: Any) -> None:
+    """
+    Drops a user from the cache, once a change to them is committed
+    :param user_id: Primary key of the user
+    """
+    user_cache.invalidate(str(user_id))
+
+
+def _load_user_row(user_id: Any) -> tuple[Any, ...] | None:
+    return CustomUser.objects.filter(pk=user_id).values_list(*USER_FIELDS).first()
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    `ModelBackend` whose `get_user`, run by `AuthenticationMiddleware` for each
+    request, is served from `user_cache`.
+    The row is cached rather than the instance, so every request gets its own
+    user object. Saves and deletes invalidate it (see `signals`); counter
+    updates don't, so `total_*` fields may lag by up to the cache timeout.
+    """
+
+    def get_user(self, user_id: Any) -> CustomUser | None:
+        try:
+            row = user_cache.get(str(user_id), lambda: _load_user_row(user_id))
+        except (ValueError, TypeError):
+            return None
+        if row is None:
+            return None
+        user = CustomUser.from_db(None, USER_FIELDS, row)
+        return user if self.user_can_authenticate(user) else None
+
+    async def aget_user(self, user_id: Any) -> CustomUser | None:
+        return await sync_to_async(self.get_user)(user_id)
@@ -0,0 +1,115 @@
+"""
+This module stores the bounded pool running password hashing off the event loop.
+PBKDF2 releases the GIL while it hashes, so threads hash on every core.
+The pool only accepts `MAX_PENDING` jobs (running or queued); past that,
+callers get `PoolSaturated` straight away and can answer with a 503 instead of
+queueing requests behind minutes of CPU work.
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .. import metrics
+
+rejected = metrics.counter(
+    "password_hashing_rejected_total", "Hashing jobs rejected, by operation"
+)
+hashing_seconds = metrics.histogram(
+    "password_hashing_seconds", "Time spent running a hashing job, by operation"
+)
+wait_seconds = metrics.histogram(
+    "password_hashing_wait_seconds", "Time a hashing job waited for a free worker"
+)
+
+
+class PoolSaturated(Exception):
+    """
+    Raised when the pool already holds `max_pending` jobs
+    """
+
+
+class HashingPool:
+    def __init__(self, workers: int, max_pending: int) -> None:
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="password-hashing"
+        )
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def _reserve(self, operation: str) -> None:
+        with self._lock:
+            if self._pending >= self.max_pending:
+                rejected.inc(operation=operation)
+                raise PoolSaturated(operation)
+            self._pending += 1
+
+    def _release(self) -> None:
+        with self._lock:
+            self._pending -= 1
+
+    async def run(
+        self, operation: str, function: Callable[..., Any], *args: Any
+    ) -> Any:
+        """
+        Runs `function(*args)` on a pool thread.
+        Database connections opened by the job are closed after it.
+        :param operation: Label used in metrics, e.g. "login"
+        :param function: Hashing work, e.g. `authenticate`
+        :return: The function's result
+        :raises PoolSaturated: If `max_pending` jobs are already running or queued
+        """
+        self._reserve(operation)
+        queued_at = time.perf_counter()
+
+        def job() -> Any:
+            started_at = time.perf_counter()
+            wait_seconds.observe(started_at - queued_at)
+            try:
+                return function(*args)
+            finally:
+                close_old_connections()
+                hashing_seconds.observe(
+                    time.perf_counter() - started_at, operation=operation
+                )
+
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, job)
+        finally:
+            self._release()
+
+
+_pool: HashingPool | None = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> HashingPool:
+    """
+    Gets the process wide pool, sized by `settings.PASSWORD_HASHING`
+    :return: The pool
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                config: dict[str, Any] = settings.PASSWORD_HASHING
+                _pool = HashingPool(config["WORKERS"], config["MAX_PENDING"])
+    return _pool
+
+
+pending = metrics.gauge(
+    "password_hashing_pending",
+    "Hashing jobs running or waiting for a worker",
+    function=lambda: get_pool().pending,
+)
@@ -0,0 +1,81 @@
+"""
+Benchmarks login throughput through the password hashing pool under concurrent load
+"""
+
+import asyncio
+import json
+import os
+import statistics
+import time
+from typing import Any
+
+from django.contrib.auth.hashers import check_password, make_password
+from django.core.management.base import BaseCommand, CommandParser
+
+from ...hashing import HashingPool, PoolSaturated
+
+PASSWORD = "benchmark-password"
+
+
+class Command(BaseCommand):
+    help = (
+        "Verifies a password (the CPU bound part of `login_user`) `--requests` "
+        "times with `--concurrency` requests in flight, and reports logins per "
+        "second, per core, latency and rejections for each pool size."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        cores = os.cpu_count() or 1
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument("--concurrency", type=int, default=4 * cores)
+        parser.add_argument("--workers", type=int, nargs="+", default=[1, cores])
+        parser.add_argument("--max-pending", type=int, default=64)
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        encoded = make_password(PASSWORD)
+        for workers in options["workers"]:
+            pool = HashingPool(workers, options["max_pending"])
+            report = asyncio.run(
+                self._run(pool, encoded, options["requests"], options["concurrency"])
+            )
+            self.stdout.write(json.dumps(report))
+
+    @staticmethod
+    async def _run(
+        pool: HashingPool, encoded: str, requests: int, concurrency: int
+    ) -> dict[str, Any]:
+        latencies: list[float] = []
+        rejected = 0
+        remaining = iter(range(requests))
+
+        async def client() -> None:
+            nonlocal rejected
+            for _ in remaining:
+                start = time.perf_counter()
+                try:
+                    await pool.run("benchmark", check_password, PASSWORD, encoded)
+                except PoolSaturated:
+                    rejected += 1
+                    continue
+                latencies.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+        latencies.sort()
+        throughput = len(latencies) / elapsed
+        return {
+            "workers": pool.workers,
+            "cores": os.cpu_count(),
+            "concurrency": concurrency,
+            "logins": len(latencies),
+            "rejected": rejected,
+            "logins_per_second": round(throughput, 1),
+            "logins_per_second_per_worker": round(throughput / pool.workers, 1),
+            "p50_ms": round(statistics.median(latencies), 2) if latencies else None,
+            "p95_ms": (
+                round(latencies[int(len(latencies) * 0.95) - 1], 2)
+                if latencies
+                else None
+            ),
+        }
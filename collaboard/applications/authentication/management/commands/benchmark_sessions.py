@@ -0,0 +1,89 @@
+"""
+Benchmarks session engines, reporting database round trips and latency per operation
+"""
+
+import statistics
+import time
+from importlib import import_module
+from typing import Any, Callable
+
+from django.contrib.sessions.backends.base import SessionBase
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+ENGINES = [
+    "django.contrib.sessions.backends.db",
+    "django.contrib.sessions.backends.cached_db",
+    "applications.session_store",
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs what a request does to its session (create, load, save unchanged, "
+        "save changed) against each engine. Database writes are rolled back; "
+        "write-behind batches aren't flushed, so they don't count here."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--repeat", type=int, default=200)
+        parser.add_argument("--engines", nargs="+", default=ENGINES)
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        for engine in options["engines"]:
+            store_class: type[SessionBase] = import_module(engine).SessionStore
+            with transaction.atomic():
+                self._benchmark(engine, store_class, options["repeat"])
+                transaction.set_rollback(True)
+
+    def _benchmark(
+        self, engine: str, store_class: type[SessionBase], repeat: int
+    ) -> None:
+        keys: list[str] = []
+
+        def create() -> None:
+            store = store_class()
+            store["participant"] = {"meeting_id": "benchmark", "name": "Bench"}
+            store.save()
+            keys.append(store.session_key)
+
+        def load() -> None:
+            store_class(keys[0]).load()
+
+        def save_unchanged() -> None:
+            store = store_class(keys[0])
+            store.set_expiry(0)  # what `login_user` does on every login
+            store.save()
+
+        def save_changed() -> None:
+            store = store_class(keys[0])
+            store["counter"] = time.perf_counter()
+            store.save()
+
+        try:
+            for label, operation in (
+                ("create", create),
+                ("load", load),
+                ("save unchanged", save_unchanged),
+                ("save changed", save_changed),
+            ):
+                self._report(f"{engine} {label}", operation, repeat)
+        finally:
+            for key in keys:
+                store_class(key).delete()
+
+    def _report(self, label: str, run: Callable[[], None], repeat: int) -> None:
+        round_trips: list[int] = []
+        durations: list[float] = []
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                run()
+                durations.append((time.perf_counter() - start) * 1000)
+            round_trips.append(len(queries))
+        self.stdout.write(
+            f"{label}: {statistics.mean(round_trips):.1f} queries/op, "
+            f"p50 {statistics.median(durations):.3f} ms, "
+            f"max {max(durations):.3f} ms"
+        )
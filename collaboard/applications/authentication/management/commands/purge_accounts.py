@@ -0,0 +1,36 @@
+"""
+Runs the deleted account purger in the foreground, or reports its progress
+"""
+
+import json
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandParser
+
+from ... import purge
+
+
+class Command(BaseCommand):
+    help = (
+        "Purges the data of deleted accounts, one chunk per transaction, until "
+        "interrupted. Use --once to finish every pending purge and exit, "
+        "--status to print the pending purges and their progress."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--once", action="store_true")
+        parser.add_argument("--status", action="store_true")
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        if options["status"]:
+            self.stdout.write(json.dumps(purge.pending(), indent=2, default=str))
+            return
+        purger = purge.get_purger()
+        if options["once"]:
+            total = 0
+            while deleted := purger.purge():
+                total += deleted
+                self.stdout.write(f"{total} rows deleted")
+            self.stdout.write(f"Purged {total} rows")
+            return
+        purger.run()
@@ -0,0 +1,35 @@
+"""
+Runs the email sender in the foreground, or reports the queue's health
+"""
+
+import json
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandParser
+
+from .... import mail
+
+
+class Command(BaseCommand):
+    help = (
+        "Sends queued emails until interrupted. "
+        "Use --once to drain the queue (retries that aren't due stay queued) "
+        "and exit, --stats to print metrics."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--once", action="store_true")
+        parser.add_argument("--stats", action="store_true")
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        sender = mail.get_sender()
+        if options["stats"]:
+            self.stdout.write(json.dumps(mail.stats(), indent=2))
+            return
+        if options["once"]:
+            total = 0
+            while claimed := sender.send():
+                total += claimed
+            self.stdout.write(f"Processed {total} emails")
+            return
+        sender.run()
@@ -0,0 +1,41 @@
+# Generated by Django 6.0 on 2026-10-17 16:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("authentication", "0003_remove_customuser_is_verified"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AccountDeletion",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "user_id",
+                    models.BigIntegerField(
+                        help_text="The deleted user, kept once their row is gone",
+                        unique=True,
+                    ),
+                ),
+                (
+                    "rows_deleted",
+                    models.JSONField(
+                        default=dict, help_text="Rows purged so far, by model label"
+                    ),
+                ),
+                ("requested_at", models.DateTimeField(auto_now_add=True)),
+                ("completed_at", models.DateTimeField(null=True)),
+            ],
+        ),
+    ]
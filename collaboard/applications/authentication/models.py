@@ -76,3 +76,23 @@ class CustomUser(AbstractUser):
 
     def __str__(self) -> str:
         return f"{self.first_name} {self.last_name}"
+
+
+class AccountDeletion(models.Model):
+    """
+    A deleted account whose data is being purged in the background (see
+    `purge`). It outlives the user row, as a record of the purge.
+    """
+
+    user_id = models.BigIntegerField(
+        unique=True, help_text="The deleted user, kept once their row is gone"
+    )
+    rows_deleted = models.JSONField(
+        default=dict, help_text="Rows purged so far, by model label"
+    )
+    requested_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True)
+    objects = models.Manager()
+
+    def __str__(self) -> str:
+        return f"Deletion of user {self.user_id}"
@@ -0,0 +1,204 @@
+"""
+This module stores the background purge of deleted accounts.
+
+Deleting an account only disables it (`services.delete_account`) and records an
+`AccountDeletion`. The purger then deletes the data the user owned, children
+first, one bounded chunk per transaction, with set-based `DELETE ... WHERE id IN`
+statements instead of Django's collector, which would load every row and cascade
+in Python. Each chunk updates the deletion's progress in the same transaction,
+so a purge interrupted by a crash resumes where it stopped, on the next start.
+The user row itself goes last, once nothing references it.
+"""
+
+import logging
+import threading
+from typing import Any
+
+from django.conf import settings
+from django.db import close_old_connections, connection, models, transaction
+from django.utils import timezone
+
+from .. import metrics
+from ..meeting import services as meeting_services
+from ..meeting.models import Meeting, MeetingStatistics, Question, Response
+from .models import AccountDeletion, CustomUser
+
+logger = logging.getLogger(__name__)
+
+# Owned rows, children first, with the lookup from each model to its owner
+PURGE_ORDER: list[tuple[type[models.Model], str]] = [
+    (Response, "question__meeting__user_id"),
+    (Question, "meeting__user_id"),
+    (MeetingStatistics, "meeting__user_id"),
+    (Meeting, "user_id"),
+]
+
+purged_rows = metrics.counter(
+    "account_purge_rows_deleted_total", "Rows deleted by account purges, by model"
+)
+purges_completed = metrics.counter(
+    "account_purges_completed_total", "Deleted accounts fully purged"
+)
+purge_failures = metrics.counter(
+    "account_purge_failures_total", "Purge chunks that failed"
+)
+
+
+def _invalidate_meetings(meeting_ids: list[Any]) -> None:
+    for meeting_id in meeting_ids:
+        meeting_services.invalidate_meeting(meeting_id)
+
+
+def _delete_rows(model: type[models.Model], ids: list[Any]) -> None:
+    # A plain DELETE rather than `QuerySet.delete()`, whose collector would load
+    # the chunk and send `post_delete` for every meeting and question, each one
+    # invalidating the meeting cache again. Skipping its cascades is safe since
+    # `PURGE_ORDER` deletes children first: nothing references these rows anymore.
+    table = connection.ops.quote_name(model._meta.db_table)
+    column = connection.ops.quote_name(model._meta.pk.column)
+    placeholders = ", ".join(["%s"] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {table} WHERE {column} IN ({placeholders})",
+            [model._meta.pk.get_db_prep_value(pk, connection) for pk in ids],
+        )
+
+
+def purge_chunk(chunk_size: int) -> int:
+    """
+    Deletes the next chunk of the oldest pending account deletion that no other
+    purger is working on
+    :param chunk_size: Maximum number of rows deleted
+    :return: Number of rows deleted (the user row counts as one), 0 when idle
+    """
+    with transaction.atomic():
+        deletion: AccountDeletion | None = (
+            AccountDeletion.objects.select_for_update(skip_locked=True)
+            .filter(completed_at__isnull=True)
+            .order_by("requested_at")
+            .first()
+        )
+        if deletion is None:
+            return 0
+        for model, owner in PURGE_ORDER:
+            ids = list(
+                model.objects.filter(**{owner: deletion.user_id}).values_list(
+                    "pk", flat=True
+                )[:chunk_size]
+            )
+            if not ids:
+                continue
+            _delete_rows(model, ids)
+            if model is Meeting:
+                transaction.on_commit(lambda: _invalidate_meetings(ids))
+            label = model._meta.label
+            done = deletion.rows_deleted.get(label, 0)
+            deletion.rows_deleted[label] = done + len(ids)
+            deletion.save(update_fields=["rows_deleted"])
+            purged_rows.inc(len(ids), model=label)
+            return len(ids)
+        # only the user's own relations (groups, permissions, admin log) are left
+        CustomUser.objects.filter(pk=deletion.user_id).delete()
+        deletion.completed_at = timezone.now()
+        deletion.save(update_fields=["completed_at"])
+    purges_completed.inc()
+    logger.log(
+        level=logging.INFO,
+        msg="Account Purged",
+        extra={"user_id": deletion.user_id, "rows_deleted": deletion.rows_deleted},
+    )
+    return 1
+
+
+def pending() -> list[dict[str, Any]]:
+    """
+    Reports the purges still running
+    :return: User ID, request time and rows deleted so far of each
+    """
+    return list(
+        AccountDeletion.objects.filter(completed_at__isnull=True)
+        .order_by("requested_at")
+        .values("user_id", "requested_at", "rows_deleted")
+    )
+
+
+class AccountPurger:
+    """
+    Background thread purging deleted accounts as soon as they are requested,
+    and every `interval` seconds for those left by a previous process
+    """
+
+    def __init__(self, chunk_size: int, interval: float) -> None:
+        self.chunk_size = chunk_size
+        self.interval = interval
+        self._wake = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._start_lock = threading.Lock()
+
+    def start(self) -> None:
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self.run, name="account-purger", daemon=True
+                )
+                self._thread.start()
+
+    def notify(self) -> None:
+        """
+        Starts purging now instead of at the next interval
+        """
+        self._wake.set()
+
+    def run(self) -> None:
+        while True:
+            while self.purge():
+                pass
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def purge(self) -> int:
+        """
+        Deletes one chunk
+        :return: Number of rows deleted, 0 when idle or on failure
+        """
+        close_old_connections()
+        try:
+            return purge_chunk(self.chunk_size)
+        except Exception as e:
+            purge_failures.inc()
+            logger.log(
+                level=logging.ERROR,
+                msg="Account Purge Failed",
+                extra={"reason": e.args},
+            )
+            return 0
+        finally:
+            close_old_connections()
+
+
+_purger: AccountPurger | None = None
+_purger_lock = threading.Lock()
+
+
+def get_purger() -> AccountPurger:
+    """
+    Gets the process wide purger
+    :return: The purger, its thread is started on first use
+    """
+    global _purger
+    if _purger is None:
+        with _purger_lock:
+            if _purger is None:
+                _purger = AccountPurger(
+                    chunk_size=settings.ACCOUNT_PURGE["CHUNK_SIZE"],
+                    interval=settings.ACCOUNT_PURGE["INTERVAL_SECONDS"],
+                )
+    _purger.start()
+    return _purger
+
+
+pending_purges = metrics.gauge(
+    "account_purges_pending",
+    "Deleted accounts whose data is still being purged",
+    function=lambda: AccountDeletion.objects.filter(completed_at__isnull=True).count(),
+)
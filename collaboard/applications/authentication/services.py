@@ -9,10 +9,17 @@ from typing import Any
 from django.conf import settings
 from django.core import signing
 from django.core.exceptions import ImproperlyConfigured
-from django.core.mail import EmailMultiAlternatives
+from django.db import transaction
 from django.http import HttpRequest
 from django.template.loader import render_to_string
 
+from .. import mail
+from ..meeting import services as meeting_services
+from ..meeting.models import Meeting
+from . import purge
+from .backends import invalidate_user
+from .models import AccountDeletion, CustomUser
+
 logger = logging.getLogger(__name__)
 
 EXPIRATION_SECONDS = 60 * 60 * 24  # 24 Hours
@@ -77,12 +84,13 @@ def send_account_verification_email(
     token: str, user_email: str, request: HttpRequest
 ) -> bool:
     """
-    Sends a verification email to the provided user email
+    Queues a verification email to the provided user email, it is delivered by
+    the background sender (see `applications.mail`)
 
     :param token: Token to embed in the email
     :param user_email: Email to send to
     :param request: Http request
-    :returns: True if the email was successfully sent, else false
+    :returns: True if the email was successfully queued, else false
     """
     protocol: str = "https" if request.is_secure() else "http"
     domain: str = request.get_host()
@@ -97,22 +105,31 @@ def send_account_verification_email(
             "hours": EXPIRATION_HOURS,
         },
     )
-    msg = EmailMultiAlternatives(
+    return mail.queue_email(
         subject=subject,
         body=text_content,
-        from_email=settings.EMAIL_FROM_USER,
         to=[user_email],
+        html=html_message,
+        from_email=settings.EMAIL_FROM_USER,
     )
-    msg.attach_alternative(content=html_message, mimetype="text/html")
-    # noinspection PyBroadException
-    try:
-        msg.send()
-        return True
-    except Exception as e:
-        print(e.args)
-        logger.log(
-            level=logging.ERROR,
-            msg="Email Verification Failed To Send",
-            extra={"reason": e.args},
+
+
+def delete_account(user: CustomUser) -> None:
+    """
+    Deletes an account without touching the data it owns: the user is disabled
+    (signed out everywhere, `is_active` being checked on every request), their
+    email is released for a new signup and their running meetings are ended.
+    Their meetings, questions and responses are purged in the background
+    (see `purge`).
+    :param user: User deleting their account
+    """
+    with transaction.atomic():
+        CustomUser.objects.filter(pk=user.pk).update(
+            is_active=False, email=f"deleted-{user.pk}@deleted.invalid"
         )
-        return False
+        AccountDeletion.objects.get_or_create(user_id=user.pk)
+        transaction.on_commit(lambda: invalidate_user(user.pk))
+    live = Meeting.objects.filter(user_id=user.pk).exclude(status=Meeting.Status.ENDED)
+    for meeting_id in live.values_list("pk", flat=True):
+        meeting_services.end_meeting(meeting_id)
+    purge.get_purger().notify()
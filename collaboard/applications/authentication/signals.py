@@ -0,0 +1,20 @@
+"""
+This module stores the signal receivers keeping the user cache consistent with
+saves (e.g. password changes, `last_login`) and deletes (the `account` view)
+"""
+
+from typing import Any
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .backends import invalidate_user
+from .models import CustomUser
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def invalidate_on_save(sender: type, instance: CustomUser, **kwargs: Any) -> None:
+    user_id = instance.pk
+    transaction.on_commit(lambda: invalidate_user(user_id))
@@ -1 +1,75 @@
-# Create your tests here.
+"""
+This module stores the tests of the cached authentication backend and the
+account purge.
+"""
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..meeting.models import Meeting, Question, Response
+from ..testing import fake_redis_settings
+from . import backends, purge
+from .models import AccountDeletion, CustomUser
+
+USER_TABLE = CustomUser._meta.db_table
+
+
+@override_settings(**fake_redis_settings())
+class CachedModelBackendTests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        backends.user_cache.local.clear()
+        self.user = CustomUser.objects.create_user(
+            "host@example.com", "password", first_name="Host", last_name="User"
+        )
+        self.client.force_login(self.user)
+
+    def user_queries(self, url: str) -> list[str]:
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        return [query["sql"] for query in queries if USER_TABLE in query["sql"]]
+
+    def test_cold_request_loads_user_once(self) -> None:
+        self.assertEqual(len(self.user_queries(reverse("create_meeting"))), 1)
+
+    def test_warm_requests_run_no_user_queries(self) -> None:
+        self.user_queries(reverse("create_meeting"))
+        self.assertEqual(self.user_queries(reverse("create_meeting")), [])
+        backends.user_cache.local.clear()  # another worker, sharing the cache
+        self.assertEqual(self.user_queries(reverse("create_meeting")), [])
+
+    def test_saving_user_invalidates_cache(self) -> None:
+        self.user_queries(reverse("create_meeting"))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.first_name = "Renamed"
+            self.user.save()
+        self.assertEqual(len(self.user_queries(reverse("create_meeting"))), 1)
+
+
+class PurgeTests(TestCase):
+    def test_purge_deletes_owned_rows_children_first(self) -> None:
+        user = CustomUser.objects.create_user(
+            "host@example.com", "password", first_name="Host", last_name="User"
+        )
+        for number in range(2):
+            meeting = Meeting.objects.create(
+                user=user, access_code=f"{number:08d}", title="Meeting", duration=30
+            )
+            question = Question.objects.create(meeting=meeting, index=1, text="Q")
+            Response.objects.bulk_create(
+                Response(question=question, text="Response") for _ in range(3)
+            )
+        AccountDeletion.objects.create(user_id=user.pk)
+        while purge.purge_chunk(chunk_size=2):
+            pass
+        deletion = AccountDeletion.objects.get(user_id=user.pk)
+        self.assertIsNotNone(deletion.completed_at)
+        self.assertEqual(
+            deletion.rows_deleted,
+            {"meeting.Response": 6, "meeting.Question": 2, "meeting.Meeting": 2},
+        )
+        self.assertFalse(CustomUser.objects.filter(pk=user.pk).exists())
+        self.assertFalse(Meeting.objects.exists())
@@ -1,28 +1,52 @@
 import logging
 from typing import Any
 
-from django.contrib.auth import authenticate, login
+from asgiref.sync import sync_to_async
+from django.contrib.auth import alogin, authenticate
 from django.contrib.auth.hashers import make_password
 from django.http import HttpRequest, HttpResponse
 from django.shortcuts import redirect, render
 from django.views.decorators.http import require_http_methods
 
 from ..authentication import services
+from ..rate_limits import rate_limit
 from ..utils import user_exists
 from .forms import LoginForm, SignupForm
+from .hashing import PoolSaturated, get_pool
 from .models import CustomUser
 
-# TODO: Add rate limiting to these views via `django-ratelimit` package
-
 logger = logging.getLogger(__name__)
 
+BUSY_RETRY_AFTER_SECONDS = 2  # sent with 503s when password hashing is saturated
+
+
+def _busy(operation: str) -> HttpResponse:
+    """
+    Answers a request that found the password hashing pool saturated
+    :param operation: Rejected operation, e.g. "login"
+    :return: 503 response asking the client to retry shortly
+    """
+    logger.log(
+        level=logging.WARNING,
+        msg="Password Hashing Saturated",
+        extra={"operation": operation},
+    )
+    return HttpResponse(
+        "The server is busy, please try again in a moment.",
+        status=503,
+        headers={"Retry-After": str(BUSY_RETRY_AFTER_SECONDS)},
+    )
+
 
+# Signup and login are async so that the PBKDF2 work runs on the bounded hashing
+# pool instead of the thread serving sync views
 @require_http_methods(["GET", "POST"])
-def signup(request: HttpRequest) -> HttpResponse:
+@rate_limit("signup", methods=("POST",))
+async def signup(request: HttpRequest) -> HttpResponse:
     if request.method == "POST":
         form = SignupForm(request.POST)
-        # validate initial form data
-        if not form.is_valid():
+        # validate initial form data (checks the email is unique)
+        if not await sync_to_async(form.is_valid)():
             logger.log(
                 level=logging.INFO,
                 msg="Invalid Signup Form",
@@ -38,11 +62,11 @@ def signup(request: HttpRequest) -> HttpResponse:
                 },
             )
         # ensure no matching user with same email
-        if user_exists(form.cleaned_data["email"]):
+        if await sync_to_async(user_exists)(form.cleaned_data["email"]):
             logger.log(
                 level=logging.INFO,
                 msg="Invalid Signup Form",
-                extra={"reasons": f"Email {form.cleaned_data} already exists"},
+                extra={"reasons": f"Email {form.cleaned_data['email']} already exists"},
             )
             return render(
                 request=request,
@@ -50,13 +74,19 @@ def signup(request: HttpRequest) -> HttpResponse:
                 context={"email_exists": True, "form": form, "email_sent_error": False},
             )
         # generate the email verification token and send it
+        try:
+            password: str = await get_pool().run(
+                "signup", make_password, form.cleaned_data["password1"]
+            )
+        except PoolSaturated:
+            return _busy("signup")
         email_verification_token: str = services.generate_account_verification_token(
             form.cleaned_data["email"],
-            make_password(form.cleaned_data["password1"]),
+            password,
             form.cleaned_data["first_name"],
             form.cleaned_data["last_name"],
         )
-        if not services.send_account_verification_email(
+        if not await sync_to_async(services.send_account_verification_email)(
             email_verification_token, form.cleaned_data["email"], request
         ):
             return render(
@@ -64,10 +94,10 @@ def signup(request: HttpRequest) -> HttpResponse:
                 template_name="authentication/signup.html",
                 context={"email_exists": False, "form": form, "email_sent_error": True},
             )
-        # email was sent by now
+        # email was queued by now
         logger.log(
             level=logging.INFO,
-            msg="Email Verification Sent",
+            msg="Email Verification Queued",
             extra={"email": form.cleaned_data["email"]},
         )
         return render(
@@ -76,7 +106,7 @@ def signup(request: HttpRequest) -> HttpResponse:
             context={"email": form.cleaned_data["email"]},
         )
     else:
-        if request.user.is_authenticated:
+        if (await request.auser()).is_authenticated:
             return redirect("dashboard")
         return render(
             request=request,
@@ -90,6 +120,7 @@ def signup(request: HttpRequest) -> HttpResponse:
 
 
 @require_http_methods(["GET"])
+@rate_limit("verify_email")
 def verify_email(request: HttpRequest) -> HttpResponse:
     token: str | None = request.GET.get("token")
     if not token:
@@ -116,7 +147,7 @@ def verify_email(request: HttpRequest) -> HttpResponse:
     )
     new_user.password = payload["password"]
     new_user.save()
-    logger.log(level=logging.INFO, msg="User Created", extra={"user": new_user})
+    logger.log(level=logging.INFO, msg="User Created", extra={"user_id": new_user.pk})
     return render(
         request=request,
         template_name="authentication/email_verified.html",
@@ -125,7 +156,8 @@ def verify_email(request: HttpRequest) -> HttpResponse:
 
 
 @require_http_methods(["GET", "POST"])
-def login_user(request: HttpRequest) -> HttpResponse:
+@rate_limit("login", methods=("POST",))
+async def login_user(request: HttpRequest) -> HttpResponse:
     if request.method == "POST":
         form: LoginForm = LoginForm(request.POST)
         if not form.is_valid():
@@ -144,9 +176,19 @@ def login_user(request: HttpRequest) -> HttpResponse:
                 },
             )
         # form is valid by now
-        user: CustomUser | None = authenticate(
-            email=form.cleaned_data["email"], password=form.cleaned_data["password"]
-        )
+        # the whole of `authenticate` runs on the pool, so unknown emails still
+        # cost one hash and take as long as wrong passwords
+        try:
+            user: CustomUser | None = await get_pool().run(
+                "login",
+                lambda: authenticate(
+                    request,
+                    email=form.cleaned_data["email"],
+                    password=form.cleaned_data["password"],
+                ),
+            )
+        except PoolSaturated:
+            return _busy("login")
         if user is None:
             logger.log(
                 level=logging.INFO,
@@ -163,15 +205,15 @@ def login_user(request: HttpRequest) -> HttpResponse:
                 },
             )
         # user is authenticated by now
-        login(request, user)
+        await alogin(request, user)
         if request.POST.get("remember_me"):
             request.session.set_expiry(services.SESSION_EXPIRY_SECONDS)
         else:
             request.session.set_expiry(0)  # expire on browser close
-        logger.log(level=logging.INFO, msg="User Logged In", extra={"user": user})
+        logger.log(level=logging.INFO, msg="User Logged In", extra={"user_id": user.pk})
         return redirect("dashboard")
     else:
-        if request.user.is_authenticated:
+        if (await request.auser()).is_authenticated:
             return redirect("dashboard")
         return render(
             request=request,
@@ -0,0 +1,144 @@
+"""
+This module stores the read-through caches used for data that is read far more
+often than it changes.
+
+`VersionedCache` keeps a small LRU in each process in front of the shared
+django-redis cache. Every key has a version token in the shared cache;
+invalidating a key replaces its token, so the old shared entry becomes
+unreachable and each process drops its local copy the next time it revalidates.
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable
+
+from django.core.cache import cache
+
+from . import metrics
+
+hits = metrics.counter("cache_hits_total", "Read-through cache hits, by layer")
+misses = metrics.counter("cache_misses_total", "Read-through cache misses")
+evictions = metrics.counter(
+    "cache_evictions_total", "Entries evicted from an in-process LRU"
+)
+
+MISSING = object()
+
+
+class LRUCache:
+    """
+    Thread-safe, size bounded, least recently used mapping
+    """
+
+    def __init__(self, name: str, max_entries: int) -> None:
+        self.name = name
+        self.max_entries = max_entries
+        self._entries: OrderedDict[Any, Any] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Any) -> Any:
+        """
+        :return: The value, else `MISSING`
+        """
+        with self._lock:
+            value = self._entries.get(key, MISSING)
+            if value is not MISSING:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: Any, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            evicted = 0
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                evicted += 1
+        if evicted:
+            evictions.inc(evicted, cache=self.name)
+
+    def delete(self, key: Any) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class VersionedCache:
+    """
+    Two-tier read-through cache: an in-process LRU in front of the shared cache.
+    A local copy is trusted for `local_ttl` seconds, after which one version
+    lookup in the shared cache revalidates it. Values must be picklable and
+    are shared between callers, so they must be treated as read-only.
+    """
+
+    def __init__(
+        self, name: str, max_entries: int, local_ttl: float, timeout: int
+    ) -> None:
+        self.name = name
+        self.local_ttl = local_ttl
+        self.timeout = timeout
+        self.local = LRUCache(name, max_entries)
+
+    def _version_key(self, key: Any) -> str:
+        return f"{self.name}:version:{key}"
+
+    def _data_key(self, key: Any, version: str) -> str:
+        return f"{self.name}:{key}:{version}"
+
+    def _version(self, key: Any) -> str:
+        version_key = self._version_key(key)
+        version: str | None = cache.get(version_key)
+        if version is None:
+            # Random tokens, not counters: an evicted version key can't make
+            # an old entry reachable again
+            cache.add(version_key, uuid.uuid4().hex, timeout=self.timeout)
+            version = cache.get(version_key)
+        return version
+
+    def get(self, key: Any, loader: Callable[[], Any], revalidate: bool = False) -> Any:
+        """
+        Gets a value, loading and caching it on a miss. `None` is never cached.
+        :param key: Cache key, unique within this cache
+        :param loader: Loads the value from the database
+        :param revalidate: Check the version even if the local copy is recent
+        :return: The value
+        """
+        now = time.monotonic()
+        entry = self.local.get(key)
+        if entry is not MISSING and not revalidate:
+            if now - entry[2] < self.local_ttl:
+                hits.inc(cache=self.name, layer="local")
+                return entry[1]
+        version = self._version(key)
+        if entry is not MISSING and entry[0] == version:
+            self.local.set(key, (version, entry[1], now))
+            hits.inc(cache=self.name, layer="local")
+            return entry[1]
+        value = cache.get(self._data_key(key, version), MISSING)
+        if value is MISSING:
+            misses.inc(cache=self.name)
+            value = loader()
+            if value is None:
+                return None
+            cache.set(self._data_key(key, version), value, timeout=self.timeout)
+        else:
+            hits.inc(cache=self.name, layer="shared")
+        self.local.set(key, (version, value, now))
+        return value
+
+    def invalidate(self, key: Any) -> None:
+        """
+        Makes every cached copy of a key stale. Call it after the change has
+        been committed, or a concurrent read may cache the old value again.
+        :param key: Cache key
+        """
+        self.local.delete(key)
+        cache.set(self._version_key(key), uuid.uuid4().hex, timeout=self.timeout)
@@ -0,0 +1,279 @@
+"""
+This module stores the incremental counter subsystem used to maintain
+denormalized totals (e.g. `CustomUser.total_responses`) without `COUNT(*)`.
+
+Counters are changed in two ways:
+ - `increment_now` applies a batch of increments in a single UPDATE, to be used
+   inside the transaction writing the counted rows
+ - `add` buffers a delta (in a Redis hash, or in memory) which a background
+   thread folds into the database every few seconds, for hot paths such as joins
+"""
+
+import logging
+import threading
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+from typing import Any, cast
+
+from django.apps import apps
+from django.conf import settings
+from django.db import close_old_connections, models, transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+from django_redis import get_redis_connection
+from redis.commands.core import Script
+from redis.exceptions import LockNotOwnedError
+
+from . import metrics
+from .realtime.brokers import redis_available
+
+logger = logging.getLogger(__name__)
+
+DELTAS_KEY = "counters:deltas"
+FOLDING_KEY = "counters:folding"  # deltas being applied, replayed after a crash
+FOLD_LOCK_KEY = "counters:fold_lock"
+FOLD_ID_FIELD = "fold_id"  # of the folding hash, delta keys hold colons
+
+# Renames the deltas KEYS[1] to the folding hash KEYS[2], unless one is left
+# by an interrupted fold, tags it with the fold ID ARGV[1] and returns it
+CLAIM_SCRIPT = """
+if redis.call('EXISTS', KEYS[2]) == 0 then
+    if redis.call('EXISTS', KEYS[1]) == 0 then
+        return {}
+    end
+    redis.call('RENAME', KEYS[1], KEYS[2])
+end
+redis.call('HSETNX', KEYS[2], 'fold_id', ARGV[1])
+return redis.call('HGETALL', KEYS[2])
+"""
+
+# Deletes the folding hash KEYS[1] if it is still the fold ARGV[1]
+DELETE_SCRIPT = """
+if redis.call('HGET', KEYS[1], 'fold_id') == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+folded = metrics.counter("counter_deltas_folded_total", "Counter deltas applied")
+
+
+def increment_now(
+    model: type[models.Model], field: str, amounts: dict[Any, int]
+) -> None:
+    """
+    Increments a counter field on many rows with one set-based UPDATE
+    :param model: Model owning the counter
+    :param field: Name of the counter field
+    :param amounts: Mapping of primary key to increment
+    """
+    amounts = {pk: amount for pk, amount in amounts.items() if amount}
+    if not amounts:
+        return
+    model._default_manager.filter(pk__in=amounts).update(
+        **{
+            field: F(field)
+            + Case(
+                *[When(pk=pk, then=Value(amount)) for pk, amount in amounts.items()],
+                default=Value(0),
+                output_field=models.IntegerField(),
+            )
+        }
+    )
+
+
+def _delta_key(model: type[models.Model], pk: Any, field: str) -> str:
+    return f"{model._meta.label_lower}:{pk}:{field}"
+
+
+def apply_deltas(deltas: dict[str, int]) -> None:
+    """
+    Writes buffered deltas, one UPDATE per (model, field), in one transaction
+    :param deltas: Mapping of `<app.model>:<pk>:<field>` to delta
+    """
+    grouped: dict[tuple[str, str], dict[str, int]] = defaultdict(dict)
+    for key, amount in deltas.items():
+        label, pk, field = key.split(":")
+        grouped[(label, field)][pk] = int(amount)
+    with transaction.atomic():
+        for (label, field), amounts in grouped.items():
+            increment_now(apps.get_model(label), field, amounts)
+
+
+class CounterBuffer:
+    """
+    In-memory delta buffer, for a single process and tests
+    """
+
+    def __init__(self) -> None:
+        self._deltas: dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def add(self, key: str, amount: int) -> None:
+        with self._lock:
+            self._deltas[key] += amount
+
+    def fold(self) -> int:
+        """
+        Applies and clears every buffered delta
+        :return: Number of counters updated
+        """
+        with self._lock:
+            deltas, self._deltas = dict(self._deltas), defaultdict(int)
+        if deltas:
+            try:
+                apply_deltas(deltas)
+            except Exception:
+                for key, amount in deltas.items():
+                    self.add(key, amount)  # retried on the next fold
+                raise
+        return len(deltas)
+
+
+class RedisCounterBuffer(CounterBuffer):
+    """
+    Redis hash of deltas (HINCRBY) shared by every worker.
+    Folding renames the hash first so that new deltas keep accumulating while
+    the old ones are applied; a renamed hash left by a crash is applied first.
+    Each renamed hash gets a fold ID, recorded (`CounterFold`) in the
+    transaction applying its deltas: a hash whose ID is already recorded (the
+    fold crashed after committing, or outlived `FOLD_LOCK_KEY`) is only deleted.
+    """
+
+    LOCK_TIMEOUT_SECONDS = 30
+    FOLD_RECORD_SECONDS = 60 * 60  # applied fold IDs kept, well past the lock
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._scripts: tuple[Script, Script] | None = None
+
+    def add(self, key: str, amount: int) -> None:
+        get_redis_connection("default").hincrby(DELTAS_KEY, key, amount)
+
+    def fold(self) -> int:
+        client = get_redis_connection("default")
+        lock = client.lock(
+            FOLD_LOCK_KEY, timeout=self.LOCK_TIMEOUT_SECONDS, blocking=False
+        )
+        if not lock.acquire(blocking=False):
+            return 0  # another worker is folding
+        try:
+            if self._scripts is None:
+                self._scripts = (
+                    client.register_script(CLAIM_SCRIPT),
+                    client.register_script(DELETE_SCRIPT),
+                )
+            claim, delete = self._scripts
+            raw = cast(
+                list[bytes],
+                claim(keys=[DELTAS_KEY, FOLDING_KEY], args=[str(uuid.uuid4())]),
+            )
+            if not raw:
+                return 0  # no deltas buffered
+            fields = dict(zip(raw[::2], raw[1::2]))
+            fold_id = fields.pop(FOLD_ID_FIELD.encode()).decode()
+            deltas = {key.decode(): int(amount) for key, amount in fields.items()}
+            applied = self._apply_once(fold_id, deltas)
+            delete(keys=[FOLDING_KEY], args=[fold_id])
+            return len(deltas) if applied else 0
+        finally:
+            try:
+                lock.release()
+            except LockNotOwnedError:
+                logger.log(
+                    level=logging.WARNING,
+                    msg="Counter Fold Lock Expired",
+                    extra={"timeout": self.LOCK_TIMEOUT_SECONDS},
+                )
+
+    def _apply_once(self, fold_id: str, deltas: dict[str, int]) -> bool:
+        fold_model = apps.get_model("meeting", "CounterFold")
+        with transaction.atomic():
+            _, created = fold_model.objects.get_or_create(fold_id=fold_id)
+            if not created:
+                return False  # committed by an earlier attempt
+            apply_deltas(deltas)
+            fold_model.objects.filter(
+                applied_at__lt=timezone.now()
+                - timedelta(seconds=self.FOLD_RECORD_SECONDS)
+            ).delete()
+        return True
+
+
+class CounterFolder:
+    """
+    Background thread folding buffered deltas every `interval` seconds
+    """
+
+    def __init__(self, buffer: CounterBuffer, interval: float) -> None:
+        self.buffer = buffer
+        self.interval = interval
+        self._thread: threading.Thread | None = None
+        self._start_lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    def start(self) -> None:
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self.run, name="counter-folder", daemon=True
+                )
+                self._thread.start()
+
+    def run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            self.fold()
+
+    def fold(self) -> int:
+        close_old_connections()
+        try:
+            count = self.buffer.fold()
+            folded.inc(count)
+            return count
+        except Exception as e:
+            logger.log(
+                level=logging.ERROR,
+                msg="Counter Fold Failed",
+                extra={"reason": e.args},
+            )
+            return 0
+        finally:
+            close_old_connections()
+
+
+_folder: CounterFolder | None = None
+_folder_lock = threading.Lock()
+
+
+def get_folder() -> CounterFolder:
+    """
+    Gets the process wide folder, choosing the buffer on first use.
+    `settings.COUNTERS["BUFFER"]` may be "redis", "memory" or "auto".
+    :return: The folder, its thread is started on first use
+    """
+    global _folder
+    if _folder is None:
+        with _folder_lock:
+            if _folder is None:
+                config: dict[str, Any] = settings.COUNTERS
+                use_redis = config["BUFFER"] == "redis" or (
+                    config["BUFFER"] == "auto" and redis_available()
+                )
+                _folder = CounterFolder(
+                    RedisCounterBuffer() if use_redis else CounterBuffer(),
+                    interval=config["FOLD_INTERVAL_SECONDS"],
+                )
+    _folder.start()
+    return _folder
+
+
+def add(model: type[models.Model], pk: Any, field: str, amount: int = 1) -> None:
+    """
+    Buffers a counter delta, applied to the database by the next fold
+    :param model: Model owning the counter
+    :param pk: Primary key of the row
+    :param field: Name of the counter field
+    :param amount: Delta to apply
+    """
+    get_folder().buffer.add(_delta_key(model, pk, field), amount)
@@ -0,0 +1,287 @@
+"""
+This module stores the request instrumentation.
+
+`InstrumentationMiddleware` times every request by view. For a sampled share
+of requests (`INSTRUMENTATION["SAMPLE_RATE"]`) it also attributes the work done
+on the request's behalf, through hooks that need no change to the views:
+ - database queries, via an execute wrapper installed on every connection
+ - cache lookups, via `InstrumentedRedisCache` (the `default` cache backend)
+ - template rendering, via `InstrumentedTemplates` (the template backend)
+Database connections are counted as they are set up, and the statistics of
+connection pools (`DB_CONNECTIONS["MODE"] = "pool"`) are read on scrape.
+The current request's counters live in a context variable, which `sync_to_async`
+carries into the threads running sync views and ORM calls.
+Results go to `metrics` (exported by the `metrics` view) and, in DEBUG, to a
+`Server-Timing` header readable in the browser's network panel.
+"""
+
+import inspect
+import random
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Callable
+
+from django.conf import settings
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+from django.http import HttpRequest, HttpResponse
+from django.template.backends.django import DjangoTemplates
+from django_redis.cache import RedisCache
+
+from . import metrics
+
+requests_total = metrics.counter(
+    "http_requests_total", "Requests handled, by view, method and status"
+)
+request_seconds = metrics.histogram(
+    "http_request_seconds", "Time spent handling a request, by view"
+)
+db_queries = metrics.histogram(
+    "http_request_db_queries",
+    "Database queries per sampled request, by view",
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100),
+)
+db_seconds = metrics.histogram(
+    "http_request_db_seconds", "Time spent in queries per sampled request, by view"
+)
+cache_hits = metrics.counter(
+    "http_request_cache_hits_total", "Cache hits of sampled requests, by view"
+)
+cache_misses = metrics.counter(
+    "http_request_cache_misses_total", "Cache misses of sampled requests, by view"
+)
+cache_seconds = metrics.histogram(
+    "http_request_cache_seconds", "Time spent in cache lookups per sampled request"
+)
+template_seconds = metrics.histogram(
+    "http_request_template_seconds", "Time spent rendering per sampled request"
+)
+connections_set_up = metrics.counter(
+    "db_connections_set_up_total",
+    "Database connections set up by Django (checkouts when pooled), by database",
+)
+
+# psycopg_pool statistics exported per database, all but the first four are
+# totals since the pool started
+POOL_STATS = {
+    "pool_min": "Configured minimum number of connections",
+    "pool_max": "Configured maximum number of connections",
+    "pool_size": "Connections currently managed by the pool",
+    "pool_available": "Idle connections in the pool",
+    "requests_waiting": "Requests currently waiting for a connection",
+    "requests_num": "Connections requested from the pool",
+    "requests_wait_ms": "Time spent waiting for a connection",
+    "requests_errors": "Requests that failed, e.g. timed out waiting",
+    "connections_num": "Connections opened to the server",
+    "connections_ms": "Time spent opening connections to the server",
+    "connections_errors": "Failed attempts to open a connection",
+    "connections_lost": "Connections found broken by the health check",
+}
+
+
+@dataclass
+class RequestStats:
+    queries: int = 0
+    query_seconds: float = 0.0
+    cache_hits: int = 0
+    cache_misses: int = 0
+    cache_seconds: float = 0.0
+    template_seconds: float = 0.0
+
+
+_current: ContextVar[RequestStats | None] = ContextVar("request_stats", default=None)
+
+
+def query_timer(
+    execute: Callable[..., Any], sql: str, params: Any, many: bool, context: Any
+) -> Any:
+    """
+    Database execute wrapper counting the queries of the sampled request
+    """
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.query_seconds += time.perf_counter() - start
+
+
+def install_query_timer(sender: Any, connection: Any, **kwargs: Any) -> None:
+    if query_timer not in connection.execute_wrappers:
+        connection.execute_wrappers.append(query_timer)
+    if sender is not None:
+        connections_set_up.inc(database=connection.alias)
+
+
+connection_created.connect(install_query_timer)
+
+
+class PoolGauge(metrics.Gauge):
+    """
+    Gauge reading one statistic of every database connection pool on scrape
+    """
+
+    def __init__(self, stat: str, description: str) -> None:
+        super().__init__(f"db_pool_{stat}", description)
+        self.stat = stat
+
+    def samples(self) -> dict[metrics.LabelKey, float]:
+        samples = {}
+        for alias in connections:
+            # `pool` only exists on PostgreSQL, and is None unless pooling is on
+            pool = getattr(connections[alias], "pool", None)
+            if pool is not None:
+                samples[(("database", alias),)] = pool.get_stats().get(self.stat, 0)
+        return samples
+
+
+for stat, description in POOL_STATS.items():
+    metrics.register(PoolGauge(stat, description))
+
+
+class InstrumentedRedisCache(RedisCache):
+    """
+    `django-redis` cache counting the hits and misses of the sampled request
+    """
+
+    _missing = object()
+
+    def get(self, key: Any, default: Any = None, *args: Any, **kwargs: Any) -> Any:
+        stats = _current.get()
+        if stats is None:
+            return super().get(key, default, *args, **kwargs)
+        start = time.perf_counter()
+        value = super().get(key, self._missing, *args, **kwargs)
+        stats.cache_seconds += time.perf_counter() - start
+        if value is self._missing:
+            stats.cache_misses += 1
+            return default
+        stats.cache_hits += 1
+        return value
+
+    def get_many(self, keys: Any, *args: Any, **kwargs: Any) -> dict[Any, Any]:
+        stats = _current.get()
+        if stats is None:
+            return super().get_many(keys, *args, **kwargs)
+        keys = list(keys)
+        start = time.perf_counter()
+        values = super().get_many(keys, *args, **kwargs)
+        stats.cache_seconds += time.perf_counter() - start
+        stats.cache_hits += len(values)
+        stats.cache_misses += len(keys) - len(values)
+        return values
+
+
+class TimedTemplate:
+    """
+    Wraps a backend template to time its rendering, includes are part of it
+    """
+
+    def __init__(self, template: Any) -> None:
+        self.template = template
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.template, name)
+
+    def render(self, context: Any = None, request: Any = None) -> str:
+        stats = _current.get()
+        if stats is None:
+            return self.template.render(context, request)
+        start = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            stats.template_seconds += time.perf_counter() - start
+
+
+class InstrumentedTemplates(DjangoTemplates):
+    """
+    Django template backend timing the rendering of the sampled request
+    """
+
+    def from_string(self, template_code: str) -> TimedTemplate:
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name: str) -> TimedTemplate:
+        return TimedTemplate(super().get_template(template_name))
+
+
+class InstrumentationMiddleware:
+    """
+    Records request metrics, see the module docstring.
+    Must be the first middleware so that the others are timed too.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response: Callable[[HttpRequest], Any]) -> None:
+        self.get_response = get_response
+        self.async_mode = inspect.iscoroutinefunction(get_response)
+        if self.async_mode:
+            inspect.markcoroutinefunction(self)
+        self.sample_rate: float = settings.INSTRUMENTATION["SAMPLE_RATE"]
+        self.server_timing: bool = settings.DEBUG
+        install_query_timer(None, connection)  # opened before this was imported
+
+    def __call__(self, request: HttpRequest) -> Any:
+        if self.async_mode:
+            return self.__acall__(request)
+        stats, token, start = self._begin()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, stats, start)
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        stats, token, start = self._begin()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, stats, start)
+
+    def _begin(self) -> tuple[RequestStats | None, Any, float]:
+        sampled = self.server_timing or random.random() < self.sample_rate
+        stats = RequestStats() if sampled else None
+        return stats, _current.set(stats), time.perf_counter()
+
+    def _finish(
+        self,
+        request: HttpRequest,
+        response: HttpResponse,
+        stats: RequestStats | None,
+        start: float,
+    ) -> HttpResponse:
+        elapsed = time.perf_counter() - start
+        match = request.resolver_match
+        view = match.view_name if match else "unresolved"  # keeps labels bounded
+        requests_total.inc(
+            view=view, method=request.method, status=response.status_code
+        )
+        request_seconds.observe(elapsed, view=view)
+        if stats is None:
+            return response
+        db_queries.observe(stats.queries, view=view)
+        db_seconds.observe(stats.query_seconds, view=view)
+        cache_hits.inc(stats.cache_hits, view=view)
+        cache_misses.inc(stats.cache_misses, view=view)
+        cache_seconds.observe(stats.cache_seconds, view=view)
+        template_seconds.observe(stats.template_seconds, view=view)
+        if self.server_timing:
+            response["Server-Timing"] = ", ".join(
+                [
+                    f"db;dur={stats.query_seconds * 1000:.2f};"
+                    f'desc="{stats.queries} queries"',
+                    f"cache;dur={stats.cache_seconds * 1000:.2f};"
+                    f'desc="{stats.cache_hits} hits, {stats.cache_misses} misses"',
+                    f"template;dur={stats.template_seconds * 1000:.2f}",
+                    f"total;dur={elapsed * 1000:.2f}",
+                ]
+            )
+        return response
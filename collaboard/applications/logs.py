@@ -0,0 +1,155 @@
+"""
+This module stores the non-blocking logging pipeline configured in
+`settings.LOGGING`.
+
+Request threads only enqueue records (`BoundedQueueHandler`); a listener thread
+per destination formats and writes them in batches (`BatchQueueListener`).
+Queues are bounded: when one is full, records below WARNING are dropped and
+WARNING or above evict the oldest record, each drop is counted.
+`ModelExtraFilter` replaces model instances and querysets in `extra` with
+short descriptions before they are queued, so formatting them later can't run
+a query (e.g. `Meeting.__str__` loading `meeting.user`).
+"""
+
+import atexit
+import logging
+import os
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Any
+
+from django.db import models
+
+from . import metrics
+
+BATCH_SIZE = 256  # records written between two flushes of a file
+
+dropped = metrics.counter(
+    "log_records_dropped_total", "Log records dropped by a full queue, by level"
+)
+
+# Attributes every record has, anything else came from `extra`
+RECORD_ATTRIBUTES = set(
+    vars(logging.LogRecord("", logging.INFO, "", 0, "", None, None))
+) | {"message", "asctime", "taskName"}
+
+
+def _describe(value: Any) -> Any:
+    if isinstance(value, models.Model):
+        return f"<{value._meta.label} pk={value.pk}>"  # the pk is never deferred
+    if isinstance(value, models.QuerySet):
+        return f"<QuerySet {value.model._meta.label}>"  # not evaluated
+    return value
+
+
+class ModelExtraFilter(logging.Filter):
+    """
+    Replaces model instances and querysets passed in `extra`, directly or inside
+    a list, tuple or dict, with descriptions that don't touch the database
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        for name, value in list(vars(record).items()):
+            if name in RECORD_ATTRIBUTES:
+                continue
+            if isinstance(value, (list, tuple)):
+                value = [_describe(item) for item in value]
+            elif isinstance(value, dict):
+                value = {key: _describe(item) for key, item in value.items()}
+            else:
+                value = _describe(value)
+            setattr(record, name, value)
+        return True
+
+
+class BoundedQueueHandler(QueueHandler):
+    """
+    Queue handler that never blocks the logging thread.
+    Its listener is started on first use, in each process, so that workers
+    forked after `settings` were loaded get their own thread.
+    """
+
+    queue: queue.Queue
+
+    def __init__(self, queue: queue.Queue) -> None:
+        super().__init__(queue)
+        self._listener_pid: int | None = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_listener(self) -> None:
+        if self._listener_pid == os.getpid() or self.listener is None:
+            return
+        with self._start_lock:
+            if self._listener_pid != os.getpid():
+                self.listener._thread = None  # threads don't survive a fork
+                self.listener.start()
+                atexit.register(self._stop_listener)
+                self._listener_pid = os.getpid()
+
+    def _stop_listener(self) -> None:
+        """
+        Writes the records still queued when the process exits
+        """
+        if self.listener is not None and self.listener._thread is not None:
+            self.listener.stop()
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        self._ensure_listener()
+        try:
+            self.queue.put_nowait(record)
+            return
+        except queue.Full:
+            if record.levelno < logging.WARNING:
+                dropped.inc(level=record.levelname)
+                return
+        try:
+            evicted = self.queue.get_nowait()
+            dropped.inc(level=evicted.levelname)
+            self.queue.put_nowait(record)
+        except (queue.Empty, queue.Full):
+            dropped.inc(level=record.levelname)
+
+
+class BatchQueueListener(QueueListener):
+    """
+    Listener draining up to `BATCH_SIZE` records at a time and flushing its
+    handlers once per batch instead of once per record
+    """
+
+    queue: queue.Queue
+    _sentinel = None  # set by `QueueListener`, missing from its stubs
+
+    def enqueue_sentinel(self) -> None:
+        self.queue.put(self._sentinel)  # blocks, so stopping can't be dropped
+
+    def _monitor(self) -> None:
+        stopping = False
+        while not stopping:
+            batch = [self.dequeue(True)]
+            while len(batch) < BATCH_SIZE:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            for record in batch:
+                if record is self._sentinel:
+                    stopping = True
+                else:
+                    self.handle(record)
+                self.queue.task_done()
+            for handler in self.handlers:
+                if isinstance(handler, BatchRotatingFileHandler):
+                    handler.flush_batch()
+
+
+class BatchRotatingFileHandler(RotatingFileHandler):
+    """
+    Rotating file handler leaving flushes to its `BatchQueueListener`
+    """
+
+    def flush(self) -> None:
+        pass  # called after every record by `StreamHandler.emit`
+
+    def flush_batch(self) -> None:
+        super().flush()
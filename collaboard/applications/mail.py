@@ -0,0 +1,336 @@
+"""
+This module stores the outbound email queue.
+Requests only render and enqueue a message (in Redis, or in memory for local
+development); a background sender delivers queued messages in batches over one
+backend connection, retrying failed messages with exponential backoff.
+"""
+
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any, cast
+
+from django.conf import settings
+from django.core.mail import EmailMessage, EmailMultiAlternatives, get_connection
+from django_redis import get_redis_connection
+
+from . import metrics
+from .realtime.brokers import redis_available
+
+logger = logging.getLogger(__name__)
+
+QUEUE_KEY = "mail:queue"
+RETRY_KEY = "mail:retry"  # sorted set of messages scored by when they are due
+
+# Moves up to ARGV[2] retries due by ARGV[1] back to the queue atomically
+PROMOTE_SCRIPT = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+if #due > 0 then
+    redis.call('ZREM', KEYS[1], unpack(due))
+    redis.call('RPUSH', KEYS[2], unpack(due))
+end
+return #due
+"""
+
+enqueued = metrics.counter("emails_enqueued_total", "Emails accepted for delivery")
+sent = metrics.counter("emails_sent_total", "Emails delivered to the backend")
+send_failures = metrics.counter(
+    "email_send_failures_total", "Delivery attempts that failed"
+)
+dropped = metrics.counter(
+    "emails_dropped_total", "Emails given up on after the last attempt"
+)
+queue_latency = metrics.histogram(
+    "email_queue_seconds",
+    "Time from enqueueing an email to its delivery",
+    buckets=(0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0),
+)
+
+
+class MailBuffer:
+    """
+    In-memory queue, for a single process and tests.
+    Queued messages are lost if the process dies.
+    """
+
+    def __init__(self) -> None:
+        self._queue: deque[str] = deque()
+        self._retries: list[tuple[float, str]] = []
+        self._lock = threading.Lock()
+
+    def push(self, item: dict[str, Any]) -> int:
+        """
+        Queues a message
+        :param item: Serialized message
+        :return: Queue depth after the push
+        """
+        with self._lock:
+            self._queue.append(json.dumps(item))
+            return len(self._queue)
+
+    def retry(self, item: dict[str, Any], due: float) -> None:
+        """
+        Queues a message again once `due` (a UNIX timestamp) has passed
+        """
+        with self._lock:
+            self._retries.append((due, json.dumps(item)))
+
+    def claim(self, size: int) -> list[dict[str, Any]]:
+        """
+        Takes the next batch, due retries first.
+        A claimed batch is lost if its sender dies before delivering it.
+        :param size: Maximum batch size
+        :return: Messages to send
+        """
+        now = time.time()
+        with self._lock:
+            due = [item for when, item in self._retries if when <= now]
+            self._retries = [retry for retry in self._retries if retry[0] > now]
+            self._queue.extendleft(reversed(due))
+            batch = []
+            while self._queue and len(batch) < size:
+                batch.append(json.loads(self._queue.popleft()))
+            return batch
+
+    def depth(self) -> int:
+        return len(self._queue) + len(self._retries)
+
+
+class RedisMailBuffer(MailBuffer):
+    """
+    Redis list shared by every worker, with retries waiting in a sorted set
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._promote = None
+
+    def push(self, item: dict[str, Any]) -> int:
+        return get_redis_connection("default").rpush(QUEUE_KEY, json.dumps(item))
+
+    def retry(self, item: dict[str, Any], due: float) -> None:
+        get_redis_connection("default").zadd(RETRY_KEY, {json.dumps(item): due})
+
+    def claim(self, size: int) -> list[dict[str, Any]]:
+        client = get_redis_connection("default")
+        if self._promote is None:
+            self._promote = client.register_script(PROMOTE_SCRIPT)
+        self._promote(keys=[RETRY_KEY, QUEUE_KEY], args=[time.time(), size])
+        items = cast(list[bytes] | None, client.lpop(QUEUE_KEY, size))
+        return [json.loads(item) for item in items or []]
+
+    def depth(self) -> int:
+        client = get_redis_connection("default")
+        return client.llen(QUEUE_KEY) + client.zcard(RETRY_KEY)
+
+
+def build_message(item: dict[str, Any]) -> EmailMessage:
+    """
+    Rebuilds a queued message
+    :param item: Serialized message
+    :return: The message, with its HTML alternative if any
+    """
+    message = EmailMultiAlternatives(
+        subject=item["subject"],
+        body=item["body"],
+        from_email=item["from_email"],
+        to=item["to"],
+    )
+    if item["html"]:
+        message.attach_alternative(content=item["html"], mimetype="text/html")
+    return message
+
+
+class MailSender:
+    """
+    Background thread sending queued messages every `interval` seconds,
+    or as soon as one is queued
+    """
+
+    def __init__(self, buffer: MailBuffer, config: dict[str, Any]) -> None:
+        self.buffer = buffer
+        self.backend: str = config["BACKEND"] or settings.EMAIL_BACKEND
+        self.batch_size: int = config["BATCH_SIZE"]
+        self.interval: float = config["INTERVAL_SECONDS"]
+        self.max_attempts: int = config["MAX_ATTEMPTS"]
+        self.retry_base_delay: float = config["RETRY_BASE_DELAY_SECONDS"]
+        self.retry_max_delay: float = config["RETRY_MAX_DELAY_SECONDS"]
+        self._wake = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._start_lock = threading.Lock()
+
+    def start(self) -> None:
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self.run, name="mail-sender", daemon=True
+                )
+                self._thread.start()
+
+    def notify(self) -> None:
+        """
+        Triggers a send now instead of at the next interval
+        """
+        self._wake.set()
+
+    def run(self) -> None:
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            while self.send() >= self.batch_size:
+                pass  # keep draining while full batches are waiting
+
+    def send(self) -> int:
+        """
+        Sends one batch over a single backend connection
+        :return: Number of messages claimed
+        """
+        try:
+            items = self.buffer.claim(self.batch_size)
+        except Exception as e:
+            logger.log(
+                level=logging.ERROR,
+                msg="Email Queue Unavailable",
+                extra={"reason": e.args},
+            )
+            return 0
+        if not items:
+            return 0
+        connection = get_connection(self.backend, fail_silently=False)
+        try:
+            connection.open()
+        except Exception as e:
+            for item in items:
+                self._failed(item, e)
+            return len(items)
+        try:
+            for item in items:
+                try:
+                    connection.send_messages([build_message(item)])
+                except Exception as e:
+                    self._failed(item, e)
+                    continue
+                sent.inc()
+                queue_latency.observe(time.time() - item["enqueued_at"])
+        finally:
+            connection.close()
+        return len(items)
+
+    def _failed(self, item: dict[str, Any], error: Exception) -> None:
+        """
+        Schedules a failed message again, or drops it after the last attempt
+        """
+        send_failures.inc()
+        item["attempts"] += 1
+        if item["attempts"] >= self.max_attempts:
+            dropped.inc()
+            logger.log(
+                level=logging.ERROR,
+                msg="Email Dropped",
+                extra={"to": item["to"], "reason": error.args},
+            )
+            return
+        delay = min(
+            self.retry_base_delay * 2 ** (item["attempts"] - 1), self.retry_max_delay
+        )
+        logger.log(
+            level=logging.WARNING,
+            msg="Email Send Failed",
+            extra={"to": item["to"], "retry_in": delay, "reason": error.args},
+        )
+        self.buffer.retry(item, time.time() + delay)
+
+
+_sender: MailSender | None = None
+_sender_lock = threading.Lock()
+
+
+def get_sender() -> MailSender:
+    """
+    Gets the process wide sender, choosing the buffer on first use.
+    `settings.EMAIL_QUEUE["BUFFER"]` may be "redis", "memory" or "auto".
+    :return: The sender, its thread is started on first use
+    """
+    global _sender
+    if _sender is None:
+        with _sender_lock:
+            if _sender is None:
+                config: dict[str, Any] = settings.EMAIL_QUEUE
+                use_redis = config["BUFFER"] == "redis" or (
+                    config["BUFFER"] == "auto" and redis_available()
+                )
+                _sender = MailSender(
+                    RedisMailBuffer() if use_redis else MailBuffer(), config
+                )
+    _sender.start()
+    return _sender
+
+
+queue_depth = metrics.gauge(
+    "email_queue_depth",
+    "Emails waiting to be sent, including scheduled retries",
+    function=lambda: get_sender().buffer.depth(),
+)
+
+
+def queue_email(
+    subject: str,
+    body: str,
+    to: list[str],
+    html: str | None = None,
+    from_email: str | None = None,
+) -> bool:
+    """
+    Queues an email for the background sender
+    :param subject: Subject line
+    :param body: Plain text body
+    :param to: Recipients
+    :param html: Optional HTML alternative
+    :param from_email: Sender, defaults to `settings.DEFAULT_FROM_EMAIL`
+    :return: True if the email was queued, else False
+    """
+    sender = get_sender()
+    try:
+        sender.buffer.push(
+            {
+                "id": str(uuid.uuid4()),  # keeps identical retries distinct
+                "subject": subject,
+                "body": body,
+                "from_email": from_email or settings.DEFAULT_FROM_EMAIL,
+                "to": to,
+                "html": html,
+                "attempts": 0,
+                "enqueued_at": time.time(),
+            }
+        )
+    except Exception as e:
+        logger.log(
+            level=logging.ERROR,
+            msg="Email Queue Unavailable",
+            extra={"to": to, "reason": e.args},
+        )
+        return False
+    enqueued.inc()
+    sender.notify()
+    return True
+
+
+def stats() -> dict[str, Any]:
+    """
+    Reports the queue's health for this process
+    :return: Queue depth, totals and delivery latency
+    """
+    latency = queue_latency.samples().get((), {"count": 0, "sum": 0.0})
+    return {
+        "queue_depth": queue_depth.value(),
+        "enqueued_total": enqueued.value(),
+        "sent_total": sent.value(),
+        "send_failures_total": send_failures.value(),
+        "dropped_total": dropped.value(),
+        "queue_latency_avg_seconds": (
+            latency["sum"] / latency["count"] if latency["count"] else 0.0
+        ),
+    }
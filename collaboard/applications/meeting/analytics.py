@@ -0,0 +1,165 @@
+"""
+This module stores the analytics stage run once a meeting has ended.
+
+`summarize` aggregates a meeting's responses in one grouped query (by question,
+minute and answer length bucket) plus a distinct participant count, and the
+result is stored as `MeetingStatistics.summary`. Dashboards read that one row
+instead of aggregating `Response` on every view.
+Summaries are computed by the scheduler `SUMMARY_DELAY_SECONDS` after the end,
+once the ingestion and counter buffers had time to reach the database;
+`manage.py rebuild_summaries` backfills or recomputes them.
+"""
+
+import uuid
+from collections import Counter
+from typing import Any
+
+from django.db.models import (
+    Case,
+    Count,
+    IntegerField,
+    QuerySet,
+    Sum,
+    Value,
+    When,
+)
+from django.db.models.functions import Length, TruncMinute
+from django.utils import timezone
+
+from .. import metrics
+from .models import Meeting, MeetingStatistics, Response
+
+SUMMARY_VERSION = 1  # bump when the layout below changes
+# Upper bounds of the answer length buckets, the last MUST MATCH `Response.text`
+LENGTH_BUCKETS = (10, 25, 50, 100, 200, 300, 500)
+
+summarized = metrics.counter(
+    "meeting_summaries_total", "Meeting summaries computed, by trigger"
+)
+
+
+def _length_bucket() -> Case:
+    return Case(
+        *[
+            When(length__lte=limit, then=Value(bucket))
+            for bucket, limit in enumerate(LENGTH_BUCKETS)
+        ],
+        default=Value(len(LENGTH_BUCKETS) - 1),
+        output_field=IntegerField(),
+    )
+
+
+def response_groups(meeting_id: uuid.UUID) -> QuerySet:
+    """
+    Builds the aggregate query of a meeting's responses
+    :param meeting_id: ID of the meeting
+    :return: Response and character counts by question index, minute and
+    length bucket
+    """
+    return (
+        Response.objects.filter(question__meeting_id=meeting_id)
+        .annotate(
+            length=Length("text"),
+            minute=TruncMinute("created_at"),
+        )
+        .annotate(bucket=_length_bucket())
+        .values("question__index", "minute", "bucket")
+        .annotate(count=Count("pk"), characters=Sum("length"))
+        .order_by()
+    )
+
+
+def summarize(meeting: Meeting, started_at: Any = None) -> dict[str, Any]:
+    """
+    Computes the summary of a meeting's responses
+    :param meeting: Meeting object, its `total_participants` must be up to date
+    :param started_at: Start time of the meeting, the response curve starts from
+    the first response when unknown
+    :return: JSON serializable summary
+    """
+    groups = response_groups(meeting.pk)
+    per_question: Counter[int] = Counter()
+    per_minute: Counter[Any] = Counter()
+    per_bucket: Counter[int] = Counter()
+    characters = 0
+    for group in groups:
+        per_question[group["question__index"]] += group["count"]
+        per_minute[group["minute"]] += group["count"]
+        per_bucket[group["bucket"]] += group["count"]
+        characters += group["characters"]
+    responding: int = Response.objects.filter(question__meeting=meeting).aggregate(
+        count=Count("participant_id", distinct=True)
+    )["count"]
+    total = sum(per_question.values())
+    curve: list[int] = []
+    if per_minute:
+        first = (started_at or min(per_minute)).replace(second=0, microsecond=0)
+        # responses stamped before the start (clock skew) count in its minute
+        last = max(max(per_minute), first)
+        curve = [0] * (int((last - first).total_seconds()) // 60 + 1)
+        for minute, count in per_minute.items():
+            curve[max(0, int((minute - first).total_seconds()) // 60)] += count
+    return {
+        "version": SUMMARY_VERSION,
+        "computed_at": timezone.now().isoformat(),
+        "total_responses": total,
+        "total_participants": meeting.total_participants,
+        "responding_participants": responding,
+        "participation_rate": (
+            round(responding / meeting.total_participants, 4)
+            if meeting.total_participants
+            else None
+        ),
+        "responses_per_question": {
+            str(index): count for index, count in sorted(per_question.items())
+        },
+        "responses_per_minute": curve,
+        "length_buckets": list(LENGTH_BUCKETS),
+        "responses_per_length_bucket": [
+            per_bucket[bucket] for bucket in range(len(LENGTH_BUCKETS))
+        ],
+        "average_length": round(characters / total, 1) if total else None,
+    }
+
+
+def store_summary(meeting_id: uuid.UUID, trigger: str = "end") -> bool:
+    """
+    Computes and stores the summary of an ended meeting, on its latest
+    statistics row (created for meetings that never had one)
+    :param meeting_id: ID of the meeting
+    :param trigger: "end" or "rebuild", for the metric
+    :return: False if the meeting is missing or hasn't ended
+    """
+    meeting: Meeting | None = Meeting.objects.filter(
+        pk=meeting_id, status=Meeting.Status.ENDED
+    ).first()
+    if meeting is None:
+        return False
+    row: MeetingStatistics | None = (
+        MeetingStatistics.objects.filter(meeting=meeting).order_by("-pk").first()
+    )
+    summary = summarize(meeting, row.start_time if row else None)
+    if row is None:
+        MeetingStatistics.objects.create(
+            meeting=meeting, end_time=meeting.updated_at, summary=summary
+        )
+    else:
+        MeetingStatistics.objects.filter(pk=row.pk).update(
+            summary=summary, updated_at=timezone.now()
+        )
+    summarized.inc(trigger=trigger)
+    return True
+
+
+def get_summary(meeting_id: uuid.UUID) -> dict[str, Any] | None:
+    """
+    Reads the stored summary of a meeting, in one indexed query
+    :param meeting_id: ID of the meeting
+    :return: The summary, else None while it isn't computed yet
+    """
+    return (
+        MeetingStatistics.objects.filter(meeting_id=meeting_id, summary__isnull=False)
+        .order_by("-pk")
+        .values_list("summary", flat=True)
+        .first()
+    )
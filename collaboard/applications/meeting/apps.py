@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class MeetingConfig(AppConfig):
     name = "applications.meeting"
+
+    def ready(self) -> None:
+        from . import signals  # noqa: F401
@@ -0,0 +1,487 @@
+"""
+This module stores the response ingestion pipeline.
+Submissions are acknowledged as soon as they are buffered (in Redis, or in
+memory for local development) and a background flusher writes them to the
+database in batches, on a size or time trigger. A batch that fails to be
+written `MAX_FLUSH_ATTEMPTS` times is moved to a dead letter list, so it
+doesn't hold back the submissions behind it.
+"""
+
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from datetime import datetime
+from typing import Any
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from django_redis import get_redis_connection
+from redis.exceptions import LockNotOwnedError, RedisError
+
+from .. import counters, metrics
+from ..authentication.models import CustomUser
+from ..realtime import events
+from ..realtime.brokers import redis_available
+from .models import Meeting, Question, Response
+
+logger = logging.getLogger(__name__)
+
+QUEUE_KEY = "meeting:responses:queue"
+PROCESSING_KEY = "meeting:responses:processing"  # claimed, not yet written batch
+ATTEMPTS_KEY = "meeting:responses:attempts"  # failed writes of the claimed batch
+DEAD_LETTER_KEY = "meeting:responses:dead_letter"  # batches given up on
+FLUSH_LOCK_KEY = "meeting:responses:flush_lock"
+RESPONSE_TEXT_MAX_LENGTH = 500  # MUST MATCH `Response.text` max_length
+
+# Moves up to ARGV[1] items from the queue to the processing list atomically
+CLAIM_SCRIPT = """
+local items = redis.call('LRANGE', KEYS[1], 0, tonumber(ARGV[1]) - 1)
+if #items > 0 then
+    redis.call('LTRIM', KEYS[1], #items, -1)
+    redis.call('RPUSH', KEYS[2], unpack(items))
+end
+return items
+"""
+
+# Counts a failed write of the claimed batch KEYS[1] (KEYS[2] holds the count)
+# and moves it to the dead letter list KEYS[3] once it reached ARGV[1] attempts.
+# Returns the attempts so far
+FAIL_SCRIPT = """
+local attempts = redis.call('INCR', KEYS[2])
+if attempts >= tonumber(ARGV[1]) then
+    local items = redis.call('LRANGE', KEYS[1], 0, -1)
+    if #items > 0 then
+        redis.call('RPUSH', KEYS[3], unpack(items))
+    end
+    redis.call('DEL', KEYS[1], KEYS[2])
+end
+return attempts
+"""
+
+ingested = metrics.counter(
+    "responses_ingested_total", "Responses accepted by the ingestion API"
+)
+ingest_rate = metrics.meter(
+    "responses_ingested_per_second", "Responses accepted per second (1 minute window)"
+)
+flushed = metrics.counter(
+    "responses_flushed_total", "Responses written to the database"
+)
+flush_failures = metrics.counter(
+    "response_flush_failures_total", "Batches that failed to be written"
+)
+dead_lettered = metrics.counter(
+    "responses_dead_lettered_total",
+    "Responses moved to the dead letter list after their batch kept failing",
+)
+flush_latency = metrics.histogram(
+    "response_flush_seconds", "Time taken to write one batch of responses"
+)
+
+
+class ResponseBuffer:
+    """
+    In-memory buffer, for a single process and tests.
+    Buffered responses are lost if the process dies.
+    """
+
+    def __init__(self) -> None:
+        self._queue: deque[str] = deque()
+        self._processing: list[str] = []
+        self._attempts = 0
+        self._dead_letter: list[str] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+    def push(self, item: dict[str, Any]) -> int:
+        """
+        Buffers a submission
+        :param item: JSON serializable submission
+        :return: Queue depth after the push
+        """
+        with self._lock:
+            self._queue.append(json.dumps(item))
+            return len(self._queue)
+
+    def claim(self, size: int) -> list[dict[str, Any]]:
+        """
+        Claims the next batch. A batch that was claimed but never acknowledged
+        is handed out again first.
+        :param size: Maximum batch size
+        :return: Submissions to write
+        """
+        with self._lock:
+            if not self._processing:
+                while self._queue and len(self._processing) < size:
+                    self._processing.append(self._queue.popleft())
+            return [json.loads(item) for item in self._processing]
+
+    def ack(self) -> None:
+        """
+        Drops the claimed batch once it has been written
+        """
+        with self._lock:
+            self._processing = []
+            self._attempts = 0
+
+    def fail(self, max_attempts: int) -> int:
+        """
+        Counts a failed write of the claimed batch, moving it to the dead letter
+        list after `max_attempts`, so it doesn't block the batches behind it
+        :param max_attempts: Attempts before the batch is given up on
+        :return: Attempts so far
+        """
+        with self._lock:
+            self._attempts += 1
+            attempts = self._attempts
+            if attempts >= max_attempts:
+                self._dead_letter.extend(self._processing)
+                self._processing = []
+                self._attempts = 0
+            return attempts
+
+    def depth(self) -> int:
+        return len(self._queue)
+
+    def dead_letter_depth(self) -> int:
+        return len(self._dead_letter)
+
+    def lock(self) -> Any:
+        """
+        Gets the lock making sure a single flusher writes at a time
+        """
+        return self._flush_lock
+
+
+class RedisResponseBuffer(ResponseBuffer):
+    """
+    Redis list buffer shared by every worker.
+    A claimed batch stays in a processing list until it is written, so a
+    crashed flusher's batch is written by the next one (at-least-once).
+    Replays are skipped by `Response.submission_id`.
+    """
+
+    LOCK_TIMEOUT_SECONDS = 30
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._claim = None
+        self._fail = None
+
+    def push(self, item: dict[str, Any]) -> int:
+        return get_redis_connection("default").rpush(QUEUE_KEY, json.dumps(item))
+
+    def claim(self, size: int) -> list[dict[str, Any]]:
+        client = get_redis_connection("default")
+        items = client.lrange(PROCESSING_KEY, 0, -1)
+        if not items:
+            if self._claim is None:
+                self._claim = client.register_script(CLAIM_SCRIPT)
+            items = self._claim(keys=[QUEUE_KEY, PROCESSING_KEY], args=[size])
+        return [json.loads(item) for item in items]
+
+    def ack(self) -> None:
+        get_redis_connection("default").delete(PROCESSING_KEY, ATTEMPTS_KEY)
+
+    def fail(self, max_attempts: int) -> int:
+        if self._fail is None:
+            self._fail = get_redis_connection("default").register_script(FAIL_SCRIPT)
+        return int(
+            self._fail(
+                keys=[PROCESSING_KEY, ATTEMPTS_KEY, DEAD_LETTER_KEY],
+                args=[max_attempts],
+            )
+        )
+
+    def depth(self) -> int:
+        return get_redis_connection("default").llen(QUEUE_KEY)
+
+    def dead_letter_depth(self) -> int:
+        return get_redis_connection("default").llen(DEAD_LETTER_KEY)
+
+    def lock(self) -> Any:
+        return get_redis_connection("default").lock(
+            FLUSH_LOCK_KEY, timeout=self.LOCK_TIMEOUT_SECONDS, blocking=False
+        )
+
+
+def write_responses(items: list[dict[str, Any]]) -> int:
+    """
+    Writes a batch of submissions and bumps the response counters of their
+    questions, meetings and hosts, in one transaction.
+    Submissions for unknown questions are dropped and replays (already written
+    submission IDs) are skipped, so counters stay exact under redelivery.
+    Responses are dated when they were accepted, not when the batch is written.
+    :param items: Buffered submissions
+    :return: Number of responses written
+    """
+    meeting_ids = {item["meeting_id"] for item in items}
+    questions = {
+        (str(meeting_id), index): (pk, meeting_id, user_id)
+        for pk, meeting_id, index, user_id in Question.objects.filter(
+            meeting_id__in=meeting_ids
+        ).values_list("pk", "meeting_id", "index", "meeting__user_id")
+    }
+    submissions = {uuid.UUID(item["submission_id"]): item for item in items}
+    already_written = set(
+        Response.objects.filter(submission_id__in=submissions).values_list(
+            "submission_id", flat=True
+        )
+    )
+    responses = []
+    per_question: Counter[int] = Counter()
+    per_meeting: Counter[uuid.UUID] = Counter()
+    per_user: Counter[int] = Counter()
+    for submission_id, item in submissions.items():
+        question = questions.get((item["meeting_id"], item["question_index"]))
+        if question is None or submission_id in already_written:
+            continue
+        question_id, meeting_id, user_id = question
+        responses.append(
+            Response(
+                question_id=question_id,
+                participant_id=item["participant_id"],
+                submission_id=submission_id,
+                text=item["text"],
+                # items buffered before `accepted_at` existed are dated now
+                created_at=(
+                    datetime.fromisoformat(item["accepted_at"])
+                    if "accepted_at" in item
+                    else timezone.now()
+                ),
+            )
+        )
+        per_question[question_id] += 1
+        per_meeting[meeting_id] += 1
+        per_user[user_id] += 1
+    with transaction.atomic():
+        Response.objects.bulk_create(responses)
+        counters.increment_now(Question, "total_responses", per_question)
+        counters.increment_now(Meeting, "total_responses", per_meeting)
+        counters.increment_now(CustomUser, "total_responses", per_user)
+    return len(responses)
+
+
+class ResponseFlusher:
+    """
+    Background thread writing buffered responses, either every
+    `interval` seconds or as soon as `batch_size` responses are waiting
+    """
+
+    def __init__(
+        self,
+        buffer: ResponseBuffer,
+        batch_size: int,
+        interval: float,
+        max_attempts: int,
+    ) -> None:
+        self.buffer = buffer
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_attempts = max_attempts
+        self._wake = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._start_lock = threading.Lock()
+
+    def start(self) -> None:
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self.run, name="response-flusher", daemon=True
+                )
+                self._thread.start()
+
+    def notify(self) -> None:
+        """
+        Triggers a flush now instead of at the next interval
+        """
+        self._wake.set()
+
+    def run(self) -> None:
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            while self.flush() >= self.batch_size:
+                pass  # keep draining while full batches are waiting
+
+    def flush(self) -> int:
+        """
+        Writes one batch, if no other flusher is busy
+        :return: Number of submissions claimed
+        """
+        try:
+            lock = self.buffer.lock()
+            if not lock.acquire(blocking=False):
+                return 0
+        except Exception as e:  # e.g. Redis is down, `run` must keep going
+            self._failed(e)
+            return 0
+        close_old_connections()
+        items: list[dict[str, Any]] = []
+        try:
+            items = self.buffer.claim(self.batch_size)
+            if not items:
+                return 0
+            start = time.perf_counter()
+            written = write_responses(items)
+            self.buffer.ack()
+            flush_latency.observe(time.perf_counter() - start)
+            flushed.inc(written)
+            return len(items)
+        except Exception as e:
+            self._failed(e)
+            if items:  # a failed claim isn't the batch's fault
+                self._give_up(len(items))
+            return 0
+        finally:
+            try:
+                lock.release()
+            except LockNotOwnedError:
+                # the flush outlived the lock, another flusher may have started
+                logger.log(
+                    level=logging.WARNING,
+                    msg="Response Flush Lock Expired",
+                    extra={"timeout": RedisResponseBuffer.LOCK_TIMEOUT_SECONDS},
+                )
+            except RedisError as e:  # it expires on its own
+                self._failed(e)
+            close_old_connections()
+
+    def _failed(self, error: Exception) -> None:
+        flush_failures.inc()
+        logger.log(
+            level=logging.ERROR,
+            msg="Response Flush Failed",
+            extra={"reason": error.args},
+        )
+
+    def _give_up(self, claimed: int) -> None:
+        try:
+            attempts = self.buffer.fail(self.max_attempts)
+        except Exception as e:
+            logger.log(
+                level=logging.ERROR,
+                msg="Response Flush Attempt Not Recorded",
+                extra={"reason": e.args},
+            )
+            return
+        if attempts >= self.max_attempts:
+            dead_lettered.inc(claimed)
+            logger.log(
+                level=logging.ERROR,
+                msg="Response Batch Dead Lettered",
+                extra={"responses": claimed, "attempts": attempts},
+            )
+
+
+_flusher: ResponseFlusher | None = None
+_flusher_lock = threading.Lock()
+
+
+def build_flusher() -> ResponseFlusher:
+    """
+    Builds a flusher from `settings.RESPONSE_INGEST`, without starting it.
+    `BUFFER` may be "redis", "memory" or "auto".
+    :return: The flusher
+    """
+    config: dict[str, Any] = settings.RESPONSE_INGEST
+    use_redis = config["BUFFER"] == "redis" or (
+        config["BUFFER"] == "auto" and redis_available()
+    )
+    return ResponseFlusher(
+        RedisResponseBuffer() if use_redis else ResponseBuffer(),
+        batch_size=config["BATCH_SIZE"],
+        interval=config["FLUSH_INTERVAL_SECONDS"],
+        max_attempts=config["MAX_FLUSH_ATTEMPTS"],
+    )
+
+
+def get_flusher(start: bool = True) -> ResponseFlusher:
+    """
+    Gets the process wide flusher, built on first use
+    :param start: Start its thread if it isn't running, processes flushing in
+    the foreground (see `flush_responses`) or only reading its buffer don't
+    :return: The flusher
+    """
+    global _flusher
+    if _flusher is None:
+        with _flusher_lock:
+            if _flusher is None:
+                _flusher = build_flusher()
+    if start:
+        _flusher.start()
+    return _flusher
+
+
+queue_depth = metrics.gauge(
+    "response_queue_depth",
+    "Responses buffered and waiting to be written",
+    function=lambda: get_flusher(start=False).buffer.depth(),
+)
+
+
+def submit_response(
+    meeting_id: uuid.UUID,
+    participant_id: str,
+    question_index: int,
+    text: str,
+    submission_id: uuid.UUID | None = None,
+) -> uuid.UUID:
+    """
+    Buffers a participant's response and notifies the meeting's sockets.
+    Returns once the submission is buffered, it is written by the flusher.
+    The caller checks the meeting is in progress and the question was shown.
+    :param meeting_id: ID of the meeting
+    :param participant_id: ID of the participant
+    :param question_index: Index of the question answered
+    :param text: Validated response text
+    :param submission_id: Client supplied idempotency key, generated if missing
+    :return: The submission ID
+    """
+    submission_id = submission_id or uuid.uuid4()
+    flusher = get_flusher()
+    depth = flusher.buffer.push(
+        {
+            "meeting_id": str(meeting_id),
+            "participant_id": participant_id,
+            "question_index": question_index,
+            "submission_id": str(submission_id),
+            "text": text,
+            "accepted_at": timezone.now().isoformat(),
+        }
+    )
+    ingested.inc()
+    ingest_rate.mark()
+    if depth >= flusher.batch_size:
+        flusher.notify()
+    events.publish_meeting_event(
+        meeting_id,
+        events.NEW_RESPONSE,
+        {"question_index": question_index, "count": 1},
+    )
+    return submission_id
+
+
+def stats() -> dict[str, Any]:
+    """
+    Reports the pipeline's health for this process
+    :return: Ingest rate, queue depth, totals and flush latency
+    """
+    latency = flush_latency.samples().get((), {"count": 0, "sum": 0.0})
+    return {
+        "ingest_rate_per_second": ingest_rate.rate(),
+        "queue_depth": queue_depth.value(),
+        "ingested_total": ingested.value(),
+        "flushed_total": flushed.value(),
+        "flush_failures_total": flush_failures.value(),
+        "dead_lettered_total": dead_lettered.value(),
+        "dead_letter_depth": get_flusher(start=False).buffer.dead_letter_depth(),
+        "flushes": latency["count"],
+        "flush_latency_avg_seconds": (
+            latency["sum"] / latency["count"] if latency["count"] else 0.0
+        ),
+    }
@@ -0,0 +1,95 @@
+"""
+Compares per-request latency with and without database connection reuse
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+
+from .... import instrumentation
+
+MODES = ("off", "persistent", "pool")
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs --requests access code lookups (a one query view) through the full "
+        "request cycle in one subprocess per DB_CONNECTIONS mode (off, "
+        "persistent, pool) and prints their latency and how many connections "
+        "each set up. Uses the configured database, nothing is written. "
+        "The pool mode needs `psycopg[binary,pool]` installed."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument("--modes", default=",".join(MODES))
+        parser.add_argument("--child", action="store_true", help="internal")
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        if options["child"]:
+            self.stdout.write(json.dumps(self._measure(options["requests"])))
+            return
+        for mode in options["modes"].split(","):
+            result = subprocess.run(
+                [
+                    sys.executable,
+                    sys.argv[0],
+                    "benchmark_db_connections",
+                    "--child",
+                    "--requests",
+                    str(options["requests"]),
+                ],
+                capture_output=True,
+                text=True,
+                env={**os.environ, "DB_CONNECTIONS": mode},
+            )
+            if result.returncode != 0:
+                error = result.stderr.strip().splitlines()[-1:] or ["unknown error"]
+                self.stdout.write(f"{mode}: unavailable ({error[0]})")
+                continue
+            stats = json.loads(result.stdout.strip().splitlines()[-1])
+            self.stdout.write(
+                f"{mode}: p50 {stats['p50_ms']:.2f} ms, p95 {stats['p95_ms']:.2f} ms, "
+                f"mean {stats['mean_ms']:.2f} ms, "
+                f"{stats['connections_set_up']:.0f} connections set up"
+                + (
+                    f", {stats['server_connections']} opened to the server"
+                    if stats["server_connections"] is not None
+                    else ""
+                )
+            )
+
+    @staticmethod
+    def _measure(requests: int) -> dict[str, Any]:
+        client = Client()
+        path = reverse("participant_meeting", args=["0" * 8])  # resolved by query
+        client.get(path)  # warm up imports and URL resolution
+        durations = []
+        for _ in range(requests):
+            start = time.perf_counter()
+            client.get(path)
+            durations.append((time.perf_counter() - start) * 1000)
+        durations.sort()
+        pool = getattr(connection, "pool", None)
+        return {
+            "mode": settings.DB_CONNECTIONS_MODE,
+            "p50_ms": statistics.median(durations),
+            "p95_ms": durations[int(len(durations) * 0.95) - 1],
+            "mean_ms": statistics.mean(durations),
+            "connections_set_up": instrumentation.connections_set_up.value(
+                database="default"
+            ),
+            "server_connections": (
+                pool.get_stats().get("connections_num") if pool is not None else None
+            ),
+        }
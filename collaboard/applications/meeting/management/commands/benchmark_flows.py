@@ -0,0 +1,369 @@
+"""
+Load tests the signup to meeting end flow and stores the results for comparison
+"""
+
+import json
+import re
+import statistics
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable
+
+from django.conf import settings
+from django.core import mail as django_mail
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db import connection, connections
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .... import counters, mail
+from ....testing import fake_redis_settings
+from ... import ingest, services
+from ...models import Meeting
+
+PASSWORD = "Benchmark-Password-1"
+TOKEN_PATTERN = re.compile(r"\?token=([\w:\-]+)")
+PERCENTILES = (50, 95, 99)
+
+
+class Recorder:
+    """
+    Collects latency, query count and status of every request, by endpoint
+    """
+
+    def __init__(self) -> None:
+        self.samples: dict[str, list[tuple[float, int, bool]]] = {}
+        self.wall_seconds: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def call(self, endpoint: str, request: Callable[[], Any], ok: int) -> Any:
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = request()
+            elapsed = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self.samples.setdefault(endpoint, []).append(
+                (elapsed, len(queries), response.status_code == ok)
+            )
+        return response
+
+    def phase(
+        self, endpoint: str, jobs: list[Callable[[], Any]], concurrency: int
+    ) -> list[Any]:
+        """
+        Runs one endpoint's requests with `concurrency` clients in flight
+        :return: The responses, in job order
+        """
+
+        def run(job: Callable[[], Any]) -> Any:
+            try:
+                return job()
+            finally:
+                # the test client doesn't close connections, and the test
+                # database can't be dropped while workers hold one
+                connections.close_all()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            responses = list(executor.map(run, jobs))
+        self.wall_seconds[endpoint] = time.perf_counter() - start
+        return responses
+
+    def report(self) -> dict[str, Any]:
+        report = {}
+        for endpoint, samples in self.samples.items():
+            latencies = sorted(sample[0] for sample in samples)
+            queries = [sample[1] for sample in samples]
+            report[endpoint] = {
+                "requests": len(samples),
+                "errors": sum(1 for sample in samples if not sample[2]),
+                "throughput_per_second": round(
+                    len(samples) / self.wall_seconds[endpoint], 1
+                ),
+                **{
+                    f"p{percentile}_ms": round(
+                        latencies[
+                            min(len(latencies) - 1, len(latencies) * percentile // 100)
+                        ],
+                        2,
+                    )
+                    for percentile in PERCENTILES
+                },
+                "queries_mean": round(statistics.mean(queries), 1),
+                "queries_max": max(queries),
+            }
+        return report
+
+
+class Command(BaseCommand):
+    help = (
+        "Drives signup, email verification, login, meeting creation, host page "
+        "loads, participant joins and response submissions through the full "
+        "middleware stack with concurrent clients, against a fresh test database. "
+        "Reports throughput, p50/p95/p99 latency and queries per endpoint and "
+        "stores them as JSON; --compare prints the change against earlier results. "
+        "Query counts only cover the request thread (not the hashing pool or "
+        "background writers). SQLite serializes writes, use a low --concurrency."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--hosts", type=int, default=10)
+        parser.add_argument("--questions", type=int, default=50)
+        parser.add_argument("--host-loads", type=int, default=100)
+        parser.add_argument("--participants", type=int, default=200)
+        parser.add_argument("--responses", type=int, default=3)
+        parser.add_argument("--concurrency", type=int, default=16)
+        parser.add_argument(
+            "--redis",
+            choices=["fake", "real"],
+            default="fake",
+            help="'fake' swaps Redis for the in-memory backends",
+        )
+        parser.add_argument("--keepdb", action="store_true")
+        parser.add_argument(
+            "--output", type=Path, default=settings.BASE_DIR / "benchmarks"
+        )
+        parser.add_argument("--compare", type=Path)
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        overrides = fake_redis_settings() if options["redis"] == "fake" else {}
+        overrides["EMAIL_QUEUE"] = {
+            **overrides.get("EMAIL_QUEUE", settings.EMAIL_QUEUE),
+            "BACKEND": "django.core.mail.backends.locmem.EmailBackend",
+        }
+        overrides["RATE_LIMITS"] = {
+            **overrides.get("RATE_LIMITS", settings.RATE_LIMITS),
+            "ENABLED": False,
+        }
+        # `Client` requests come from "testserver", which `manage.py test` allows
+        overrides["ALLOWED_HOSTS"] = [*settings.ALLOWED_HOSTS, "testserver"]
+        with override_settings(**overrides):
+            old_name = connection.creation.create_test_db(
+                verbosity=0, autoclobber=True, serialize=False, keepdb=options["keepdb"]
+            )
+            try:
+                recorder = self._run(options)
+            finally:
+                connection.creation.destroy_test_db(
+                    old_name, verbosity=0, keepdb=options["keepdb"]
+                )
+        result = {
+            "commit": self._commit(),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "database": connection.vendor,
+            "redis": options["redis"],
+            "options": {
+                name: options[name]
+                for name in (
+                    "hosts",
+                    "questions",
+                    "host_loads",
+                    "participants",
+                    "responses",
+                    "concurrency",
+                )
+            },
+            "endpoints": recorder.report(),
+        }
+        options["output"].mkdir(parents=True, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        path = options["output"] / f"{stamp}-{result['commit']}.json"
+        path.write_text(json.dumps(result, indent=2))
+        self.stdout.write(json.dumps(result["endpoints"], indent=2))
+        self.stdout.write(f"Results stored in {path}")
+        if options["compare"]:
+            self._compare(json.loads(options["compare"].read_text()), result)
+
+    def _run(self, options: dict[str, Any]) -> Recorder:
+        recorder = Recorder()
+        concurrency: int = options["concurrency"]
+        hosts = [
+            (f"host{i}@collaboard.invalid", Client()) for i in range(options["hosts"])
+        ]
+
+        # signup, then verify with the token of the emailed link, then login
+        django_mail.outbox = []
+        recorder.phase(
+            "signup",
+            [
+                lambda email=email, client=client: recorder.call(
+                    "signup",
+                    lambda: client.post(
+                        reverse("signup"),
+                        {
+                            "first_name": "Bench",
+                            "last_name": "Mark",
+                            "email": email,
+                            "password1": PASSWORD,
+                            "password2": PASSWORD,
+                        },
+                    ),
+                    ok=200,
+                )
+                for email, client in hosts
+            ],
+            concurrency,
+        )
+        sender = mail.get_sender()
+        deadline = time.monotonic() + 30
+        while len(django_mail.outbox) < len(hosts) and time.monotonic() < deadline:
+            if not sender.send():
+                time.sleep(0.05)  # a batch may be in flight on the sender thread
+        tokens = []
+        for message in django_mail.outbox:
+            match = TOKEN_PATTERN.search(message.alternatives[0][0])
+            if match is None:
+                raise CommandError("Verification email without a token")
+            tokens.append(match.group(1))
+        recorder.phase(
+            "verify_email",
+            [
+                lambda token=token: recorder.call(
+                    "verify_email",
+                    lambda: Client().get(reverse("verify_email"), {"token": token}),
+                    ok=200,
+                )
+                for token in tokens
+            ],
+            concurrency,
+        )
+        recorder.phase(
+            "login",
+            [
+                lambda email=email, client=client: recorder.call(
+                    "login",
+                    lambda: client.post(
+                        reverse("login"), {"email": email, "password": PASSWORD}
+                    ),
+                    ok=302,
+                )
+                for email, client in hosts
+            ],
+            concurrency,
+        )
+
+        payload = json.dumps(
+            {
+                "title": "Benchmark",
+                "description": "Benchmark meeting",
+                "duration": 30,
+                "questions": [f"Question {i}" for i in range(options["questions"])],
+            }
+        )
+        created = recorder.phase(
+            "create_meeting",
+            [
+                lambda client=client: recorder.call(
+                    "create_meeting",
+                    lambda: client.post(
+                        reverse("create_meeting"),
+                        payload,
+                        content_type="application/json",
+                    ),
+                    ok=200,
+                )
+                for _, client in hosts
+            ],
+            concurrency,
+        )
+        host_pages = [
+            (client, response.json()["redirect"])
+            for (_, client), response in zip(hosts, created)
+            if response.status_code == 200
+        ]
+        recorder.phase(
+            "host_meeting",
+            [
+                lambda page=host_pages[i % len(host_pages)]: recorder.call(
+                    "host_meeting", lambda: page[0].get(page[1]), ok=200
+                )
+                for i in range(options["host_loads"])
+            ],
+            concurrency,
+        )
+
+        meetings = list(Meeting.objects.values_list("pk", "access_code"))
+        participants = [
+            (meetings[i % len(meetings)], Client())
+            for i in range(options["participants"])
+        ]
+        recorder.phase(
+            "join",
+            [
+                lambda meeting=meeting, client=client: recorder.call(
+                    "join",
+                    lambda: client.post(
+                        reverse("participant_meeting", args=[meeting[1]]),
+                        {"participantName": "Participant"},
+                    ),
+                    ok=302,
+                )
+                for meeting, client in participants
+            ],
+            concurrency,
+        )
+        for meeting_id, _ in meetings:
+            services.start_meeting(meeting_id)
+        recorder.phase(
+            "submit_response",
+            [
+                lambda meeting=meeting, client=client: recorder.call(
+                    "submit_response",
+                    lambda: client.post(
+                        reverse("submit_response", args=[meeting[0]]),
+                        json.dumps({"question_index": 1, "text": "An answer"}),
+                        content_type="application/json",
+                    ),
+                    ok=202,
+                )
+                for meeting, client in participants
+                for _ in range(options["responses"])
+            ],
+            concurrency,
+        )
+
+        # drain the background writers so the run ends in a consistent state
+        flusher = ingest.get_flusher()
+        while flusher.flush():
+            pass
+        counters.get_folder().fold()
+        for meeting_id, _ in meetings:
+            services.end_meeting(meeting_id)
+        return recorder
+
+    @staticmethod
+    def _commit() -> str:
+        try:
+            return subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"],
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return "unknown"
+
+    def _compare(self, before: dict[str, Any], after: dict[str, Any]) -> None:
+        self.stdout.write(f"Compared with {before['commit']} ({before['created_at']})")
+        for endpoint, stats in after["endpoints"].items():
+            previous = before["endpoints"].get(endpoint)
+            if previous is None:
+                continue
+            changes = ", ".join(
+                f"{name} {previous[name]} -> {stats[name]}"
+                f" ({(stats[name] - previous[name]) / previous[name]:+.0%})"
+                if previous[name]
+                else f"{name} {previous[name]} -> {stats[name]}"
+                for name in (
+                    "throughput_per_second",
+                    "p50_ms",
+                    "p95_ms",
+                    "p99_ms",
+                    "queries_mean",
+                )
+            )
+            self.stdout.write(f"{endpoint}: {changes}")
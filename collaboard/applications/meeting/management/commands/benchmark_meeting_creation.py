@@ -0,0 +1,93 @@
+"""
+Benchmarks the meeting creation views, reporting database round trips per request
+"""
+
+import json
+import statistics
+import time
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from ....authentication.models import CustomUser
+from ...views import create_meeting, create_meeting_batch
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures round trips and latency of `create_meeting` and "
+        "`create_meeting_batch`. Everything runs in a rolled back transaction, "
+        "so each request's own transaction shows up as a SAVEPOINT/RELEASE pair."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--questions", type=int, nargs="+", default=[1, 10, 50])
+        parser.add_argument("--batch-sizes", type=int, nargs="+", default=[10, 50])
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        factory = RequestFactory()
+        with transaction.atomic():
+            user = CustomUser.objects.create_user(
+                email="benchmark@collaboard.invalid",
+                first_name="Bench",
+                last_name="Mark",
+            )
+            for count in options["questions"]:
+                payload = self._payload(count)
+                self._report(
+                    f"create_meeting ({count} questions)",
+                    lambda: self._post(factory, user, create_meeting, payload),
+                    options["repeat"],
+                )
+            for size in options["batch_sizes"]:
+                payload = {
+                    "template": self._payload(10),
+                    "meetings": [{"title": f"Meeting {i}"} for i in range(size)],
+                }
+                self._report(
+                    f"create_meeting_batch ({size} meetings x 10 questions)",
+                    lambda: self._post(factory, user, create_meeting_batch, payload),
+                    options["repeat"],
+                )
+            transaction.set_rollback(True)
+
+    @staticmethod
+    def _payload(questions: int) -> dict[str, Any]:
+        return {
+            "title": "Benchmark",
+            "description": "Benchmark meeting",
+            "duration": 30,
+            "questions": [f"Question {i}" for i in range(questions)],
+        }
+
+    @staticmethod
+    def _post(
+        factory: RequestFactory, user: CustomUser, view: Any, payload: dict[str, Any]
+    ) -> None:
+        request = factory.post(
+            "/meeting/create/",
+            data=json.dumps(payload),
+            content_type="application/json",
+        )
+        request.user = user
+        response = view(request)
+        assert response.status_code in (200, 201), response.content
+
+    def _report(self, label: str, run: Any, repeat: int) -> None:
+        round_trips: list[int] = []
+        durations: list[float] = []
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                run()
+                durations.append((time.perf_counter() - start) * 1000)
+            round_trips.append(len(queries))
+        self.stdout.write(
+            f"{label}: {max(round_trips)} round trips/request, "
+            f"p50 {statistics.median(durations):.2f} ms, "
+            f"max {max(durations):.2f} ms"
+        )
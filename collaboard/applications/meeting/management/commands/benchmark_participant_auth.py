@@ -0,0 +1,80 @@
+"""
+Compares verifying a participant token with looking the participant up in a session
+"""
+
+import statistics
+import time
+import uuid
+from importlib import import_module
+from typing import Any, Callable
+
+from django.core.management.base import BaseCommand, CommandParser
+
+from ... import services, tokens
+
+SESSION_ENGINES = {
+    "session_store": "applications.session_store",
+    "db": "django.contrib.sessions.backends.db",
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Times --iterations participant authorizations: verifying a signed "
+        "token (no I/O) against loading the participant from a session, with "
+        "the Redis session store and the database session engine. Uses the "
+        "configured cache and database; the test sessions are deleted after."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--iterations", type=int, default=10000)
+        parser.add_argument("--engines", default=",".join(SESSION_ENGINES))
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        participant = {
+            "meeting_id": str(uuid.uuid4()),
+            "access_code": "0" * services.ACCESS_CODE_LENGTH,
+            "participant_id": str(uuid.uuid4()),
+            "name": "Benchmark Participant",
+        }
+        token = tokens.issue(participant)
+        self._report(
+            f"token ({len(token)} bytes)",
+            self._time(lambda: tokens.verify(token), options["iterations"]),
+        )
+        for name in options["engines"].split(","):
+            store = import_module(SESSION_ENGINES[name]).SessionStore
+            session = store()
+            session[services.PARTICIPANT_SESSION_KEY] = participant
+            session.create()
+            try:
+                self._report(
+                    f"session ({name})",
+                    self._time(
+                        # a fresh store per request, as `SessionMiddleware` does
+                        lambda: store(session.session_key).get(
+                            services.PARTICIPANT_SESSION_KEY
+                        ),
+                        options["iterations"],
+                    ),
+                )
+            finally:
+                session.delete()
+
+    @staticmethod
+    def _time(check: Callable[[], Any], iterations: int) -> list[float]:
+        check()  # warm up imports, connections and the signer
+        durations = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            check()
+            durations.append((time.perf_counter() - start) * 1_000_000)
+        durations.sort()
+        return durations
+
+    def _report(self, name: str, durations: list[float]) -> None:
+        self.stdout.write(
+            f"{name}: p50 {statistics.median(durations):.1f} us, "
+            f"p95 {durations[int(len(durations) * 0.95) - 1]:.1f} us, "
+            f"mean {statistics.mean(durations):.1f} us"
+        )
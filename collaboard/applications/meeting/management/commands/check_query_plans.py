@@ -0,0 +1,100 @@
+"""
+Checks with EXPLAIN that the hot meeting queries are served by indexes
+"""
+
+import uuid
+from typing import Any, Callable
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db import connection, transaction
+from django.db.models import QuerySet
+
+from ... import analytics, export
+from ...models import Meeting, Question, Response
+
+# What a full table (or full index) scan looks like in each backend's plan
+SEQUENTIAL_SCANS: dict[str, Callable[[str], tuple[str, ...]]] = {
+    "postgresql": lambda table: (f"Seq Scan on {table}",),
+    "sqlite": lambda table: (f"SCAN {table}", f"SCAN TABLE {table}"),
+}
+
+
+def hot_queries(meeting_id: uuid.UUID) -> dict[str, tuple[QuerySet, list[str]]]:
+    """
+    The queries run per request or per flushed batch, with the tables that must
+    not be scanned. The ID doesn't need to exist, only the plans matter.
+    :return: Querysets and tables, by name
+    """
+    question_table = Question._meta.db_table
+    response_table = Response._meta.db_table
+    return {
+        "meeting_questions": (
+            Question.objects.filter(meeting_id=meeting_id).order_by("index"),
+            [question_table],
+        ),
+        "flush_questions": (
+            Question.objects.filter(meeting_id__in=[meeting_id]).values_list(
+                "pk", "meeting_id", "index", "meeting__user_id"
+            ),
+            [question_table],
+        ),
+        "flush_replays": (
+            Response.objects.filter(submission_id__in=[uuid.uuid4()]).values_list(
+                "submission_id", flat=True
+            ),
+            [response_table],
+        ),
+        "export_rows": (export.response_rows(meeting_id), [response_table]),
+        "summary_participants": (
+            Response.objects.filter(question__meeting_id=meeting_id).values(
+                "participant_id"
+            ),
+            [response_table],
+        ),
+        "summary_groups": (analytics.response_groups(meeting_id), [response_table]),
+        "active_access_code": (
+            Meeting.objects.filter(access_code="00000000")
+            .exclude(status=Meeting.Status.ENDED)
+            .values_list("pk", flat=True),
+            [Meeting._meta.db_table],
+        ),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs EXPLAIN on the hot meeting queries (questions by meeting and index, "
+        "response flushes, exports, analytics and access codes) and fails if "
+        "one of them scans a whole table. On PostgreSQL sequential scans are "
+        "disabled for the check, so small tables don't hide a missing index. "
+        "Use --verbose-plans to print every plan."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--verbose-plans", action="store_true")
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        scan = SEQUENTIAL_SCANS.get(connection.vendor)
+        if scan is None:
+            raise CommandError(f"No plan check for the {connection.vendor} backend")
+        failures = []
+        meeting_id = uuid.uuid4()
+        with transaction.atomic():
+            if connection.vendor == "postgresql":
+                with connection.cursor() as cursor:
+                    cursor.execute("SET LOCAL enable_seqscan = off")
+            for name, (queryset, tables) in hot_queries(meeting_id).items():
+                plan = queryset.explain()
+                if options["verbose_plans"]:
+                    self.stdout.write(f"{name}:\n{plan}\n")
+                scanned = [
+                    table
+                    for table in tables
+                    if any(pattern in plan for pattern in scan(table))
+                ]
+                if scanned:
+                    failures.append(f"{name} scans {', '.join(scanned)}")
+                else:
+                    self.stdout.write(f"{name}: index used")
+        if failures:
+            raise CommandError("; ".join(failures))
@@ -0,0 +1,34 @@
+"""
+Runs the response flusher in the foreground, or reports the pipeline's health
+"""
+
+import json
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandParser
+
+from ... import ingest
+
+
+class Command(BaseCommand):
+    help = (
+        "Writes buffered responses to the database until interrupted. "
+        "Use --once to drain the buffer and exit, --stats to print metrics."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--once", action="store_true")
+        parser.add_argument("--stats", action="store_true")
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        flusher = ingest.get_flusher(start=False)  # flushes in the foreground
+        if options["stats"]:
+            self.stdout.write(json.dumps(ingest.stats(), indent=2))
+            return
+        if options["once"]:
+            total = 0
+            while written := flusher.flush():
+                total += written
+            self.stdout.write(f"Flushed {total} responses")
+            return
+        flusher.run()
@@ -0,0 +1,116 @@
+"""
+Prints the optional PostgreSQL DDL partitioning responses by month
+"""
+
+import datetime
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db import connection
+from django.utils import timezone
+
+from ...models import Response
+
+
+def month_start(value: datetime.date, offset: int = 0) -> datetime.date:
+    month = value.month - 1 + offset
+    return datetime.date(value.year + month // 12, month % 12 + 1, 1)
+
+
+def partition_name(table: str, start: datetime.date) -> str:
+    return f"{table}_{start:%Y_%m}"
+
+
+def partition_end(table: str, name: str) -> datetime.date:
+    """
+    Reads the exclusive upper bound of a partition from its name, monthly
+    partitions being `<table>_YYYY_MM` and the converted rows `<table>_before_YYYY_MM`
+    """
+    suffix = name.removeprefix(f"{table}_")
+    if suffix.startswith("before_"):
+        return datetime.datetime.strptime(suffix[7:], "%Y_%m").date()
+    return month_start(datetime.datetime.strptime(suffix, "%Y_%m").date(), 1)
+
+
+class Command(BaseCommand):
+    help = (
+        "Prints (does not run) the PostgreSQL statements for monthly range "
+        "partitioning of responses on `created_at`, so old meetings can be "
+        "archived by detaching a partition instead of deleting rows. "
+        "--convert prints the one-off conversion of the existing table (run it "
+        "in a maintenance window, it copies every row). Then run the command "
+        "monthly: it prints the partitions for the next --months-ahead months "
+        "and, with --archive-before YYYY-MM, the DETACH of the partitions ending "
+        "by then (dump and drop them afterwards). "
+        "Partitioning makes the primary key (id, created_at) and the "
+        "submission_id constraint (submission_id, created_at); replays stay "
+        "skipped by the flusher's lookup of already written submissions."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--convert", action="store_true")
+        parser.add_argument("--months-ahead", type=int, default=3)
+        parser.add_argument("--archive-before")
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        table = Response._meta.db_table
+        today = timezone.now().date()
+        statements = []
+        if options["convert"]:
+            statements += self._conversion(table, month_start(today))
+        for offset in range(options["months_ahead"] + 1):
+            start = month_start(today, offset)
+            statements.append(
+                f"CREATE TABLE IF NOT EXISTS {partition_name(table, start)} "
+                f"PARTITION OF {table} FOR VALUES FROM ('{start}') "
+                f"TO ('{month_start(start, 1)}');"
+            )
+        if options["archive_before"]:
+            try:
+                cutoff = datetime.datetime.strptime(
+                    options["archive_before"], "%Y-%m"
+                ).date()
+            except ValueError:
+                raise CommandError("--archive-before must be YYYY-MM")
+            statements += [
+                f"ALTER TABLE {table} DETACH PARTITION {name} CONCURRENTLY;"
+                for name in self._partitions(table)
+                if partition_end(table, name) <= cutoff
+            ]
+        self.stdout.write("\n".join(statements))
+
+    @staticmethod
+    def _partitions(table: str) -> list[str]:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT child.relname FROM pg_inherits"
+                " JOIN pg_class child ON child.oid = pg_inherits.inhrelid"
+                " JOIN pg_class parent ON parent.oid = pg_inherits.inhparent"
+                " WHERE parent.relname = %s ORDER BY child.relname",
+                [table],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    @staticmethod
+    def _conversion(table: str, current: datetime.date) -> list[str]:
+        return [
+            "BEGIN;",
+            f"ALTER TABLE {table} RENAME TO {table}_unpartitioned;",
+            "ALTER INDEX response_question_created_idx"
+            " RENAME TO response_question_created_old_idx;",
+            f"CREATE TABLE {table} (LIKE {table}_unpartitioned"
+            " INCLUDING DEFAULTS INCLUDING IDENTITY) PARTITION BY RANGE (created_at);",
+            f"ALTER TABLE {table} ADD PRIMARY KEY (id, created_at);",
+            f"ALTER TABLE {table} ADD UNIQUE (submission_id, created_at);",
+            f"CREATE INDEX response_question_created_idx ON {table} "
+            "(question_id, created_at) INCLUDE (participant_id);",
+            f"ALTER TABLE {table} ADD FOREIGN KEY (question_id) "
+            "REFERENCES meeting_question (id) DEFERRABLE INITIALLY DEFERRED;",
+            f"CREATE TABLE {table}_before_{current:%Y_%m} PARTITION OF {table} "
+            f"FOR VALUES FROM (MINVALUE) TO ('{current}');",
+            f"INSERT INTO {table} SELECT * FROM {table}_unpartitioned;",
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+            f"(SELECT coalesce(max(id), 0) + 1 FROM {table}), false);",
+            f"DROP TABLE {table}_unpartitioned;",
+            "COMMIT;",
+        ]
@@ -0,0 +1,68 @@
+"""
+Computes the analytics summaries of ended meetings, in parallel chunks
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import close_old_connections
+
+from ... import analytics
+from ...models import Meeting, MeetingStatistics
+
+
+def summarize_chunk(meeting_ids: list[Any]) -> int:
+    """
+    Stores the summaries of a chunk of meetings, on a worker thread
+    :return: Number of summaries stored
+    """
+    close_old_connections()
+    try:
+        return sum(
+            analytics.store_summary(meeting_id, trigger="rebuild")
+            for meeting_id in meeting_ids
+        )
+    finally:
+        close_old_connections()
+
+
+class Command(BaseCommand):
+    help = (
+        "Backfills the summary of every ended meeting that has none, or of every "
+        "ended meeting with --all (e.g. after SUMMARY_VERSION changed). "
+        "Chunks of --chunk-size meetings are summarized by --workers threads, "
+        "each summary being its own aggregate query run by the database."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--all", action="store_true")
+        parser.add_argument("--chunk-size", type=int, default=100)
+        parser.add_argument("--workers", type=int, default=4)
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        meetings = Meeting.objects.filter(status=Meeting.Status.ENDED)
+        if not options["all"]:
+            meetings = meetings.exclude(
+                pk__in=MeetingStatistics.objects.filter(summary__isnull=False).values(
+                    "meeting_id"
+                )
+            )
+        meeting_ids = list(meetings.order_by("pk").values_list("pk", flat=True))
+        size: int = options["chunk_size"]
+        chunks = [
+            meeting_ids[start : start + size]
+            for start in range(0, len(meeting_ids), size)
+        ]
+        start = time.perf_counter()
+        done = 0
+        with ThreadPoolExecutor(max_workers=options["workers"]) as executor:
+            for future in as_completed(
+                executor.submit(summarize_chunk, chunk) for chunk in chunks
+            ):
+                done += future.result()
+                self.stdout.write(f"{done}/{len(meeting_ids)} meetings summarized")
+        self.stdout.write(
+            f"Summarized {done} meetings in {time.perf_counter() - start:.1f} s"
+        )
@@ -0,0 +1,136 @@
+"""
+Recomputes the denormalized counters in bulk and reports drift
+"""
+
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import models
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce, Greatest
+
+from .... import counters
+from ....authentication.models import CustomUser
+from ...models import Meeting, Question, Response
+
+
+def _aggregate(queryset: models.QuerySet, group_by: str, aggregate: Any) -> Any:
+    """
+    Builds a correlated `COALESCE((SELECT <aggregate> ... GROUP BY ...), 0)`
+    """
+    return Coalesce(
+        Subquery(
+            queryset.order_by()
+            .values(group_by)
+            .annotate(total=aggregate)
+            .values("total"),
+            output_field=models.IntegerField(),
+        ),
+        0,
+    )
+
+
+def _expected_counters() -> list[tuple[type[models.Model], str, Any]]:
+    """
+    Gets the (model, counter field, expected value expression) of every counter.
+    Participants who joined without answering leave no rows behind, so
+    participant totals are only ever raised to the number of distinct responders.
+    """
+    meeting_participants = _aggregate(
+        Response.objects.filter(question__meeting=OuterRef("pk")),
+        "question__meeting",
+        Count("participant_id", distinct=True),
+    )
+    return [
+        (
+            Question,
+            "total_responses",
+            _aggregate(
+                Response.objects.filter(question=OuterRef("pk")),
+                "question",
+                Count("pk"),
+            ),
+        ),
+        (
+            Meeting,
+            "total_responses",
+            _aggregate(
+                Response.objects.filter(question__meeting=OuterRef("pk")),
+                "question__meeting",
+                Count("pk"),
+            ),
+        ),
+        (
+            Meeting,
+            "total_participants",
+            Greatest("total_participants", meeting_participants),
+        ),
+        (
+            CustomUser,
+            "total_meetings",
+            _aggregate(
+                Meeting.objects.filter(user=OuterRef("pk")), "user", Count("pk")
+            ),
+        ),
+        (
+            CustomUser,
+            "total_responses",
+            _aggregate(
+                Response.objects.filter(question__meeting__user=OuterRef("pk")),
+                "question__meeting__user",
+                Count("pk"),
+            ),
+        ),
+        (
+            CustomUser,
+            "total_participants",
+            _aggregate(
+                Meeting.objects.filter(user=OuterRef("pk")),
+                "user",
+                Sum("total_participants"),
+            ),
+        ),
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        "Folds buffered counter deltas, then recomputes every denormalized "
+        "counter and reports the rows that drifted. Use --fix to correct them."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--fix", action="store_true")
+        parser.add_argument("--chunk-size", type=int, default=1000)
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        counters.get_folder().fold()
+        chunk_size: int = options["chunk_size"]
+        for model, field, expected in _expected_counters():
+            drifting = (
+                model._default_manager.annotate(expected=expected)
+                .exclude(**{field: models.F("expected")})
+                .values_list("pk", field, "expected")
+            )
+            drift_rows = 0
+            drift_total = 0
+            chunk: list[Any] = []
+            for pk, stored, actual in drifting.iterator(chunk_size=chunk_size):
+                drift_rows += 1
+                drift_total += actual - stored
+                chunk.append(pk)
+                if options["fix"] and len(chunk) >= chunk_size:
+                    self._fix(model, field, expected, chunk)
+                    chunk = []
+            if options["fix"] and chunk:
+                self._fix(model, field, expected, chunk)
+            self.stdout.write(
+                f"{model._meta.label}.{field}: {drift_rows} rows drifted "
+                f"(net {drift_total:+d})" + (", fixed" if options["fix"] else "")
+            )
+
+    @staticmethod
+    def _fix(
+        model: type[models.Model], field: str, expected: Any, pks: list[Any]
+    ) -> None:
+        model._default_manager.filter(pk__in=pks).update(**{field: expected})
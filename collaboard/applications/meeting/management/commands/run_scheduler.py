@@ -0,0 +1,50 @@
+"""
+Runs the meeting lifecycle scheduler in the foreground, or reports its state
+"""
+
+import json
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandParser
+
+from ... import scheduler
+
+
+class Command(BaseCommand):
+    help = (
+        "Ends meetings whose duration has elapsed until interrupted, for "
+        "deployments without an ASGI lifespan. Use --once to re-schedule every "
+        "meeting in progress, end the overdue ones, store the due summaries and "
+        "exit, --stats to print the number of scheduled meetings and the next "
+        "deadline."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument("--once", action="store_true")
+        parser.add_argument("--stats", action="store_true")
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        meeting_scheduler = scheduler.get_scheduler(start=False)
+        meeting_scheduler.keep_in_foreground()  # this process' only loop
+        if options["stats"]:
+            self.stdout.write(
+                json.dumps(
+                    {
+                        "scheduled": meeting_scheduler.queue.depth(),
+                        "next_deadline": meeting_scheduler.queue.next_deadline(),
+                        "expired_total": scheduler.expired.value(),
+                    },
+                    indent=2,
+                )
+            )
+            return
+        if options["once"]:
+            seeded = meeting_scheduler.seed()
+            total = 0
+            while ended := meeting_scheduler.expire():
+                total += ended
+            while meeting_scheduler.summarize():
+                pass
+            self.stdout.write(f"Scheduled {seeded} meetings, {total} were due")
+            return
+        meeting_scheduler.run()
@@ -0,0 +1,34 @@
+# Generated by Django 6.0 on 2026-10-17 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("meeting", "0004_alter_meeting_duration"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="meeting",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("not_started", "Not started"),
+                    ("in_progress", "In progress"),
+                    ("ended", "Ended"),
+                ],
+                default="not_started",
+                help_text="The lifecycle state of the meeting",
+                max_length=20,
+            ),
+        ),
+        migrations.AddField(
+            model_name="meeting",
+            name="current_question",
+            field=models.PositiveIntegerField(
+                default=0,
+                help_text="The index of the question currently shown (0 = not started)",
+            ),
+        ),
+    ]
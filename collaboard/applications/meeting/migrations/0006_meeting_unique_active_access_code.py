@@ -0,0 +1,49 @@
+# Generated by Django 6.0 on 2026-10-17 10:02
+
+import secrets
+
+from django.db import migrations, models
+
+
+def reassign_duplicate_access_codes(apps, schema_editor):
+    """
+    Gives a fresh code to every active meeting sharing its code with another one,
+    so the partial unique constraint can be created on existing data
+    """
+    Meeting = apps.get_model("meeting", "Meeting")
+    active = Meeting.objects.exclude(status="ended")
+    taken = set(active.values_list("access_code", flat=True))
+    duplicates = (
+        active.values("access_code")
+        .annotate(total=models.Count("id"))
+        .filter(total__gt=1)
+        .values_list("access_code", flat=True)
+    )
+    for code in list(duplicates):
+        for meeting in active.filter(access_code=code).order_by("created_at")[1:]:
+            new_code = code
+            while new_code in taken:
+                new_code = f"{secrets.randbelow(10**8):08d}"
+            taken.add(new_code)
+            meeting.access_code = new_code
+            meeting.save(update_fields=["access_code"])
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("meeting", "0005_meeting_status_current_question"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            reassign_duplicate_access_codes, migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name="meeting",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("status", "ended"), _negated=True),
+                fields=("access_code",),
+                name="unique_active_access_code",
+            ),
+        ),
+    ]
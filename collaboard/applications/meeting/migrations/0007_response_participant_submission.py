@@ -0,0 +1,45 @@
+# Generated by Django 6.0 on 2026-10-17 11:20
+
+import uuid
+
+from django.db import migrations, models
+
+
+def populate_submission_ids(apps, schema_editor):
+    Response = apps.get_model("meeting", "Response")
+    responses = list(Response.objects.only("pk"))
+    for response in responses:
+        response.submission_id = uuid.uuid4()
+    Response.objects.bulk_update(responses, ["submission_id"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("meeting", "0006_meeting_unique_active_access_code"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="response",
+            name="participant_id",
+            field=models.UUIDField(
+                help_text="The participant that submitted the response", null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="response",
+            name="submission_id",
+            field=models.UUIDField(editable=False, null=True),
+        ),
+        migrations.RunPython(populate_submission_ids, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="response",
+            name="submission_id",
+            field=models.UUIDField(
+                default=uuid.uuid4,
+                editable=False,
+                help_text="Idempotency key, replayed submissions are written once",
+                unique=True,
+            ),
+        ),
+    ]
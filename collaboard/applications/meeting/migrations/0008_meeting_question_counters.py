@@ -0,0 +1,27 @@
+# Generated by Django 6.0 on 2026-10-17 12:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("meeting", "0007_response_participant_submission"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="meeting",
+            name="total_participants",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="meeting",
+            name="total_responses",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="question",
+            name="total_responses",
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
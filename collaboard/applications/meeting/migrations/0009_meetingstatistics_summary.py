@@ -0,0 +1,20 @@
+# Generated by Django 6.0 on 2026-10-17 14:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("meeting", "0008_meeting_question_counters"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="meetingstatistics",
+            name="summary",
+            field=models.JSONField(
+                help_text="Response analytics computed once the meeting ended (see analytics)",
+                null=True,
+            ),
+        ),
+    ]
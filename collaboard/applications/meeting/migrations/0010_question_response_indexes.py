@@ -0,0 +1,53 @@
+# Generated by Django 6.0 on 2026-10-17 15:05
+
+from django.db import migrations, models
+
+
+def renumber_duplicate_question_indexes(apps, schema_editor):
+    """
+    Renumbers the questions of every meeting holding two questions with the same
+    index, in their current order, so the unique constraint can be created on
+    existing data
+    """
+    Question = apps.get_model("meeting", "Question")
+    meeting_ids = (
+        Question.objects.values("meeting_id", "index")
+        .annotate(total=models.Count("id"))
+        .filter(total__gt=1)
+        .values_list("meeting_id", flat=True)
+    )
+    for meeting_id in set(meeting_ids):
+        questions = list(
+            Question.objects.filter(meeting_id=meeting_id).order_by(
+                "index", "created_at", "id"
+            )
+        )
+        for index, question in enumerate(questions, start=1):
+            question.index = index
+        Question.objects.bulk_update(questions, ["index"])
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("meeting", "0009_meetingstatistics_summary"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            renumber_duplicate_question_indexes, migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name="question",
+            constraint=models.UniqueConstraint(
+                fields=("meeting", "index"), name="unique_question_index"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="response",
+            index=models.Index(
+                fields=["question", "created_at"],
+                include=("participant_id",),
+                name="response_question_created_idx",
+            ),
+        ),
+    ]
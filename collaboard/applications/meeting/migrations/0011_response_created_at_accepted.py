@@ -0,0 +1,18 @@
+# Generated by Django 6.1.2 on 2026-10-17 02:18
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("meeting", "0010_question_response_indexes"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="response",
+            name="created_at",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
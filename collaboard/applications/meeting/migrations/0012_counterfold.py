@@ -0,0 +1,19 @@
+# Generated by Django 6.1.2 on 2026-10-17 02:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("meeting", "0011_response_created_at_accepted"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CounterFold",
+            fields=[
+                ("fold_id", models.UUIDField(primary_key=True, serialize=False)),
+                ("applied_at", models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+        ),
+    ]
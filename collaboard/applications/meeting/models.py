@@ -7,12 +7,19 @@ from django.core.validators import (
     MinValueValidator,
 )
 from django.db import models
+from django.db.models import Index, Q, UniqueConstraint
+from django.utils import timezone
 
 from ..authentication.models import CustomUser
 
 
 # Create your models here.
 class Meeting(models.Model):
+    class Status(models.TextChoices):
+        NOT_STARTED = "not_started", "Not started"
+        IN_PROGRESS = "in_progress", "In progress"
+        ENDED = "ended", "Ended"
+
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     access_code = models.CharField(
         null=False,
@@ -50,8 +57,34 @@ class Meeting(models.Model):
             MinValueValidator(1),
         ],  # TODO: Update this to 5 minutes later for PROD
     )
+    status = models.CharField(
+        max_length=20,
+        choices=Status.choices,
+        default=Status.NOT_STARTED,
+        null=False,
+        help_text="The lifecycle state of the meeting",
+    )
+    current_question = models.PositiveIntegerField(
+        default=0,
+        null=False,
+        help_text="The index of the question currently shown (0 = not started)",
+    )
+    total_participants = models.PositiveIntegerField(null=False, default=0)
+    total_responses = models.PositiveIntegerField(null=False, default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    objects = models.Manager()
+
+    class Meta:
+        constraints = [
+            # Codes are only reserved while a meeting can still be joined, the
+            # partial unique index also serves the join-by-code lookup
+            UniqueConstraint(
+                fields=["access_code"],
+                condition=~Q(status="ended"),
+                name="unique_active_access_code",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.user}"
@@ -63,8 +96,13 @@ class MeetingStatistics(models.Model):
     )
     start_time = models.DateTimeField(null=True)
     end_time = models.DateTimeField(null=True)
+    summary = models.JSONField(
+        null=True,
+        help_text="Response analytics computed once the meeting ended (see analytics)",
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    objects = models.Manager()
 
     def __str__(self):
         return f"Stats for {self.meeting.title}"
@@ -87,8 +125,16 @@ class Question(models.Model):
     index = models.PositiveIntegerField(
         null=False, blank=False, help_text="The index of the question in the meeting"
     )
+    total_responses = models.PositiveIntegerField(null=False, default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    objects = models.Manager()
+
+    class Meta:
+        constraints = [
+            # Also serves every "questions of a meeting by index" lookup
+            UniqueConstraint(fields=["meeting", "index"], name="unique_question_index"),
+        ]
 
     def __str__(self):
         return self.text[:50]  # First 50 chars
@@ -105,8 +151,46 @@ class Response(models.Model):
     text = models.CharField(
         max_length=500, blank=False, null=False, help_text="The response text"
     )
-    created_at = models.DateTimeField(auto_now_add=True)
+    participant_id = models.UUIDField(
+        null=True, help_text="The participant that submitted the response"
+    )
+    submission_id = models.UUIDField(
+        unique=True,
+        default=uuid.uuid4,
+        editable=False,
+        help_text="Idempotency key, replayed submissions are written once",
+    )
+    # set by the ingestion pipeline to when the submission was accepted, as
+    # responses are written in batches (see `ingest.write_responses`)
+    created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
+    objects = models.Manager()
+
+    class Meta:
+        indexes = [
+            # Responses of a question in submission order (exports, analytics);
+            # `participant_id` is included so participation counts can be
+            # answered from the index alone on PostgreSQL
+            Index(
+                fields=["question", "created_at"],
+                include=["participant_id"],
+                name="response_question_created_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"Response to: {self.question.text[:30]}"
+
+
+class CounterFold(models.Model):
+    """
+    A fold of buffered counter deltas, recorded in the transaction applying
+    them so a fold replayed after a crash isn't applied twice (see `counters`)
+    """
+
+    fold_id = models.UUIDField(primary_key=True)
+    applied_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    objects = models.Manager()
+
+    def __str__(self) -> str:
+        return f"Counter fold {self.fold_id}"
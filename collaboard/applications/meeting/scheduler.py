@@ -0,0 +1,408 @@
+"""
+This module stores the meeting lifecycle scheduler, ending meetings once their
+`duration` has elapsed.
+
+Deadlines live in a sorted set scored by their timestamp (in Redis, or in a
+heap for local development), so one thread per process serves any number of
+meetings: it sleeps until the earliest deadline (at most `POLL_INTERVAL_SECONDS`,
+the delay to notice deadlines scheduled by other processes), claims every due
+meeting atomically and ends it through `services.end_meeting`.
+The database stays the source of truth: on start the scheduler re-schedules
+every meeting in progress, so deadlines lost with a process or with Redis are
+restored, and overdue meetings end straight away.
+Ended meetings are queued the same way for their analytics summary
+(see `analytics`), `SUMMARY_DELAY_SECONDS` after their end.
+"""
+
+import heapq
+import logging
+import threading
+import time
+import uuid
+from datetime import timedelta
+from typing import Any, cast
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F, Max
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django_redis import get_redis_connection
+
+from .. import metrics
+from ..realtime.brokers import redis_available
+from . import analytics, services
+from .models import Meeting, MeetingStatistics
+
+logger = logging.getLogger(__name__)
+
+DEADLINES_KEY = "meeting:deadlines"  # meeting IDs scored by their end timestamp
+SUMMARIES_KEY = "meeting:summaries"  # ended meeting IDs scored by their summary time
+SUMMARY_SEED_HOURS = 24  # meetings ended this recently get a missing summary on start
+
+# Removes and returns up to ARGV[2] members due by ARGV[1], with their scores,
+# so concurrent schedulers never claim the same meeting
+CLAIM_SCRIPT = """
+local due = redis.call(
+    'ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'WITHSCORES', 'LIMIT', 0, ARGV[2]
+)
+for i = 1, #due, 2 do
+    redis.call('ZREM', KEYS[1], due[i])
+end
+return due
+"""
+
+expired = metrics.counter(
+    "meetings_expired_total", "Meetings ended by the scheduler as their time was up"
+)
+expiry_lag = metrics.histogram(
+    "meeting_expiry_lag_seconds", "Delay between a meeting's deadline and its end"
+)
+expiry_failures = metrics.counter(
+    "meeting_expiry_failures_total", "Due meetings that failed to be ended"
+)
+summary_failures = metrics.counter(
+    "meeting_summary_failures_total", "Meeting summaries that failed to be computed"
+)
+
+
+class DeadlineQueue:
+    """
+    In-memory deadlines, for a single process and tests
+    """
+
+    def __init__(self) -> None:
+        self._heap: list[tuple[float, str]] = []
+        self._deadlines: dict[str, float] = {}  # current deadline of each meeting
+        self._lock = threading.Lock()
+
+    def schedule(self, meeting_id: str, deadline: float) -> None:
+        with self._lock:
+            self._deadlines[meeting_id] = deadline
+            heapq.heappush(self._heap, (deadline, meeting_id))
+
+    def cancel(self, meeting_id: str) -> None:
+        with self._lock:
+            self._deadlines.pop(meeting_id, None)  # its heap entry is skipped
+
+    def _pop_stale(self) -> None:
+        while self._heap and self._deadlines.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+
+    def claim(self, now: float, size: int) -> list[tuple[str, float]]:
+        """
+        Takes up to `size` meetings whose deadline has passed
+        :return: (meeting ID, deadline) pairs
+        """
+        due = []
+        with self._lock:
+            self._pop_stale()
+            while self._heap and self._heap[0][0] <= now and len(due) < size:
+                deadline, meeting_id = heapq.heappop(self._heap)
+                del self._deadlines[meeting_id]
+                due.append((meeting_id, deadline))
+                self._pop_stale()
+        return due
+
+    def next_deadline(self) -> float | None:
+        with self._lock:
+            self._pop_stale()
+            return self._heap[0][0] if self._heap else None
+
+    def depth(self) -> int:
+        return len(self._deadlines)
+
+
+class RedisDeadlineQueue(DeadlineQueue):
+    """
+    Redis sorted set shared by every worker
+    """
+
+    def __init__(self, key: str) -> None:
+        super().__init__()
+        self.key = key
+        self._claim = None
+
+    def schedule(self, meeting_id: str, deadline: float) -> None:
+        get_redis_connection("default").zadd(self.key, {meeting_id: deadline})
+
+    def cancel(self, meeting_id: str) -> None:
+        get_redis_connection("default").zrem(self.key, meeting_id)
+
+    def claim(self, now: float, size: int) -> list[tuple[str, float]]:
+        client = get_redis_connection("default")
+        if self._claim is None:
+            self._claim = client.register_script(CLAIM_SCRIPT)
+        due = self._claim(keys=[self.key], args=[now, size])
+        return [(due[i].decode(), float(due[i + 1])) for i in range(0, len(due), 2)]
+
+    def next_deadline(self) -> float | None:
+        first = cast(
+            list[tuple[bytes, float]],
+            get_redis_connection("default").zrange(self.key, 0, 0, withscores=True),
+        )
+        return first[0][1] if first else None
+
+    def depth(self) -> int:
+        return get_redis_connection("default").zcard(self.key)
+
+
+def running_deadlines() -> list[tuple[str, float]]:
+    """
+    Computes the deadline of every meeting in progress from the database.
+    Meetings started before their start was recorded count from their last
+    update, which never ends them early.
+    :return: (meeting ID, deadline timestamp) pairs
+    """
+    meetings = (
+        Meeting.objects.filter(status=Meeting.Status.IN_PROGRESS)
+        .annotate(started=Coalesce(Max("statistics__start_time"), F("updated_at")))
+        .values_list("pk", "started", "duration")
+    )
+    return [
+        (str(meeting_id), started.timestamp() + duration * 60)
+        for meeting_id, started, duration in meetings
+    ]
+
+
+def unsummarized_meetings() -> list[str]:
+    """
+    Finds the meetings ended in the last `SUMMARY_SEED_HOURS` without a summary,
+    older ones are left to `manage.py rebuild_summaries`
+    :return: Meeting IDs
+    """
+    since = timezone.now() - timedelta(hours=SUMMARY_SEED_HOURS)
+    return [
+        str(meeting_id)
+        for meeting_id in MeetingStatistics.objects.filter(
+            end_time__gte=since, summary__isnull=True
+        ).values_list("meeting_id", flat=True)
+    ]
+
+
+class MeetingScheduler:
+    """
+    Background thread ending meetings at their deadline and summarizing them
+    afterwards, see the module docstring
+    """
+
+    def __init__(
+        self,
+        queue: DeadlineQueue,
+        summaries: DeadlineQueue,
+        batch_size: int,
+        interval: float,
+        summary_delay: float,
+    ) -> None:
+        self.queue = queue
+        self.summaries = summaries
+        self.batch_size = batch_size
+        self.interval = interval
+        self.summary_delay = summary_delay
+        self._wake = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._start_lock = threading.Lock()
+        self._foreground = False
+
+    def start(self) -> None:
+        with self._start_lock:
+            if self._foreground:
+                return
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self.run, name="meeting-scheduler", daemon=True
+                )
+                self._thread.start()
+
+    def keep_in_foreground(self) -> None:
+        """
+        Stops `start` from running the thread, for a process calling `run` (or
+        `expire`) itself. Ending a meeting gets the scheduler, which would
+        otherwise start a second loop.
+        """
+        with self._start_lock:
+            self._foreground = True
+
+    def schedule(self, meeting_id: uuid.UUID, deadline: float) -> None:
+        """
+        Sets the time at which a meeting ends, replacing any earlier deadline
+        :param meeting_id: ID of the meeting
+        :param deadline: Unix timestamp
+        """
+        self.queue.schedule(str(meeting_id), deadline)
+        self._wake.set()  # the thread may be sleeping past the new deadline
+
+    def cancel(self, meeting_id: uuid.UUID) -> None:
+        self.queue.cancel(str(meeting_id))
+
+    def schedule_summary(self, meeting_id: uuid.UUID) -> None:
+        """
+        Queues the summary of a meeting that just ended
+        :param meeting_id: ID of the meeting
+        """
+        self.summaries.schedule(str(meeting_id), time.time() + self.summary_delay)
+
+    def seed(self) -> int:
+        """
+        Schedules every meeting in progress and the missing summaries,
+        see the module docstring
+        :return: Number of meetings scheduled
+        """
+        close_old_connections()
+        try:
+            deadlines = running_deadlines()
+            unsummarized = unsummarized_meetings()
+        finally:
+            close_old_connections()
+        for meeting_id, deadline in deadlines:
+            self.queue.schedule(meeting_id, deadline)
+        for meeting_id in unsummarized:
+            self.summaries.schedule(meeting_id, time.time())
+        return len(deadlines) + len(unsummarized)
+
+    def run(self) -> None:
+        while True:
+            try:
+                self.seed()
+                break
+            except Exception as e:
+                logger.log(
+                    level=logging.ERROR,
+                    msg="Meeting Scheduler Seed Failed",
+                    extra={"reason": e.args},
+                )
+                time.sleep(self.interval)
+        while True:
+            while self.expire() >= self.batch_size:
+                pass  # keep going while full batches are due
+            while self.summarize() >= self.batch_size:
+                pass
+            self._wake.wait(self._sleep_seconds())
+            self._wake.clear()
+
+    def _sleep_seconds(self) -> float:
+        try:
+            deadlines = [
+                deadline
+                for deadline in (
+                    self.queue.next_deadline(),
+                    self.summaries.next_deadline(),
+                )
+                if deadline is not None
+            ]
+        except Exception:
+            return self.interval
+        if not deadlines:
+            return self.interval
+        return min(self.interval, max(0.0, min(deadlines) - time.time()))
+
+    def expire(self) -> int:
+        """
+        Ends one batch of due meetings
+        :return: Number of meetings claimed
+        """
+        close_old_connections()
+        try:
+            due = self.queue.claim(time.time(), self.batch_size)
+        except Exception as e:
+            logger.log(
+                level=logging.ERROR,
+                msg="Meeting Deadlines Claim Failed",
+                extra={"reason": e.args},
+            )
+            return 0
+        try:
+            for meeting_id, deadline in due:
+                try:
+                    if services.end_meeting(uuid.UUID(meeting_id)) is not None:
+                        expired.inc()
+                        expiry_lag.observe(max(0.0, time.time() - deadline))
+                except Exception as e:
+                    expiry_failures.inc()
+                    # retried once the poll interval has passed
+                    self.queue.schedule(meeting_id, time.time() + self.interval)
+                    logger.log(
+                        level=logging.ERROR,
+                        msg="Meeting Expiry Failed",
+                        extra={"meeting_id": meeting_id, "reason": e.args},
+                    )
+            return len(due)
+        finally:
+            close_old_connections()
+
+    def summarize(self) -> int:
+        """
+        Stores the summaries of one batch of due meetings
+        :return: Number of meetings claimed
+        """
+        close_old_connections()
+        try:
+            due = self.summaries.claim(time.time(), self.batch_size)
+        except Exception as e:
+            logger.log(
+                level=logging.ERROR,
+                msg="Meeting Summaries Claim Failed",
+                extra={"reason": e.args},
+            )
+            return 0
+        try:
+            for meeting_id, _ in due:
+                try:
+                    analytics.store_summary(uuid.UUID(meeting_id))
+                except Exception as e:
+                    summary_failures.inc()
+                    logger.log(
+                        level=logging.ERROR,
+                        msg="Meeting Summary Failed",
+                        extra={"meeting_id": meeting_id, "reason": e.args},
+                    )
+            return len(due)
+        finally:
+            close_old_connections()
+
+
+_scheduler: MeetingScheduler | None = None
+_scheduler_lock = threading.Lock()
+
+
+def build_scheduler() -> MeetingScheduler:
+    """
+    Builds a scheduler from `settings.MEETING_SCHEDULER`, without starting it.
+    `BUFFER` may be "redis", "memory" or "auto".
+    :return: The scheduler
+    """
+    config: dict[str, Any] = settings.MEETING_SCHEDULER
+    use_redis = config["BUFFER"] == "redis" or (
+        config["BUFFER"] == "auto" and redis_available()
+    )
+    return MeetingScheduler(
+        RedisDeadlineQueue(DEADLINES_KEY) if use_redis else DeadlineQueue(),
+        RedisDeadlineQueue(SUMMARIES_KEY) if use_redis else DeadlineQueue(),
+        batch_size=config["BATCH_SIZE"],
+        interval=config["POLL_INTERVAL_SECONDS"],
+        summary_delay=config["SUMMARY_DELAY_SECONDS"],
+    )
+
+
+def get_scheduler(start: bool = True) -> MeetingScheduler:
+    """
+    Gets the process wide scheduler, built on first use
+    :param start: Start its thread if it isn't running, processes scheduling in
+    the foreground (see `run_scheduler`) or only reading its queues don't
+    :return: The scheduler
+    """
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = build_scheduler()
+    if start:
+        _scheduler.start()
+    return _scheduler
+
+
+scheduled = metrics.gauge(
+    "meeting_deadlines_scheduled",
+    "Meetings waiting for their deadline",
+    function=lambda: get_scheduler(start=False).queue.depth(),
+)
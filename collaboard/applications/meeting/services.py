@@ -3,16 +3,47 @@ This module stores the business logic to be used in `views.py`
 """
 
 import logging
+import secrets
 import uuid
-from random import randint
+from collections import Counter
+from typing import Any
 
+from django.conf import settings
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.http import HttpRequest
+from django.utils import timezone
+from django.utils.http import quote_etag
 
+from .. import caching, counters
 from ..authentication.models import CustomUser
-from .models import Meeting, Question
+from ..realtime import events
+from . import analytics, scheduler, tokens
+from .models import Meeting, MeetingStatistics, Question
 
 logger = logging.getLogger(__name__)
 
+ACCESS_CODE_LENGTH = 8
+ACCESS_CODE_CANDIDATES = 8  # codes checked per allocation query
+ACCESS_CODE_SAVE_ATTEMPTS = 3  # retries when a concurrent meeting took the code
+ACCESS_CODE_CONSTRAINT = "unique_active_access_code"  # MUST MATCH `Meeting.Meta`
+ACCESS_CODE_CACHE_SECONDS = 60 * 60 * 2  # 2 hours, longer than any meeting
+ACCESS_CODE_CACHE_PREFIX = "meeting:access_code:"
+ENDED_CODE_CACHE_PREFIX = "meeting:ended_code:"  # codes of recently ended meetings
+PARTICIPANT_SESSION_KEY = "participant"  # joined before tokens (see `tokens`)
+PARTICIPANT_NAME_MAX_LENGTH = 30  # MUST MATCH the join form in `index.html`
+MAX_QUESTIONS = 50  # MUST MATCH `CONFIG.MAX_QUESTIONS` in `create_meeting.js`
+MAX_BATCH_MEETINGS = 50  # meetings created per batch request
+QUESTION_TEXT_MAX_LENGTH = 300  # MUST MATCH `Question.text` max_length
+
+meeting_cache = caching.VersionedCache(
+    "meeting",
+    max_entries=settings.MEETING_CACHE["LOCAL_MAX_ENTRIES"],
+    local_ttl=settings.MEETING_CACHE["LOCAL_TTL_SECONDS"],
+    timeout=settings.MEETING_CACHE["TIMEOUT_SECONDS"],
+)
+
 
 def generate_access_code(num_of_digits: int) -> str:
     """
@@ -20,77 +51,495 @@ def generate_access_code(num_of_digits: int) -> str:
     :param num_of_digits: The number of digits to be in the access code
     :return: The access code
     """
-    return "".join(["{}".format(randint(0, 9)) for _ in range(0, num_of_digits)])
+    return f"{secrets.randbelow(10**num_of_digits):0{num_of_digits}d}"
+
+
+def allocate_access_codes(count: int) -> list[str]:
+    """
+    Allocates `count` distinct access codes that no active meeting is using.
+    Codes are only reserved by active meetings, so collisions stay rare however
+    large the table grows; candidates are checked in one indexed query per round
+    rather than one query per code.
+    :param count: Number of codes needed
+    :return: Free access codes (the unique constraint still guards races)
+    """
+    codes: set[str] = set()
+    while len(codes) < count:
+        candidates = {
+            generate_access_code(ACCESS_CODE_LENGTH)
+            for _ in range(count - len(codes) + ACCESS_CODE_CANDIDATES)
+        } - codes
+        taken = set(
+            Meeting.objects.filter(access_code__in=candidates)
+            .exclude(status=Meeting.Status.ENDED)
+            .values_list("access_code", flat=True)
+        )
+        codes.update(sorted(candidates - taken)[: count - len(codes)])
+    return list(codes)
+
+
+def allocate_access_code() -> str:
+    """
+    Allocates a single access code, see `allocate_access_codes`
+    :return: A free access code
+    """
+    return allocate_access_codes(1)[0]
+
+
+def _access_code_collision(error: IntegrityError) -> bool:
+    constraint = getattr(
+        getattr(error.__cause__, "diag", None), "constraint_name", None
+    )
+    if constraint is not None:  # PostgreSQL names the violated constraint
+        return constraint == ACCESS_CODE_CONSTRAINT
+    return f"{Meeting._meta.db_table}.access_code" in str(error)  # SQLite
+
+
+def save_meetings(meetings: list[Meeting], questions: list[Question]) -> None:
+    """
+    Writes new meetings and all their questions in a single transaction,
+    with one bulk INSERT per table, and bumps the hosts' `total_meetings`.
+    Access codes are allocated here; if a concurrent meeting claims one first
+    the whole write is retried, any other integrity error is raised at once.
+    :param meetings: Unsaved, validated meeting objects
+    :param questions: Unsaved, validated questions of those meetings
+    :raises IntegrityError: If every attempt collided, or on any other violation
+    """
+    for attempt in range(ACCESS_CODE_SAVE_ATTEMPTS):
+        for meeting, code in zip(meetings, allocate_access_codes(len(meetings))):
+            meeting.access_code = code
+        try:
+            with transaction.atomic():
+                Meeting.objects.bulk_create(meetings)
+                Question.objects.bulk_create(questions)
+                counters.increment_now(
+                    CustomUser,
+                    "total_meetings",
+                    Counter(meeting.user_id for meeting in meetings),
+                )
+            return
+        except IntegrityError as e:
+            if (
+                not _access_code_collision(e)
+                or attempt == ACCESS_CODE_SAVE_ATTEMPTS - 1
+            ):
+                raise
+
+
+def _access_code_cache_key(access_code: str) -> str:
+    return f"{ACCESS_CODE_CACHE_PREFIX}{access_code}"
+
+
+def resolve_access_code(access_code: str) -> uuid.UUID | None:
+    """
+    Resolves an access code to the ID of the active meeting using it.
+    Served from the cache, falling back to the partial unique index.
+    :param access_code: Code entered by the participant
+    :return: Meeting ID if an active meeting uses the code, else None
+    """
+    if len(access_code) != ACCESS_CODE_LENGTH or not access_code.isdigit():
+        return None
+    key = _access_code_cache_key(access_code)
+    meeting_id: uuid.UUID | None = cache.get(key)
+    if meeting_id is not None:
+        return meeting_id
+    meeting_id = (
+        Meeting.objects.filter(access_code=access_code)
+        .exclude(status=Meeting.Status.ENDED)
+        .values_list("pk", flat=True)
+        .first()
+    )
+    if meeting_id is not None:
+        cache.set(key, meeting_id, timeout=ACCESS_CODE_CACHE_SECONDS)
+    return meeting_id
+
+
+def invalidate_access_code(access_code: str) -> None:
+    """
+    Drops a code from the cache once its meeting stops accepting participants
+    :param access_code: Code of the meeting
+    """
+    cache.delete(_access_code_cache_key(access_code))
+
+
+def mark_access_code_ended(access_code: str) -> None:
+    """
+    Remembers that a code's meeting ended, so late joiners are told so rather
+    than getting a 404. A new meeting reusing the code takes precedence.
+    :param access_code: Code of the ended meeting
+    """
+    cache.set(
+        f"{ENDED_CODE_CACHE_PREFIX}{access_code}",
+        True,
+        timeout=ACCESS_CODE_CACHE_SECONDS,
+    )
+
+
+def access_code_ended(access_code: str) -> bool:
+    """
+    Checks whether a code that no longer resolves belonged to a meeting that
+    ended recently, without a query
+    :param access_code: Code entered by the participant
+    :return: True if its meeting ended within `ACCESS_CODE_CACHE_SECONDS`
+    """
+    return bool(cache.get(f"{ENDED_CODE_CACHE_PREFIX}{access_code}"))
+
+
+def valid_participant_name(name: str) -> bool:
+    """
+    Checks a participant display name
+    :param name: Stripped name entered on the join form
+    :return: True if the name is non-empty and short enough
+    """
+    return 0 < len(name) <= PARTICIPANT_NAME_MAX_LENGTH
+
+
+def join_meeting(meeting: Meeting, name: str) -> dict[str, str]:
+    """
+    Registers a new participant of the meeting, the caller hands them their
+    token (see `tokens.attach`)
+    :param meeting: Meeting being joined
+    :param name: Display name of the participant
+    :return: The participant details
+    """
+    participant = {
+        "meeting_id": str(meeting.pk),
+        "access_code": meeting.access_code,
+        "participant_id": str(uuid.uuid4()),
+        "name": name,
+    }
+    counters.add(Meeting, meeting.pk, "total_participants")
+    counters.add(CustomUser, meeting.user_id, "total_participants")
+    logger.log(
+        level=logging.INFO,
+        msg="Participant Joined",
+        extra={
+            "meeting_id": meeting.pk,
+            "participant_id": participant["participant_id"],
+        },
+    )
+    return participant
+
+
+def get_participant(
+    request: HttpRequest, meeting_id: uuid.UUID | None = None
+) -> dict[str, str] | None:
+    """
+    Gets the participant from their signed token, or from the session for
+    those who joined before tokens were issued (it is only loaded then)
+    :param request: Http request
+    :param meeting_id: ID of the meeting, None for whichever they joined
+    :return: Participant details, else None
+    """
+    participant: dict[str, str] | None = tokens.read(request)
+    if participant is None:
+        participant = request.session.get(PARTICIPANT_SESSION_KEY)
+    if participant is None or (
+        meeting_id is not None and participant["meeting_id"] != str(meeting_id)
+    ):
+        return None
+    return participant
 
 
 def create_meeting(
     user: CustomUser, title: str | None, description: str | None, duration: str | None
 ) -> Meeting | None:
     """
-    Creates a meeting object and runs validation on it
+    Creates an unsaved meeting object and validates its fields.
+    No queries are made, the access code is allocated by `save_meetings`.
     :param user: User of the meeting
     :param title: Title of the meeting
-    :param description: Description of the meeting
+    :param description: Description of the meeting (optional)
     :param duration: Minute Duration of the meeting (converted to an int later)
-    :return: Meeting object if created else None if an exception occurred
+    :return: Meeting object if valid else None
     """
     try:
-        if not title or not description or not duration:
+        if not title or not duration:
             return None
         logger.log(
             level=logging.DEBUG,
             msg="Creating Meeting",
             extra={"title": title, "description": description, "duration": duration},
         )
-        meeting = Meeting(
-            user=user,
-            title=title,
-            description=description,
-            duration=int(duration),
-            access_code=generate_access_code(8),
-        )
-        logger.log(
-            level=logging.DEBUG, msg="Meeting created", extra={"meeting": meeting}
+        meeting = Meeting(user=user, title=title, duration=int(duration))
+        if description:
+            meeting.description = description
+        meeting.full_clean(
+            exclude=["user", "access_code"],
+            validate_unique=False,
+            validate_constraints=False,
         )
-        meeting.clean()
         return meeting
     except (TypeError, ValueError, ValidationError):
         return None
 
 
 def create_questions(
-    meeting: Meeting, questions: list[Question] | None
+    meeting: Meeting, questions: list[str] | None
 ) -> list[Question] | None:
     """
-    Iterates over the `questions` array and creates a new question object for each value.
-    Each created object is validated with `clean`
+    Validates the whole `questions` array in one pass, then creates an unsaved
+    question object for each value
     :param meeting: Meeting object related to the question
-    :param questions: Array of questions
+    :param questions: Array of question texts
     :return: list of Question objects if all questions were valid, else None
     """
-    try:
-        new_questions: list[Question] = []
-        if not meeting or not questions:
+    if not meeting or not questions or len(questions) > MAX_QUESTIONS:
+        return None
+    if not all(
+        isinstance(text, str) and 0 < len(text.strip()) <= QUESTION_TEXT_MAX_LENGTH
+        for text in questions
+    ):
+        return None
+    return [
+        Question(meeting=meeting, text=text.strip(), index=index)
+        for index, text in enumerate(questions, start=1)
+    ]
+
+
+def build_meeting(
+    user: CustomUser, data: dict[str, Any]
+) -> tuple[Meeting, list[Question]] | None:
+    """
+    Validates a create meeting payload and builds the unsaved objects
+    :param user: User of the meeting
+    :param data: Payload with `title`, `description`, `duration` and `questions`
+    :return: (meeting, questions) if the payload is valid, else None
+    """
+    meeting = create_meeting(
+        user, data.get("title"), data.get("description"), data.get("duration")
+    )
+    if meeting is None:
+        return None
+    questions = create_questions(meeting, data.get("questions"))
+    if questions is None:
+        return None
+    return meeting, questions
+
+
+def build_meetings_from_template(
+    user: CustomUser, template: dict[str, Any], overrides: list[dict[str, Any]]
+) -> list[tuple[Meeting, list[Question]]] | None:
+    """
+    Builds one meeting per entry of `overrides`, each one being the template
+    payload updated with the entry's fields
+    :param user: User of the meetings
+    :param template: Create meeting payload shared by every meeting
+    :param overrides: Per meeting fields (e.g. `title`), at most `MAX_BATCH_MEETINGS`
+    :return: Unsaved (meeting, questions) pairs if every payload is valid, else None
+    """
+    if not overrides or len(overrides) > MAX_BATCH_MEETINGS:
+        return None
+    built = []
+    for override in overrides:
+        if not isinstance(override, dict):
+            return None
+        meeting = build_meeting(user, {**template, **override})
+        if meeting is None:
             return None
-        for index, question in enumerate(questions, start=1):
-            if not question:
-                return None
-            new_question = Question(meeting=meeting, text=question, index=index)
-            new_question.clean()
-            new_questions.append(new_question)
-        return new_questions
-    except ValidationError:
+        built.append(meeting)
+    return built
+
+
+def _load_meeting(meeting_id: uuid.UUID) -> tuple[Meeting, list[Question]] | None:
+    meeting: Meeting | None = Meeting.objects.filter(pk=meeting_id).first()
+    if meeting is None:
         return None
+    return meeting, list(meeting.questions.order_by("index"))
 
 
-def get_meeting(meeting_id: uuid.UUID) -> Meeting | None:
+def _cached_meeting(
+    meeting_id: uuid.UUID, revalidate: bool = False
+) -> tuple[Meeting, list[Question]] | None:
+    try:
+        return meeting_cache.get(
+            str(meeting_id), lambda: _load_meeting(meeting_id), revalidate
+        )
+    except (ValueError, ValidationError):  # not a UUID
+        return None
+
+
+def get_meeting(meeting_id: uuid.UUID, revalidate: bool = False) -> Meeting | None:
     """
-    Gets a meeting object with the given `meeting_id`
+    Gets a meeting object with the given `meeting_id`, through the meeting cache.
+    The object is shared with other requests of this process and must not be
+    modified, its counters (`total_*`) aren't kept up to date.
     :param meeting_id: ID of the meeting to retrieve
+    :param revalidate: Skip the local copy's grace period (see `MEETING_CACHE`)
     :return: Meeting object if found else None
     """
-    try:
-        meeting: Meeting = Meeting.objects.get(pk=meeting_id)
-        return meeting
-    except (ValueError, Meeting.DoesNotExist):
+    cached = _cached_meeting(meeting_id, revalidate)
+    return cached[0] if cached else None
+
+
+def get_questions(meeting_id: uuid.UUID) -> list[Question]:
+    """
+    Gets the questions of a meeting ordered by index, through the meeting cache
+    :param meeting_id: ID of the meeting
+    :return: Questions (read-only), empty if the meeting doesn't exist
+    """
+    cached = _cached_meeting(meeting_id)
+    return cached[1] if cached else []
+
+
+def invalidate_meeting(meeting_id: uuid.UUID) -> None:
+    """
+    Drops a meeting and its questions from the cache, once a change is committed
+    :param meeting_id: ID of the meeting
+    """
+    meeting_cache.invalidate(str(meeting_id))
+
+
+def get_meeting_state(meeting: Meeting) -> dict[str, Any]:
+    """
+    Builds the live state of a meeting as sent to host and participant sockets
+    :param meeting: Meeting object
+    :return: Status, current question index/text and total number of questions
+    """
+    questions = get_questions(meeting.pk)
+    question: Question | None = None
+    if 0 < meeting.current_question <= len(questions):
+        question = questions[meeting.current_question - 1]
+    return {
+        "status": meeting.status,
+        "current_question": meeting.current_question,
+        "question_text": question.text if question else None,
+        "total_questions": len(questions),
+    }
+
+
+def get_meeting_state_etag(meeting: Meeting) -> str:
+    """
+    Builds the version of a meeting's live state, without loading its questions.
+    `updated_at` changes with every state change (start, next question, end).
+    :param meeting: Meeting object
+    :return: Quoted ETag
+    """
+    return quote_etag(
+        f"{meeting.updated_at.timestamp():.6f}-{meeting.status}-"
+        f"{meeting.current_question}"
+    )
+
+
+def start_meeting(meeting_id: uuid.UUID) -> Meeting | None:
+    """
+    Starts a meeting that hasn't started yet, shows its first question and
+    schedules its end once `duration` minutes have passed
+    :param meeting_id: ID of the meeting to start
+    :return: The started meeting, else None if it was missing or already started
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        updated = Meeting.objects.filter(
+            pk=meeting_id, status=Meeting.Status.NOT_STARTED
+        ).update(
+            status=Meeting.Status.IN_PROGRESS,
+            current_question=1,
+            updated_at=now,
+        )
+        if not updated:
+            return None
+        MeetingStatistics.objects.create(meeting_id=meeting_id, start_time=now)
+    invalidate_meeting(meeting_id)
+    meeting = get_meeting(meeting_id)
+    if meeting is None:
+        return None
+    scheduler.get_scheduler().schedule(
+        meeting.pk, now.timestamp() + meeting.duration * 60
+    )
+    state = get_meeting_state(meeting)
+    events.publish_meeting_event(meeting.pk, events.MEETING_STARTED, state)
+    events.publish_meeting_event(meeting.pk, events.QUESTION_ADVANCED, state)
+    logger.log(
+        level=logging.INFO, msg="Meeting Started", extra={"meeting_id": meeting_id}
+    )
+    return meeting
+
+
+def advance_question(meeting_id: uuid.UUID) -> Meeting | None:
+    """
+    Moves an in progress meeting to its next question
+    :param meeting_id: ID of the meeting
+    :return: The updated meeting, else None if it isn't running or has no next question
+    """
+    with transaction.atomic():
+        meeting: Meeting | None = (
+            Meeting.objects.select_for_update()
+            .filter(pk=meeting_id, status=Meeting.Status.IN_PROGRESS)
+            .first()
+        )
+        if meeting is None:
+            return None
+        if meeting.current_question >= len(get_questions(meeting.pk)):
+            return None
+        meeting.current_question += 1
+        # the cache is invalidated on commit by `signals.invalidate_on_save`
+        meeting.save(update_fields=["current_question", "updated_at"])
+    events.publish_meeting_event(
+        meeting.pk, events.QUESTION_ADVANCED, get_meeting_state(meeting)
+    )
+    return meeting
+
+
+def end_meeting(meeting_id: uuid.UUID) -> Meeting | None:
+    """
+    Ends a meeting, by its host or by the scheduler at its deadline, records
+    its end time and notifies every connected socket
+    :param meeting_id: ID of the meeting to end
+    :return: The ended meeting, else None if it was missing or already ended
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        updated = (
+            Meeting.objects.filter(pk=meeting_id)
+            .exclude(status=Meeting.Status.ENDED)
+            .update(status=Meeting.Status.ENDED, updated_at=now)
+        )
+        if not updated:
+            return None
+        MeetingStatistics.objects.filter(
+            meeting_id=meeting_id, end_time__isnull=True
+        ).update(end_time=now, updated_at=now)
+    invalidate_meeting(meeting_id)
+    meeting_scheduler = scheduler.get_scheduler()
+    meeting_scheduler.cancel(meeting_id)
+    meeting_scheduler.schedule_summary(meeting_id)
+    meeting = get_meeting(meeting_id)
+    if meeting is None:
+        return None
+    invalidate_access_code(meeting.access_code)
+    mark_access_code_ended(meeting.access_code)
+    events.publish_meeting_event(
+        meeting.pk, events.MEETING_ENDED, get_meeting_state(meeting)
+    )
+    logger.log(
+        level=logging.INFO, msg="Meeting Ended", extra={"meeting_id": meeting_id}
+    )
+    return meeting
+
+
+def get_host_meeting(meeting_id: uuid.UUID, user: CustomUser) -> Meeting | None:
+    """
+    Loads the meeting shown on the host page in one query, joined to its host.
+    It isn't served from the meeting cache as the page shows live counters,
+    the questions are (see `get_questions`).
+    :param meeting_id: ID of the meeting to retrieve
+    :param user: Requesting user, only the meeting's host may load it
+    :return: Meeting with `user` loaded, else None
+    """
+    return (
+        Meeting.objects.select_related("user").filter(pk=meeting_id, user=user).first()
+    )
+
+
+def get_meeting_summary(meeting: Meeting) -> dict[str, Any] | None:
+    """
+    Gets the summary shown on the host page of an ended meeting, stored by the
+    scheduler (see `analytics.store_summary`), else computed for this request
+    while the scheduler hasn't run yet
+    :param meeting: Meeting shown to its host
+    :return: The summary, else None while the meeting hasn't ended
+    """
+    if meeting.status != Meeting.Status.ENDED:
         return None
+    return analytics.get_summary(meeting.pk) or analytics.summarize(meeting)
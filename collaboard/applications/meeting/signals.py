@@ -0,0 +1,24 @@
+"""
+This module stores the signal receivers keeping the meeting cache consistent
+with edits made through model saves (e.g. the admin).
+Bulk writes and `QuerySet.update` don't send signals, their callers invalidate
+explicitly (see `services.start_meeting` and `services.end_meeting`).
+"""
+
+from typing import Any
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import services
+from .models import Meeting, Question
+
+
+@receiver(post_save, sender=Meeting)
+@receiver(post_delete, sender=Meeting)
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def invalidate_on_save(sender: type, instance: Any, **kwargs: Any) -> None:
+    meeting_id = instance.pk if sender is Meeting else instance.meeting_id
+    transaction.on_commit(lambda: services.invalidate_meeting(meeting_id))
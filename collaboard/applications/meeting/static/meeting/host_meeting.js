@@ -0,0 +1,162 @@
+/**
+ * Host Meeting Handler
+ * Keeps a WebSocket open to the meeting, renders live events and sends host controls
+ */
+
+// Configuration
+const CONFIG = {
+    RECONNECT_BASE_DELAY: 1000,
+    RECONNECT_MAX_DELAY: 15000,
+};
+
+const STATUS_LABELS = {
+    not_started: 'Meeting not started',
+    in_progress: 'Meeting in progress',
+    ended: 'Meeting ended',
+};
+
+// State
+let socket = null;
+let reconnectAttempts = 0;
+let lastEventId = 0;
+let responseCount = 0;
+
+/**
+ * Initialize the page when DOM is loaded
+ */
+document.addEventListener('DOMContentLoaded', function () {
+    initializeEventListeners();
+    connect();
+});
+
+/**
+ * Initialize the control buttons
+ */
+function initializeEventListeners() {
+    document
+        .getElementById('start-btn')
+        .addEventListener('click', () => sendCommand('start'));
+    document
+        .getElementById('next-btn')
+        .addEventListener('click', () => sendCommand('next'));
+    document
+        .getElementById('end-btn')
+        .addEventListener('click', () => sendCommand('end'));
+}
+
+/**
+ * Open the meeting WebSocket, reconnecting with backoff when it drops
+ */
+function connect() {
+    const meetingId = document.body.dataset.meetingId;
+    const protocol = window.location.protocol === 'https:' ? 'wss' : 'ws';
+    socket = new WebSocket(
+        `${protocol}://${window.location.host}/ws/meeting/${meetingId}/`,
+    );
+
+    socket.addEventListener('open', () => {
+        reconnectAttempts = 0;
+    });
+    // every frame is an array of the events coalesced during one server tick
+    socket.addEventListener('message', (e) =>
+        JSON.parse(e.data).forEach(handleEvent),
+    );
+    socket.addEventListener('close', (e) => {
+        if (e.code === 4404) {
+            return; // meeting doesn't exist
+        }
+        const delay = Math.min(
+            CONFIG.RECONNECT_BASE_DELAY * 2 ** reconnectAttempts,
+            CONFIG.RECONNECT_MAX_DELAY,
+        );
+        reconnectAttempts++;
+        setTimeout(connect, delay);
+    });
+}
+
+/**
+ * Send a control command to the server
+ */
+function sendCommand(command) {
+    if (socket && socket.readyState === WebSocket.OPEN) {
+        socket.send(JSON.stringify({ command }));
+    }
+}
+
+/**
+ * Drop state events older than the latest snapshot (they share its IDs)
+ */
+function isStale(message) {
+    if (message.event === 'state') {
+        lastEventId = message.id || 0;
+        return false;
+    }
+    if (!message.id) {
+        return false;
+    }
+    if (message.id <= lastEventId) {
+        return true;
+    }
+    lastEventId = message.id;
+    return false;
+}
+
+/**
+ * Dispatch a server event
+ */
+function handleEvent(message) {
+    if (isStale(message)) {
+        return;
+    }
+    switch (message.event) {
+        case 'state':
+        case 'meeting_started':
+        case 'question_advanced':
+        case 'meeting_ended':
+            renderState(message.data);
+            break;
+        case 'new_response':
+            responseCount += message.data.count;
+            document.getElementById('submission-count').textContent =
+                `${responseCount}`;
+            break;
+    }
+}
+
+/**
+ * Render the meeting state (status, question and controls)
+ */
+function renderState(state) {
+    if (state.current_question !== undefined) {
+        const previous = document.getElementById('current-question-num');
+        if (previous.textContent !== `${state.current_question}`) {
+            responseCount = 0;
+        }
+        previous.textContent = state.current_question;
+    }
+    if (state.total_questions !== undefined) {
+        document.getElementById('total-questions').textContent =
+            state.total_questions;
+    }
+    if (state.question_text) {
+        document.getElementById('question-text').textContent =
+            state.question_text;
+    }
+    if (state.status) {
+        document.getElementById('meeting-status').innerHTML =
+            `<span class="dot"></span> ${STATUS_LABELS[state.status]}`;
+        updateControls(state);
+    }
+}
+
+/**
+ * Enable the controls that apply to the current state
+ */
+function updateControls(state) {
+    const running = state.status === 'in_progress';
+    document.getElementById('start-btn').disabled =
+        state.status !== 'not_started';
+    document.getElementById('next-btn').disabled =
+        !running || state.current_question >= state.total_questions;
+    document.getElementById('end-btn').disabled = state.status === 'ended';
+}
@@ -0,0 +1,202 @@
+/**
+ * Participant Meeting Handler
+ * Keeps a WebSocket open to the meeting and renders the question the host is showing.
+ * Falls back to Server-Sent Events when WebSockets never open (e.g. blocked by a proxy)
+ */
+
+// Configuration
+const CONFIG = {
+    RECONNECT_BASE_DELAY: 1000,
+    RECONNECT_MAX_DELAY: 15000,
+    SOCKET_ATTEMPTS_BEFORE_FALLBACK: 2, // failed opens before switching to SSE
+};
+
+const STATUS_LABELS = {
+    not_started: 'Waiting for the host',
+    in_progress: 'Live',
+    ended: 'Meeting ended',
+};
+
+// State
+let reconnectAttempts = 0;
+let lastEventId = 0;
+let socketOpened = false;
+let currentQuestion = 0;
+let answeredQuestion = 0;
+
+/**
+ * Initialize the page when DOM is loaded
+ */
+document.addEventListener('DOMContentLoaded', function () {
+    document
+        .getElementById('responseForm')
+        .addEventListener('submit', handleResponseSubmit);
+    connect();
+});
+
+/**
+ * Open the meeting WebSocket, reconnecting with backoff when it drops
+ */
+function connect() {
+    const meetingId = document.body.dataset.meetingId;
+    const protocol = window.location.protocol === 'https:' ? 'wss' : 'ws';
+    const socket = new WebSocket(
+        `${protocol}://${window.location.host}/ws/meeting/${meetingId}/`,
+    );
+
+    socket.addEventListener('open', () => {
+        reconnectAttempts = 0;
+        socketOpened = true;
+    });
+    // every frame is an array of the events coalesced during one server tick
+    socket.addEventListener('message', (e) =>
+        JSON.parse(e.data).forEach(handleEvent),
+    );
+    socket.addEventListener('close', (e) => {
+        if (e.code === 4404) {
+            return; // meeting doesn't exist
+        }
+        if (
+            !socketOpened &&
+            reconnectAttempts + 1 >= CONFIG.SOCKET_ATTEMPTS_BEFORE_FALLBACK
+        ) {
+            connectEvents();
+            return;
+        }
+        const delay = Math.min(
+            CONFIG.RECONNECT_BASE_DELAY * 2 ** reconnectAttempts,
+            CONFIG.RECONNECT_MAX_DELAY,
+        );
+        reconnectAttempts++;
+        setTimeout(connect, delay);
+    });
+}
+
+/**
+ * Stream the meeting over Server-Sent Events, the browser reconnects by itself
+ * and resumes from the last event it received
+ */
+function connectEvents() {
+    const source = new EventSource(document.body.dataset.eventsUrl);
+    // same frames as the WebSocket, without response counts
+    source.addEventListener('message', (e) =>
+        JSON.parse(e.data).forEach(handleEvent),
+    );
+}
+
+/**
+ * Drop state events older than the latest snapshot (they share its IDs)
+ */
+function isStale(message) {
+    if (message.event === 'state') {
+        lastEventId = message.id || 0;
+        return false;
+    }
+    if (!message.id) {
+        return false;
+    }
+    if (message.id <= lastEventId) {
+        return true;
+    }
+    lastEventId = message.id;
+    return false;
+}
+
+/**
+ * Dispatch a server event
+ */
+function handleEvent(message) {
+    if (isStale(message)) {
+        return;
+    }
+    if (message.event === 'meeting_ended') {
+        window.location.href = document.body.dataset.endUrl;
+        return;
+    }
+    if (message.event !== 'new_response') {
+        renderState(message.data);
+    }
+}
+
+/**
+ * Render the meeting state (status and question)
+ */
+function renderState(state) {
+    if (state.status === 'ended') {
+        window.location.href = document.body.dataset.endUrl;
+        return;
+    }
+    currentQuestion = state.current_question;
+    document.getElementById('current-question-num').textContent =
+        state.current_question;
+    document.getElementById('total-questions').textContent =
+        state.total_questions;
+    if (state.question_text) {
+        document.getElementById('question-text').textContent =
+            state.question_text;
+    }
+    const status = document.getElementById('meeting-status');
+    status.classList.toggle('live', state.status === 'in_progress');
+    status.innerHTML = `<span class="dot"></span> ${STATUS_LABELS[state.status]}`;
+    updateResponseForm(state.status === 'in_progress');
+}
+
+/**
+ * Allow one answer per question while the meeting is live
+ */
+function updateResponseForm(live) {
+    const canAnswer = live && answeredQuestion !== currentQuestion;
+    document.getElementById('responseText').disabled = !canAnswer;
+    document.getElementById('submitResponseBtn').disabled = !canAnswer;
+    if (canAnswer) {
+        document.getElementById('responseStatus').textContent = '';
+    }
+}
+
+/**
+ * Submit the answer to the current question.
+ * The submission id makes retries of the same answer idempotent.
+ */
+async function handleResponseSubmit(e) {
+    e.preventDefault();
+    const textarea = document.getElementById('responseText');
+    const text = textarea.value.trim();
+    if (!text) {
+        return;
+    }
+    const payload = {
+        question_index: currentQuestion,
+        text,
+        submission_id: crypto.randomUUID(),
+    };
+    const status = document.getElementById('responseStatus');
+    try {
+        const response = await fetch(document.body.dataset.responsesUrl, {
+            method: 'POST',
+            body: JSON.stringify(payload),
+            headers: {
+                'Content-Type': 'application/json',
+                'X-CSRFToken': getCSRFToken(),
+            },
+        });
+        if (!response.ok) {
+            status.textContent = 'Your answer could not be sent, try again';
+            return;
+        }
+        answeredQuestion = payload.question_index;
+        textarea.value = '';
+        updateResponseForm(true);
+        status.textContent = 'Answer sent!';
+    } catch (error) {
+        console.log(error);
+        status.textContent = 'Your answer could not be sent, try again';
+    }
+}
+
+/**
+ * Retrieves the CSRF Token embedded in the html file
+ * @returns {*} Csrf Token String
+ */
+function getCSRFToken() {
+    return document.querySelector('[name=csrfmiddlewaretoken]').value;
+}
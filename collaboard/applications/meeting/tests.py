@@ -1 +1,537 @@
-# Create your tests here.
+"""
+This module stores the tests of the meeting pages and hot queries, checking the
+queries they run and the indexes serving them, and of the participant tokens,
+the response ingestion and the background jobs behind those pages.
+"""
+
+import io
+import uuid
+from datetime import timedelta
+from typing import Any
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DatabaseError, IntegrityError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from redis.exceptions import RedisError
+
+from .. import counters, rate_limits
+from ..authentication import backends
+from ..authentication.models import CustomUser
+from ..testing import fake_redis_settings
+from . import analytics, ingest, scheduler, services, tokens
+from .management.commands.check_query_plans import hot_queries
+from .models import Meeting, Question, Response
+
+
+def fake_settings() -> dict:
+    """
+    Settings replacing Redis with in-process stand-ins, without rate limits
+    """
+    return {
+        **fake_redis_settings(),
+        "RATE_LIMITS": {**settings.RATE_LIMITS, "ENABLED": False},
+    }
+
+
+@override_settings(**fake_settings())
+class MeetingPageQueriesTests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        services.meeting_cache.local.clear()
+        backends.user_cache.local.clear()
+        self.host = CustomUser.objects.create_user(
+            "host@example.com", "password", first_name="Host", last_name="User"
+        )
+        self.client.force_login(self.host)
+
+    def create_meeting(self, questions: int, responses: int) -> Meeting:
+        meeting = Meeting.objects.create(
+            user=self.host,
+            access_code=f"{Meeting.objects.count():08d}",
+            title="Meeting",
+            duration=30,
+        )
+        created = Question.objects.bulk_create(
+            Question(meeting=meeting, index=index, text=f"Question {index}")
+            for index in range(1, questions + 1)
+        )
+        Response.objects.bulk_create(
+            Response(question=question, text="Response")
+            for question in created
+            for _ in range(responses)
+        )
+        return meeting
+
+    def test_host_page_queries_constant(self) -> None:
+        self.client.get(reverse("create_meeting"))  # loads the session and user
+        for meeting in (
+            self.create_meeting(questions=1, responses=1),
+            self.create_meeting(questions=20, responses=10),
+        ):
+            url = reverse("host_meeting", args=[meeting.pk])
+            # the meeting joined to its host, then the meeting cache loading
+            # the meeting and its questions
+            with self.assertNumQueries(3):
+                self.assertEqual(self.client.get(url).status_code, 200)
+            with self.assertNumQueries(1):  # the questions are cached now
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_participant_page_queries_constant(self) -> None:
+        for meeting in (
+            self.create_meeting(questions=1, responses=1),
+            self.create_meeting(questions=20, responses=10),
+        ):
+            participant = services.join_meeting(meeting, "Participant")
+            cookie = {"participant_token": tokens.issue(participant)}
+            url = reverse("participant_meeting", args=[meeting.access_code])
+            self.client.cookies.load(cookie)
+            with self.assertNumQueries(3):  # access code, meeting, questions
+                self.assertEqual(self.client.get(url).status_code, 200)
+            with self.assertNumQueries(0):  # all cached, the token is signed
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+
+@override_settings(**fake_settings())
+class ParticipantUserQueriesTests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        services.meeting_cache.local.clear()
+        host = CustomUser.objects.create_user(
+            "host@example.com", "password", first_name="Host", last_name="User"
+        )
+        self.meeting = Meeting.objects.create(
+            user=host, access_code="00000000", title="Meeting", duration=30
+        )
+        Question.objects.create(meeting=self.meeting, index=1, text="Question")
+
+    def assert_no_user_queries(self, queries: CaptureQueriesContext) -> None:
+        self.assertEqual(
+            [
+                query["sql"]
+                for query in queries
+                if CustomUser._meta.db_table in query["sql"]
+            ],
+            [],
+        )
+
+    def test_join_runs_no_user_queries(self) -> None:
+        url = reverse("participant_meeting", args=[self.meeting.access_code])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, {"participantName": "Participant"})
+        self.assertRedirects(response, url, fetch_redirect_response=False)
+        self.assertIn("participant_token", response.cookies)
+        self.assert_no_user_queries(queries)
+
+    def test_submit_runs_no_user_queries(self) -> None:
+        participant = services.join_meeting(self.meeting, "Participant")
+        Meeting.objects.filter(pk=self.meeting.pk).update(
+            status=Meeting.Status.IN_PROGRESS, current_question=1
+        )
+        self.client.cookies.load({"participant_token": tokens.issue(participant)})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                reverse("submit_response", args=[self.meeting.pk]),
+                {"question_index": 1, "text": "Response"},
+                content_type="application/json",
+            )
+        self.assertEqual(response.status_code, 202)
+        self.assert_no_user_queries(queries)
+
+
+@override_settings(**fake_settings())
+class MeetingStateTests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        services.meeting_cache.local.clear()
+        host = CustomUser.objects.create_user(
+            "host@example.com", "password", first_name="Host", last_name="User"
+        )
+        self.meeting = Meeting.objects.create(
+            user=host, access_code="00000000", title="Meeting", duration=30
+        )
+        Question.objects.create(meeting=self.meeting, index=1, text="Question")
+        participant = services.join_meeting(self.meeting, "Participant")
+        self.client.cookies.load({"participant_token": tokens.issue(participant)})
+        self.url = reverse("meeting_state", args=[self.meeting.pk])
+
+    def test_unchanged_state_not_modified(self) -> None:
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+
+    def test_changed_state_sent_again(self) -> None:
+        etag = self.client.get(self.url)["ETag"]
+        Meeting.objects.filter(pk=self.meeting.pk).update(
+            status=Meeting.Status.IN_PROGRESS, current_question=1
+        )
+        services.invalidate_meeting(self.meeting.pk)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_other_clients_forbidden(self) -> None:
+        self.client.cookies.clear()
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+
+class ParticipantTokenTests(TestCase):
+    participant = {
+        "meeting_id": str(uuid.uuid4()),
+        "participant_id": str(uuid.uuid4()),
+        "access_code": "00000000",
+        "name": "Participant",
+    }
+
+    def test_round_trip(self) -> None:
+        self.assertEqual(
+            tokens.verify(tokens.issue(self.participant)), self.participant
+        )
+
+    def test_tampered_token_rejected(self) -> None:
+        rejected = tokens.rejected_tokens.value(reason="bad_signature")
+        token = tokens.issue(self.participant)
+        tampered = token[:-1] + ("A" if token[-1] != "A" else "B")
+        self.assertIsNone(tokens.verify(tampered))
+        self.assertEqual(
+            tokens.rejected_tokens.value(reason="bad_signature"), rejected + 1
+        )
+
+    def test_expired_token_rejected(self) -> None:
+        rejected = tokens.rejected_tokens.value(reason="expired")
+        with override_settings(
+            PARTICIPANT_TOKENS={**settings.PARTICIPANT_TOKENS, "MAX_AGE_SECONDS": -1}
+        ):
+            token = tokens.issue(self.participant)
+        self.assertIsNone(tokens.verify(token))
+        self.assertEqual(tokens.rejected_tokens.value(reason="expired"), rejected + 1)
+
+    def test_token_signed_with_previous_key_accepted(self) -> None:
+        with override_settings(
+            PARTICIPANT_TOKENS={**settings.PARTICIPANT_TOKENS, "KEYS": ["old-key"]}
+        ):
+            token = tokens.issue(self.participant)
+        with override_settings(
+            PARTICIPANT_TOKENS={
+                **settings.PARTICIPANT_TOKENS,
+                "KEYS": ["new-key", "old-key"],
+            }
+        ):
+            self.assertEqual(tokens.verify(token), self.participant)
+        with override_settings(
+            PARTICIPANT_TOKENS={**settings.PARTICIPANT_TOKENS, "KEYS": ["new-key"]}
+        ):
+            self.assertIsNone(tokens.verify(token))
+
+
+class SummarizeTests(TestCase):
+    def setUp(self) -> None:
+        host = CustomUser.objects.create_user(
+            "host@example.com", "password", first_name="Host", last_name="User"
+        )
+        self.meeting = Meeting.objects.create(
+            user=host, access_code="00000000", title="Meeting", duration=30
+        )
+        self.question = Question.objects.create(
+            meeting=self.meeting, index=1, text="Question"
+        )
+        self.start = timezone.now().replace(second=30, microsecond=0)
+
+    def respond(self, *offsets: timedelta) -> None:
+        Response.objects.bulk_create(
+            Response(question=self.question, text="Response", created_at=moment)
+            for moment in (self.start + offset for offset in offsets)
+        )
+
+    def test_curve_counts_by_minute_from_start(self) -> None:
+        # the start minute holds 0:00 to 0:59, the next one starts at 1:00
+        self.respond(
+            timedelta(seconds=-30),
+            timedelta(seconds=29),
+            timedelta(seconds=30),
+            timedelta(minutes=2, seconds=29),
+        )
+        summary = analytics.summarize(self.meeting, self.start)
+        self.assertEqual(summary["responses_per_minute"], [2, 1, 1])
+
+    def test_curve_starts_at_first_response_when_start_unknown(self) -> None:
+        self.respond(timedelta(minutes=3), timedelta(minutes=4, seconds=10))
+        summary = analytics.summarize(self.meeting)
+        self.assertEqual(summary["responses_per_minute"], [1, 1])
+
+    def test_host_summary_read_once_stored(self) -> None:
+        self.respond(timedelta(0))
+        self.assertIsNone(services.get_meeting_summary(self.meeting))
+        Meeting.objects.filter(pk=self.meeting.pk).update(status=Meeting.Status.ENDED)
+        self.meeting.refresh_from_db()
+        # computed while the scheduler hasn't stored it
+        self.assertEqual(
+            services.get_meeting_summary(self.meeting),
+            analytics.summarize(self.meeting) | {"computed_at": mock.ANY},
+        )
+        self.assertTrue(analytics.store_summary(self.meeting.pk))
+        stored = analytics.get_summary(self.meeting.pk)
+        self.respond(timedelta(0))
+        with self.assertNumQueries(1):
+            self.assertEqual(services.get_meeting_summary(self.meeting), stored)
+
+
+class IngestTestCase(TestCase):
+    def setUp(self) -> None:
+        host = CustomUser.objects.create_user(
+            "host@example.com", "password", first_name="Host", last_name="User"
+        )
+        self.meeting = Meeting.objects.create(
+            user=host, access_code="00000000", title="Meeting", duration=30
+        )
+        self.question = Question.objects.create(
+            meeting=self.meeting, index=1, text="Question"
+        )
+
+    def item(self, **overrides: Any) -> dict[str, Any]:
+        return {
+            "meeting_id": str(self.meeting.pk),
+            "participant_id": str(uuid.uuid4()),
+            "question_index": 1,
+            "submission_id": str(uuid.uuid4()),
+            "text": "Response",
+            "accepted_at": timezone.now().isoformat(),
+            **overrides,
+        }
+
+
+class WriteResponsesTests(IngestTestCase):
+    def test_replayed_submissions_written_once(self) -> None:
+        item = self.item()
+        self.assertEqual(ingest.write_responses([item, item, self.item()]), 2)
+        self.assertEqual(ingest.write_responses([item]), 0)  # redelivered batch
+        self.assertEqual(Response.objects.count(), 2)
+        for counted in (self.question, self.meeting, self.meeting.user):
+            counted.refresh_from_db()
+            self.assertEqual(counted.total_responses, 2)
+
+    def test_unknown_questions_dropped(self) -> None:
+        self.assertEqual(ingest.write_responses([self.item(question_index=2)]), 0)
+        self.assertFalse(Response.objects.exists())
+
+    def test_responses_dated_when_accepted(self) -> None:
+        accepted_at = [timezone.now() - timedelta(seconds=s) for s in (90, 30)]
+        ingest.write_responses(
+            [self.item(accepted_at=moment.isoformat()) for moment in accepted_at]
+        )
+        self.assertEqual(
+            list(Response.objects.order_by("created_at").values_list("created_at")),
+            [(moment,) for moment in sorted(accepted_at)],
+        )
+
+
+class UnreachableBuffer(ingest.ResponseBuffer):
+    def lock(self) -> Any:
+        raise RedisError("Connection refused")
+
+
+class ResponseFlusherTests(IngestTestCase):
+    def flusher(self) -> ingest.ResponseFlusher:
+        return ingest.ResponseFlusher(
+            ingest.ResponseBuffer(), batch_size=10, interval=1, max_attempts=3
+        )
+
+    def test_flush_writes_and_acknowledges_batch(self) -> None:
+        flusher = self.flusher()
+        for _ in range(2):
+            flusher.buffer.push(self.item())
+        flushed = ingest.flushed.value()
+        self.assertEqual(flusher.flush(), 2)
+        self.assertEqual(flusher.flush(), 0)
+        self.assertEqual(flusher.buffer.depth(), 0)
+        self.assertEqual(Response.objects.count(), 2)
+        self.assertEqual(ingest.flushed.value(), flushed + 2)
+
+    def test_failing_batch_retried_then_dead_lettered(self) -> None:
+        flusher = self.flusher()
+        item = self.item()
+        flusher.buffer.push(item)
+        dead_lettered = ingest.dead_lettered.value()
+        with mock.patch.object(
+            ingest, "write_responses", side_effect=DatabaseError("Database down")
+        ) as write:
+            for _ in range(3):
+                self.assertEqual(flusher.flush(), 0)
+        # the same batch was claimed again after each failure
+        self.assertEqual([call.args for call in write.call_args_list], [([item],)] * 3)
+        self.assertEqual(flusher.buffer.dead_letter_depth(), 1)
+        self.assertEqual(ingest.dead_lettered.value(), dead_lettered + 1)
+        flusher.buffer.push(self.item())  # the batches behind it aren't blocked
+        self.assertEqual(flusher.flush(), 1)
+        self.assertEqual(Response.objects.count(), 1)
+
+    def test_flush_survives_unreachable_buffer(self) -> None:
+        flusher = ingest.ResponseFlusher(
+            UnreachableBuffer(), batch_size=10, interval=1, max_attempts=3
+        )
+        failures = ingest.flush_failures.value()
+        self.assertEqual(flusher.flush(), 0)
+        self.assertEqual(ingest.flush_failures.value(), failures + 1)
+
+
+@override_settings(**fake_settings())
+class ForegroundCommandsTests(TestCase):
+    def setUp(self) -> None:
+        self.addCleanup(setattr, ingest, "_flusher", ingest._flusher)
+        self.addCleanup(setattr, scheduler, "_scheduler", scheduler._scheduler)
+        ingest._flusher = None
+        scheduler._scheduler = None
+
+    def test_flush_responses_starts_no_thread(self) -> None:
+        call_command("flush_responses", "--once", stdout=io.StringIO())
+        call_command("flush_responses", "--stats", stdout=io.StringIO())
+        self.assertIsNone(ingest.get_flusher(start=False)._thread)
+
+    def test_run_scheduler_starts_no_thread(self) -> None:
+        meeting = Meeting.objects.create(
+            user=CustomUser.objects.create_user(
+                "host@example.com", "password", first_name="Host", last_name="User"
+            ),
+            access_code="00000000",
+            title="Meeting",
+            duration=1,
+            status=Meeting.Status.IN_PROGRESS,
+        )
+        Meeting.objects.filter(pk=meeting.pk).update(
+            updated_at=timezone.now() - timedelta(minutes=5)
+        )
+        call_command("run_scheduler", "--once", stdout=io.StringIO())
+        meeting.refresh_from_db()
+        self.assertEqual(meeting.status, Meeting.Status.ENDED)
+        self.assertIsNone(scheduler.get_scheduler(start=False)._thread)
+
+
+class CounterFoldTests(TestCase):
+    def test_replayed_fold_applied_once(self) -> None:
+        host = CustomUser.objects.create_user(
+            "host@example.com", "password", first_name="Host", last_name="User"
+        )
+        deltas = {f"authentication.customuser:{host.pk}:total_participants": 3}
+        buffer = counters.RedisCounterBuffer()
+        fold_id = str(uuid.uuid4())
+        self.assertTrue(buffer._apply_once(fold_id, deltas))
+        self.assertFalse(buffer._apply_once(fold_id, deltas))  # crashed, replayed
+        host.refresh_from_db()
+        self.assertEqual(host.total_participants, 3)
+
+
+class SaveMeetingsTests(TestCase):
+    def setUp(self) -> None:
+        self.host = CustomUser.objects.create_user(
+            "host@example.com", "password", first_name="Host", last_name="User"
+        )
+        Meeting.objects.create(
+            user=self.host, access_code="11111111", title="Taken", duration=30
+        )
+
+    def new_meeting(self) -> Meeting:
+        return Meeting(user=self.host, title="Meeting", duration=30)
+
+    def test_access_code_collision_retried(self) -> None:
+        meeting = self.new_meeting()
+        with mock.patch.object(
+            services,
+            "allocate_access_codes",
+            side_effect=[["11111111"], ["22222222"]],
+        ):
+            services.save_meetings([meeting], [])
+        self.assertEqual(meeting.access_code, "22222222")
+
+    def test_other_violations_not_retried(self) -> None:
+        meeting = self.new_meeting()
+        questions = [Question(meeting=meeting, index=1, text="Q") for _ in range(2)]
+        with mock.patch.object(
+            services, "allocate_access_codes", return_value=["22222222"]
+        ) as allocate:
+            with self.assertRaises(IntegrityError):
+                services.save_meetings([meeting], questions)
+        self.assertEqual(allocate.call_count, 1)
+
+
+@override_settings(
+    **{
+        **fake_redis_settings(),
+        "RATE_LIMITS": {
+            **settings.RATE_LIMITS,
+            "BACKEND": "memory",
+            "ROUTES": {
+                **settings.RATE_LIMITS["ROUTES"],
+                "join_meeting": {"LIMIT": 2, "PERIOD_SECONDS": 60, "KEY": "ip"},
+            },
+        },
+    }
+)
+class JoinRateLimitTests(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        services.meeting_cache.local.clear()
+        self.addCleanup(setattr, rate_limits, "_buckets", rate_limits._buckets)
+        rate_limits._buckets = None
+        host = CustomUser.objects.create_user(
+            "host@example.com", "password", first_name="Host", last_name="User"
+        )
+        meeting = Meeting.objects.create(
+            user=host, access_code="00000000", title="Meeting", duration=30
+        )
+        self.url = reverse("participant_meeting", args=[meeting.access_code])
+
+    def test_page_loads_not_limited(self) -> None:
+        for _ in range(5):
+            self.assertEqual(self.client.get(self.url).status_code, 302)
+
+    def test_joins_past_limit_rejected(self) -> None:
+        for _ in range(2):
+            self.client.cookies.clear()
+            response = self.client.post(self.url, {"participantName": "Participant"})
+            self.assertEqual(response.status_code, 302)
+        response = self.client.post(self.url, {"participantName": "Participant"})
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response.headers["Retry-After"]), 1)
+
+
+# Indexes each hot query (see `check_query_plans`) may be served by, on PostgreSQL.
+# Response lookups by question can also use the foreign key's own index.
+EXPECTED_INDEXES: dict[str, tuple[str, ...]] = {
+    "meeting_questions": ("unique_question_index",),
+    "flush_questions": ("unique_question_index", "meeting_question_meeting_id"),
+    "flush_replays": ("meeting_response_submission_id",),
+    "export_rows": ("response_question_created_idx", "meeting_response_question_id"),
+    "summary_participants": ("response_question_created_idx",),
+    "summary_groups": (
+        "response_question_created_idx",
+        "meeting_response_question_id",
+    ),
+    "active_access_code": ("unique_active_access_code",),
+}
+
+
+@skipUnless(connection.vendor == "postgresql", "Plans are checked on PostgreSQL")
+class HotQueryPlansTests(TestCase):
+    def test_hot_queries_use_indexes(self) -> None:
+        with connection.cursor() as cursor:
+            # small test tables would be scanned whatever the indexes
+            cursor.execute("SET LOCAL enable_seqscan = off")
+        queries = hot_queries(uuid.uuid4())
+        self.assertEqual(queries.keys(), EXPECTED_INDEXES.keys())
+        for name, (queryset, _) in queries.items():
+            expected = EXPECTED_INDEXES[name]
+            with self.subTest(query=name):
+                plan = queryset.explain()
+                self.assertNotIn("Seq Scan", plan)
+                self.assertTrue(
+                    any(index in plan for index in expected),
+                    f"{name} doesn't use {' or '.join(expected)}:\n{plan}",
+                )
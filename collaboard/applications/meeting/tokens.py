@@ -0,0 +1,121 @@
+"""
+This module stores the signed participant tokens.
+
+Joining a meeting issues a token holding the meeting ID, participant ID, access
+code, display name and an expiry, signed with `django.core.signing`. It is sent
+as a cookie, so every later participant request is authorized by checking the
+signature alone, without loading a session or reading the database.
+Keys rotate through `settings.PARTICIPANT_TOKENS["KEYS"]`: tokens are signed
+with the first key and still verified with the older ones until they're removed.
+"""
+
+import functools
+import logging
+import time
+from typing import Any
+
+from django.conf import settings
+from django.core import signing
+from django.http import HttpRequest, HttpResponse
+
+from .. import metrics
+
+logger = logging.getLogger(__name__)
+
+SALT = "meeting.participant"
+REQUEST_ATTRIBUTE = "_participant_token"  # verified participant, once per request
+
+rejected_tokens = metrics.counter(
+    "participant_tokens_rejected_total",
+    "Participant tokens refused, by reason (bad signature or expired)",
+)
+
+
+@functools.cache
+def _signer(keys: tuple[str, ...]) -> signing.Signer:
+    return signing.Signer(
+        key=keys[0], fallback_keys=list(keys[1:]), salt=SALT, algorithm="sha256"
+    )
+
+
+def get_signer() -> signing.Signer:
+    """
+    Gets the signer for the configured keys, newest first
+    :return: The signer
+    """
+    return _signer(tuple(settings.PARTICIPANT_TOKENS["KEYS"]))
+
+
+def issue(participant: dict[str, str]) -> str:
+    """
+    Signs a participant's details
+    :param participant: Participant details (see `services.join_meeting`)
+    :return: The token
+    """
+    return get_signer().sign_object(
+        {
+            "m": participant["meeting_id"],
+            "p": participant["participant_id"],
+            "c": participant["access_code"],
+            "n": participant["name"],
+            "e": int(time.time()) + settings.PARTICIPANT_TOKENS["MAX_AGE_SECONDS"],
+        },
+        compress=True,
+    )
+
+
+def verify(token: str) -> dict[str, str] | None:
+    """
+    Checks a token's signature and expiry
+    :param token: Token to verify
+    :return: Participant details if the token is valid, else None
+    """
+    try:
+        payload: dict[str, Any] = get_signer().unsign_object(token)
+    except signing.BadSignature:
+        rejected_tokens.inc(reason="bad_signature")
+        logger.log(
+            level=logging.INFO,
+            msg="Participant Token Rejected",
+            extra={"reason": "Bad signature"},
+        )
+        return None
+    if payload["e"] < time.time():
+        rejected_tokens.inc(reason="expired")
+        return None
+    return {
+        "meeting_id": payload["m"],
+        "participant_id": payload["p"],
+        "access_code": payload["c"],
+        "name": payload["n"],
+    }
+
+
+def read(request: HttpRequest) -> dict[str, str] | None:
+    """
+    Gets the participant from the request's token cookie, verified once per request
+    :param request: Http request
+    :return: Participant details if a valid token was sent, else None
+    """
+    if not hasattr(request, REQUEST_ATTRIBUTE):
+        token = request.COOKIES.get(settings.PARTICIPANT_TOKENS["COOKIE_NAME"])
+        setattr(request, REQUEST_ATTRIBUTE, verify(token) if token else None)
+    return getattr(request, REQUEST_ATTRIBUTE)
+
+
+def attach(response: HttpResponse, participant: dict[str, str]) -> HttpResponse:
+    """
+    Sets the participant's token cookie on a response
+    :param response: Http response
+    :param participant: Participant details
+    :return: The response
+    """
+    response.set_cookie(
+        settings.PARTICIPANT_TOKENS["COOKIE_NAME"],
+        issue(participant),
+        max_age=settings.PARTICIPANT_TOKENS["MAX_AGE_SECONDS"],
+        secure=settings.SESSION_COOKIE_SECURE,
+        httponly=True,
+        samesite="Lax",
+    )
+    return response
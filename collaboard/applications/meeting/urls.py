@@ -4,7 +4,17 @@ from . import views
 
 urlpatterns = [
     path("create/", views.create_meeting, name="create_meeting"),
+    path("create/batch/", views.create_meeting_batch, name="create_meeting_batch"),
     path("locked/", views.locked_meeting, name="locked_meeting"),
     path("ended/", views.end_meeting_participant, name="end_meeting"),
     path("<uuid:meeting_id>/host/", views.host_meeting, name="host_meeting"),
+    path("<uuid:meeting_id>/export/", views.export_responses, name="export_responses"),
+    path("<uuid:meeting_id>/responses/", views.submit_response, name="submit_response"),
+    path("<uuid:meeting_id>/events/", views.meeting_events, name="meeting_events"),
+    path("<uuid:meeting_id>/state/", views.meeting_state, name="meeting_state"),
+    path(
+        "<str:access_code>/participant/",
+        views.participant_meeting,
+        name="participant_meeting",
+    ),
 ]
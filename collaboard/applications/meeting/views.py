@@ -4,13 +4,25 @@ import logging
 import uuid
 from typing import Any
 
+from asgiref.sync import sync_to_async
 from django.contrib.auth.decorators import login_required
-from django.http import Http404, HttpRequest, HttpResponse, JsonResponse
-from django.shortcuts import render, reverse
+from django.http import (
+    Http404,
+    HttpRequest,
+    HttpResponse,
+    JsonResponse,
+    StreamingHttpResponse,
+)
+from django.shortcuts import redirect, render, reverse
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date
+from django.utils.text import slugify
 from django.views.decorators.http import require_http_methods
 
-from ..meeting import services
-from .models import Meeting, Question
+from ..meeting import export, ingest, services, tokens
+from ..rate_limits import rate_limit
+from ..realtime import sse
+from .models import Meeting
 
 logger = logging.getLogger(__name__)
 
@@ -19,34 +31,20 @@ logger = logging.getLogger(__name__)
 @require_http_methods(["GET", "POST"])
 def create_meeting(request: HttpRequest) -> JsonResponse:
     if request.method == "POST":
-        data: dict[str, Any] = json.loads(request.body)
-        new_meeting: Meeting | None = services.create_meeting(
-            request.user,
-            data.get("title"),
-            data.get("description"),
-            data.get("duration"),
-        )
-        if new_meeting is None:
-            logger.log(level=logging.INFO, msg="Meeting Creation Failed")
+        try:
+            data: dict[str, Any] = json.loads(request.body)
+        except ValueError:
             return JsonResponse(status=400, data={})
-        new_questions: list[Question] | None = services.create_questions(
-            new_meeting, data.get("questions")
-        )
-        if new_questions is None:
-            logger.log(level=logging.INFO, msg="Questions Creation Failed")
+        built = services.build_meeting(request.user, data)
+        if built is None:
+            logger.log(level=logging.INFO, msg="Meeting Creation Failed")
             return JsonResponse(status=400, data={})
-        new_meeting.save()
+        new_meeting, new_questions = built
+        services.save_meetings([new_meeting], new_questions)
         logger.log(
             level=logging.INFO,
             msg="Meeting Creation Successful",
-            extra={"meeting": new_meeting},
-        )
-        for q in new_questions:
-            q.save()
-        logger.log(
-            level=logging.INFO,
-            msg="Questions Creation Successful",
-            extra={"questions": new_questions},
+            extra={"meeting_id": new_meeting.pk, "questions": len(new_questions)},
         )
         return JsonResponse(
             data={
@@ -61,6 +59,51 @@ def create_meeting(request: HttpRequest) -> JsonResponse:
         )
 
 
+@login_required
+@require_http_methods(["POST"])
+def create_meeting_batch(request: HttpRequest) -> JsonResponse:
+    """
+    Creates many meetings from a template in one request.
+    Body: `{"template": {<create meeting payload>}, "meetings": [{"title": ...}, ...]}`
+    """
+    try:
+        data: dict[str, Any] = json.loads(request.body)
+    except ValueError:
+        return JsonResponse(status=400, data={})
+    template = data.get("template")
+    overrides = data.get("meetings")
+    if not isinstance(template, dict) or not isinstance(overrides, list):
+        return JsonResponse(status=400, data={})
+    built = services.build_meetings_from_template(request.user, template, overrides)
+    if built is None:
+        logger.log(level=logging.INFO, msg="Batch Meeting Creation Failed")
+        return JsonResponse(status=400, data={})
+    new_meetings = [meeting for meeting, _ in built]
+    services.save_meetings(
+        new_meetings, [question for _, questions in built for question in questions]
+    )
+    logger.log(
+        level=logging.INFO,
+        msg="Batch Meeting Creation Successful",
+        extra={"meetings": len(new_meetings)},
+    )
+    return JsonResponse(
+        status=201,
+        data={
+            "meetings": [
+                {
+                    "id": str(meeting.pk),
+                    "access_code": meeting.access_code,
+                    "redirect": reverse(
+                        "host_meeting", kwargs={"meeting_id": meeting.pk}
+                    ),
+                }
+                for meeting in new_meetings
+            ]
+        },
+    )
+
+
 @require_http_methods(["GET"])
 def locked_meeting(request: HttpRequest) -> HttpResponse:
     return render(
@@ -76,7 +119,7 @@ def end_meeting_participant(request: HttpRequest) -> HttpResponse:
 @login_required
 @require_http_methods(["GET"])
 def host_meeting(request: HttpRequest, meeting_id: uuid.UUID) -> Http404 | Any:
-    meeting: Meeting | None = services.get_meeting(meeting_id)
+    meeting: Meeting | None = services.get_host_meeting(meeting_id, request.user)
     if meeting is None:
         logger.log(
             level=logging.WARNING,
@@ -87,5 +130,156 @@ def host_meeting(request: HttpRequest, meeting_id: uuid.UUID) -> Http404 | Any:
     return render(
         request=request,
         template_name="meeting/host_meeting.html",
-        context={"meeting": meeting},
+        context={
+            "meeting": meeting,
+            "questions": services.get_questions(meeting.pk),
+            "summary": services.get_meeting_summary(meeting),
+        },
+    )
+
+
+@require_http_methods(["GET", "POST"])
+@rate_limit("join_meeting", methods=("POST",))
+def participant_meeting(request: HttpRequest, access_code: str) -> HttpResponse:
+    meeting_id: uuid.UUID | None = services.resolve_access_code(access_code)
+    participant: dict[str, str] | None = services.get_participant(request)
+    if meeting_id is None:
+        if participant and participant.get("access_code") == access_code:
+            return redirect("end_meeting")  # the meeting they joined has ended
+        if services.access_code_ended(access_code):
+            return redirect("end_meeting")  # a late joiner
+        logger.log(
+            level=logging.INFO,
+            msg="Access Code Not Found",
+            extra={"access_code": access_code},
+        )
+        raise Http404("Meeting not found")
+    meeting: Meeting | None = services.get_meeting(meeting_id)
+    if meeting is None:
+        raise Http404("Meeting not found")
+    participant = services.get_participant(request, meeting.pk)
+    if participant is None:
+        if meeting.status != Meeting.Status.NOT_STARTED:
+            return redirect("locked_meeting")
+        name: str = request.POST.get("participantName", "").strip()
+        if request.method != "POST" or not services.valid_participant_name(name):
+            return redirect(f"{reverse('landing')}#join")
+        participant = services.join_meeting(meeting, name)
+        return tokens.attach(
+            redirect("participant_meeting", access_code=access_code), participant
+        )
+    if request.method == "POST":
+        return redirect("participant_meeting", access_code=access_code)
+    return render(
+        request=request,
+        template_name="meeting/participant_meeting.html",
+        context={"meeting": meeting, "participant": participant},
+    )
+
+
+@require_http_methods(["GET"])
+def meeting_state(request: HttpRequest, meeting_id: uuid.UUID) -> HttpResponse:
+    meeting: Meeting | None = services.get_meeting(meeting_id)
+    if meeting is None:
+        raise Http404("Meeting not found")
+    if services.get_participant(request, meeting.pk) is None and not (
+        request.user.is_authenticated and request.user.pk == meeting.user_id
+    ):
+        return JsonResponse(status=403, data={})
+    etag = services.get_meeting_state_etag(meeting)
+    last_modified = meeting.updated_at.timestamp()
+    # polls of an unchanged meeting end here, answered from the meeting cache
+    response = get_conditional_response(
+        request, etag=etag, last_modified=int(last_modified)
+    )
+    if response is None:
+        response = JsonResponse(services.get_meeting_state(meeting))
+    response.headers["ETag"] = etag
+    response.headers["Last-Modified"] = http_date(last_modified)
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+
+@require_http_methods(["POST"])
+@rate_limit("submit_response")
+def submit_response(request: HttpRequest, meeting_id: uuid.UUID) -> JsonResponse:
+    participant: dict[str, str] | None = services.get_participant(request, meeting_id)
+    if participant is None:
+        return JsonResponse(status=403, data={})
+    try:
+        data: dict[str, Any] = json.loads(request.body)
+        question_index = data.get("question_index")
+        text: str = (data.get("text") or "").strip()
+        submission_id = (
+            uuid.UUID(data["submission_id"]) if data.get("submission_id") else None
+        )
+    except (ValueError, TypeError, AttributeError):
+        return JsonResponse(status=400, data={})
+    if not isinstance(question_index, int) or question_index < 1:
+        return JsonResponse(status=400, data={})
+    if not 0 < len(text) <= ingest.RESPONSE_TEXT_MAX_LENGTH:
+        return JsonResponse(status=400, data={})
+    # cached, so a live meeting's submissions don't query the database
+    meeting: Meeting | None = services.get_meeting(meeting_id)
+    if meeting is None:
+        return JsonResponse(status=404, data={})
+    if meeting.status != Meeting.Status.IN_PROGRESS:
+        return JsonResponse(status=409, data={})
+    if question_index > meeting.current_question:
+        return JsonResponse(status=400, data={})  # not shown yet, or doesn't exist
+    submission_id = ingest.submit_response(
+        meeting_id, participant["participant_id"], question_index, text, submission_id
+    )
+    return JsonResponse(status=202, data={"submission_id": str(submission_id)})
+
+
+@login_required
+@require_http_methods(["GET"])
+async def export_responses(
+    request: HttpRequest, meeting_id: uuid.UUID
+) -> StreamingHttpResponse:
+    export_format: str = request.GET.get("format", "csv")
+    if export_format not in export.FORMATS:
+        raise Http404("Unknown export format")
+    meeting: Meeting | None = await sync_to_async(services.get_host_meeting)(
+        meeting_id, await request.auser()
+    )
+    if meeting is None:
+        raise Http404("Meeting not found")
+    filename = f"{slugify(meeting.title) or 'meeting'}-responses.{export_format}"
+    content = export.stream_rows(meeting.pk, export_format)
+    content_type = export.FORMATS[export_format]
+    if request.GET.get("gzip") == "1":
+        content = export.gzip_stream(content)
+        content_type = "application/gzip"
+        filename += ".gz"
+    logger.log(
+        level=logging.INFO,
+        msg="Responses Exported",
+        extra={"meeting_id": meeting.pk, "format": export_format},
+    )
+    return StreamingHttpResponse(
+        content,
+        content_type=content_type,
+        headers={"Content-Disposition": content_disposition_header(True, filename)},
+    )
+
+
+@require_http_methods(["GET"])
+async def meeting_events(
+    request: HttpRequest, meeting_id: uuid.UUID
+) -> HttpResponse | StreamingHttpResponse:
+    participant: dict[str, str] | None = await sync_to_async(services.get_participant)(
+        request, meeting_id
+    )
+    if participant is None:
+        return HttpResponse(status=403)
+    if await sync_to_async(services.get_meeting)(meeting_id) is None:
+        raise Http404("Meeting not found")
+    return StreamingHttpResponse(
+        sse.stream(
+            meeting_id, sse.parse_last_event_id(request.headers.get("Last-Event-ID"))
+        ),
+        content_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
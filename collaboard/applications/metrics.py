@@ -0,0 +1,288 @@
+"""
+This module stores lightweight, thread-safe in-process metrics used throughout
+the application
+"""
+
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Any, Callable
+
+LabelKey = tuple[tuple[str, str], ...]
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _label_key(labels: dict[str, Any]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+class Metric(ABC):
+    """
+    Base of every metric, exposed by `exposition` through its samples
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name: str, description: str) -> None:
+        self.name = name
+        self.description = description
+        self._lock = threading.Lock()
+
+    @abstractmethod
+    def samples(self) -> dict[LabelKey, Any]:
+        """
+        :return: Current values, by label set
+        """
+
+
+class Counter(Metric):
+    """
+    A monotonically increasing value, optionally split by labels
+    """
+
+    kind = "counter"
+
+    def __init__(self, name: str, description: str) -> None:
+        super().__init__(name, description)
+        self._values: dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(_label_key(labels), 0)
+
+    def samples(self) -> dict[LabelKey, float]:
+        with self._lock:
+            return dict(self._values)
+
+
+class Gauge(Metric):
+    """
+    A value that goes up and down. If `function` is given it is called on read.
+    """
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        function: Callable[[], float] | None = None,
+    ) -> None:
+        super().__init__(name, description)
+        self._values: dict[LabelKey, float] = {}
+        self.function = function
+
+    def set(self, value: float, **labels: Any) -> None:
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: Any) -> None:
+        self.inc(-amount, **labels)
+
+    def value(self, **labels: Any) -> float:
+        if self.function is not None:
+            return self.function()
+        return self._values.get(_label_key(labels), 0)
+
+    def samples(self) -> dict[LabelKey, float]:
+        if self.function is not None:
+            return {(): self.function()}
+        with self._lock:
+            return dict(self._values)
+
+
+class Histogram(Metric):
+    """
+    Counts observations (e.g. durations in seconds) into cumulative buckets
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, description)
+        self.buckets = buckets
+        self._values: dict[LabelKey, dict[str, Any]] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            sample: dict[str, Any] | None = self._values.get(key)
+            if sample is None:
+                sample = {"count": 0, "sum": 0.0, "buckets": [0] * len(self.buckets)}
+                self._values[key] = sample
+            sample["count"] += 1
+            sample["sum"] += value
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    sample["buckets"][index] += 1
+
+    def samples(self) -> dict[LabelKey, dict[str, Any]]:
+        with self._lock:
+            return {
+                key: {**sample, "buckets": list(sample["buckets"])}
+                for key, sample in self._values.items()
+            }
+
+
+class Meter(Metric):
+    """
+    Events per second over a sliding window of one second slots
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name: str, description: str, window_seconds: int = 60) -> None:
+        super().__init__(name, description)
+        self.window_seconds = window_seconds
+        self._slots: deque[list[int]] = deque()  # [second, count], oldest first
+
+    def mark(self, amount: int = 1) -> None:
+        now = int(time.monotonic())
+        with self._lock:
+            if self._slots and self._slots[-1][0] == now:
+                self._slots[-1][1] += amount
+            else:
+                self._slots.append([now, amount])
+            self._expire(now)
+
+    def rate(self) -> float:
+        now = int(time.monotonic())
+        with self._lock:
+            self._expire(now)
+            return sum(count for _, count in self._slots) / self.window_seconds
+
+    def _expire(self, now: int) -> None:
+        while self._slots and self._slots[0][0] <= now - self.window_seconds:
+            self._slots.popleft()
+
+    def samples(self) -> dict[LabelKey, float]:
+        return {(): self.rate()}
+
+
+_registry: dict[str, Metric] = {}
+_registry_lock = threading.Lock()
+
+
+def _register(metric: Metric) -> Any:
+    with _registry_lock:
+        return _registry.setdefault(metric.name, metric)
+
+
+def register(metric: Metric) -> Any:
+    """
+    Registers a custom metric, e.g. one computing labelled samples on read
+    :param metric: The metric
+    :return: The metric registered under its name
+    """
+    return _register(metric)
+
+
+def counter(name: str, description: str) -> Counter:
+    """
+    Gets or creates a registered counter
+    :param name: Metric name, e.g. `responses_ingested_total`
+    :param description: One line description
+    :return: The counter
+    """
+    return _register(Counter(name, description))
+
+
+def gauge(
+    name: str, description: str, function: Callable[[], float] | None = None
+) -> Gauge:
+    """
+    Gets or creates a registered gauge
+    :param name: Metric name
+    :param description: One line description
+    :param function: Optional callback computing the value on read
+    :return: The gauge
+    """
+    return _register(Gauge(name, description, function))
+
+
+def histogram(
+    name: str, description: str, buckets: tuple[float, ...] = DEFAULT_BUCKETS
+) -> Histogram:
+    """
+    Gets or creates a registered histogram
+    :param name: Metric name, e.g. `response_flush_seconds`
+    :param description: One line description
+    :param buckets: Upper bounds of the buckets
+    :return: The histogram
+    """
+    return _register(Histogram(name, description, buckets))
+
+
+def meter(name: str, description: str, window_seconds: int = 60) -> Meter:
+    """
+    Gets or creates a registered rate meter
+    :param name: Metric name, e.g. `responses_ingested_per_second`
+    :param description: One line description
+    :param window_seconds: Length of the sliding window
+    :return: The meter
+    """
+    return _register(Meter(name, description, window_seconds))
+
+
+def registry() -> list[Metric]:
+    """
+    Gets every registered metric
+    :return: Metrics sorted by name
+    """
+    with _registry_lock:
+        return sorted(_registry.values(), key=lambda metric: metric.name)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key: LabelKey, extra: tuple[tuple[str, str], ...] = ()) -> str:
+    labels = key + extra
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+def exposition() -> str:
+    """
+    Renders every registered metric in the Prometheus text format (0.0.4).
+    Values are those of this process only.
+    :return: The exposition text
+    """
+    lines: list[str] = []
+    for metric in registry():
+        try:
+            samples = metric.samples()
+        except Exception:
+            continue  # e.g. a gauge callback whose backend is down
+        lines.append(f"# HELP {metric.name} {metric.description}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for key, sample in sorted(samples.items()):
+            if not isinstance(metric, Histogram):
+                lines.append(f"{metric.name}{_format_labels(key)} {sample}")
+                continue
+            for bound, count in zip(metric.buckets, sample["buckets"]):
+                labels = _format_labels(key, (("le", str(bound)),))
+                lines.append(f"{metric.name}_bucket{labels} {count}")
+            labels = _format_labels(key, (("le", "+Inf"),))
+            lines.append(f"{metric.name}_bucket{labels} {sample['count']}")
+            lines.append(f"{metric.name}_sum{_format_labels(key)} {sample['sum']}")
+            lines.append(f"{metric.name}_count{_format_labels(key)} {sample['count']}")
+    return "\n".join(lines) + "\n"
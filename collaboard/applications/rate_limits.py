@@ -0,0 +1,234 @@
+"""
+This module stores the per-route rate limits (`settings.RATE_LIMITS`).
+
+Each route has a token bucket per client: `LIMIT` requests, refilled evenly
+over `PERIOD_SECONDS`, so bursts up to `LIMIT` pass and the sustained rate is
+`LIMIT / PERIOD_SECONDS`. Buckets live in Redis and are checked and updated by
+one Lua script, a single round trip using the Redis clock. When Redis can't be
+reached, this process' in-memory buckets take over, so limits still hold per
+worker.
+The `rate_limit` decorator runs before the view, so rejected requests never
+reach the database or the password hashing pool; they get a 429 with a
+`Retry-After` header and are counted by route.
+"""
+
+import functools
+import inspect
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse
+from django_redis import get_redis_connection
+
+from . import metrics
+from .meeting import tokens
+from .realtime.brokers import redis_available
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "ratelimit:"
+LOCAL_MAX_BUCKETS = 100_000  # least recently used buckets are dropped past this
+
+# Refills and takes a token from bucket KEYS[1] (ARGV: rate per second, burst).
+# Returns {allowed, seconds until a token is available} (as a string, Lua
+# numbers become integers in replies)
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'at')
+local tokens = tonumber(bucket[1]) or burst
+local at = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - at) * rate)
+local allowed = 0
+local retry = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    retry = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'at', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000))
+return {allowed, tostring(retry)}
+"""
+
+rejections = metrics.counter(
+    "rate_limit_rejections_total", "Requests rejected by a rate limit, by route"
+)
+fallbacks = metrics.counter(
+    "rate_limit_local_checks_total",
+    "Rate limit checks served by the in-memory buckets as Redis was unreachable",
+)
+
+
+class LocalBuckets:
+    """
+    In-memory token buckets, for a single process and as the Redis fallback
+    """
+
+    def __init__(self, max_buckets: int = LOCAL_MAX_BUCKETS) -> None:
+        self.max_buckets = max_buckets
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rate: float, burst: int) -> tuple[bool, float]:
+        """
+        Takes a token from a bucket
+        :return: (allowed, seconds until a token is available)
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, at = self._buckets.pop(key, (burst, now))
+            tokens = min(burst, tokens + (now - at) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+        return allowed, 0.0 if allowed else (1 - tokens) / rate
+
+
+class RedisBuckets(LocalBuckets):
+    """
+    Token buckets in Redis, shared by every worker
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._script = None
+
+    def take(self, key: str, rate: float, burst: int) -> tuple[bool, float]:
+        try:
+            if self._script is None:
+                self._script = get_redis_connection("default").register_script(
+                    TOKEN_BUCKET_SCRIPT
+                )
+            allowed, retry = self._script(keys=[KEY_PREFIX + key], args=[rate, burst])
+            return bool(allowed), float(retry)
+        except Exception:
+            fallbacks.inc()
+            return super().take(key, rate, burst)
+
+
+_buckets: LocalBuckets | None = None
+_buckets_lock = threading.Lock()
+
+
+def get_buckets() -> LocalBuckets:
+    """
+    Gets the process wide buckets, choosing them on first use.
+    `settings.RATE_LIMITS["BACKEND"]` may be "redis", "memory" or "auto".
+    :return: The buckets
+    """
+    global _buckets
+    if _buckets is None:
+        with _buckets_lock:
+            if _buckets is None:
+                backend = settings.RATE_LIMITS["BACKEND"]
+                use_redis = backend == "redis" or (
+                    backend == "auto" and redis_available()
+                )
+                _buckets = RedisBuckets() if use_redis else LocalBuckets()
+    return _buckets
+
+
+def client_key(request: HttpRequest, key: str) -> str:
+    """
+    Identifies the client a limit applies to, without touching the database
+    :param request: Http request
+    :param key: "ip", "session" for the session cookie or "participant" for the
+        signed participant token (the IP without one)
+    :return: The client identifier
+    """
+    if key == "participant":
+        participant = tokens.read(request)
+        if participant is not None:
+            return f"participant:{participant['participant_id']}"
+    if key == "session":
+        session_key = request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+        if session_key:
+            return f"session:{session_key}"
+    client_ip: Callable[[HttpRequest], str] | None = settings.RATE_LIMIT_CLIENT_IP
+    if client_ip is not None:
+        return f"ip:{client_ip(request)}"
+    return f"ip:{request.META.get('REMOTE_ADDR', '')}"
+
+
+def check(request: HttpRequest, route: str) -> float | None:
+    """
+    Takes a token from the client's bucket for the route
+    :param request: Http request
+    :param route: A key of `settings.RATE_LIMITS["ROUTES"]`
+    :return: None if the request may proceed, else seconds before retrying
+    """
+    config: dict[str, Any] = settings.RATE_LIMITS
+    limit: dict[str, Any] = config["ROUTES"][route]
+    if not config["ENABLED"]:
+        return None
+    allowed, retry = get_buckets().take(
+        f"{route}:{client_key(request, limit['KEY'])}",
+        rate=limit["LIMIT"] / limit["PERIOD_SECONDS"],
+        burst=limit["LIMIT"],
+    )
+    if allowed:
+        return None
+    rejections.inc(route=route)
+    logger.log(
+        level=logging.WARNING,
+        msg="Rate Limited",
+        extra={"route": route, "path": request.path},
+    )
+    return retry
+
+
+def _too_many_requests(retry: float) -> HttpResponse:
+    return HttpResponse(
+        "Too many requests, please try again later.",
+        status=429,
+        headers={"Retry-After": str(max(1, math.ceil(retry)))},
+    )
+
+
+def rate_limit(route: str, methods: tuple[str, ...] | None = None) -> Callable:
+    """
+    Applies the route's limit before the view runs, to sync and async views
+    :param route: A key of `settings.RATE_LIMITS["ROUTES"]`
+    :param methods: Limited methods, every method if None
+    :return: The decorator
+    """
+
+    def decorator(view: Callable) -> Callable:
+        if inspect.iscoroutinefunction(view):
+
+            @functools.wraps(view)
+            async def async_wrapper(
+                request: HttpRequest, *args: Any, **kwargs: Any
+            ) -> Any:
+                if methods is None or request.method in methods:
+                    retry = await sync_to_async(check)(request, route)
+                    if retry is not None:
+                        return _too_many_requests(retry)
+                return await view(request, *args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(view)
+        def wrapper(request: HttpRequest, *args: Any, **kwargs: Any) -> Any:
+            if methods is None or request.method in methods:
+                retry = check(request, route)
+                if retry is not None:
+                    return _too_many_requests(retry)
+            return view(request, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,369 @@
+"""
+This module stores the message brokers used to fan out live meeting events
+to every WebSocket connected to this worker
+"""
+
+import asyncio
+import json
+import logging
+import queue
+import threading
+from collections import defaultdict
+from concurrent.futures import Future
+from typing import Any
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+SUBSCRIBER_QUEUE_SIZE = 100  # frames buffered per socket before the oldest is dropped
+READ_TIMEOUT_SECONDS = 0.1  # Redis listener poll, also the (un)subscription latency
+RETRY_SECONDS = 1.0  # wait before the listener retries a lost Redis connection
+
+Frame = list[dict[str, Any]]  # events delivered to a socket in a single tick
+
+
+def coalesce(messages: Frame) -> Frame:
+    """
+    Merges a tick's worth of events into the smallest equivalent frame.
+    Events carrying a `count` in their data (e.g. new responses) are summed
+    with earlier events of the same name and data, every other event is kept in order.
+    :param messages: Events published during the tick, oldest first
+    :return: Coalesced events
+    """
+    frame: Frame = []
+    counted: dict[str, dict[str, Any]] = {}
+    for message in messages:
+        data = message.get("data") or {}
+        if "count" not in data:
+            frame.append(message)
+            continue
+        key = json.dumps(
+            [message["event"], {k: v for k, v in data.items() if k != "count"}],
+            sort_keys=True,
+        )
+        merged = counted.get(key)
+        if merged is None:
+            merged = counted[key] = {**message, "data": dict(data)}
+            frame.append(merged)
+        else:
+            merged["data"]["count"] += data["count"]
+    return frame
+
+
+class Subscription:
+    """
+    A single subscriber's bounded inbox on a broker channel.
+    A slow socket drops its oldest frames instead of blocking the publisher.
+    """
+
+    def __init__(self, broker: "InProcessBroker", channel: str) -> None:
+        self.broker = broker
+        self.channel = channel
+        self.queue: asyncio.Queue[Frame] = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.dropped = 0
+
+    def deliver(self, frame: Frame) -> None:
+        """
+        Queues a frame for this subscriber, dropping the oldest one if full
+        :param frame: Coalesced events to deliver
+        """
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(frame)
+
+    async def __aenter__(self) -> "Subscription":
+        await self.broker.attach(self)
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.broker.detach(self)
+
+    def __aiter__(self) -> "Subscription":
+        return self
+
+    async def __anext__(self) -> Frame:
+        return await self.queue.get()
+
+
+class InProcessBroker:
+    """
+    Fans out published events to the subscriptions of this process, one
+    coalesced frame per channel per tick.
+    Used on its own for single-process deployments and tests, and as the local
+    fan-out stage of `RedisBroker`.
+    """
+
+    def __init__(self, tick_seconds: float = 0.0) -> None:
+        self.tick_seconds = tick_seconds
+        self._subscriptions: dict[str, set[Subscription]] = defaultdict(set)
+        self._pending: dict[str, Frame] = {}
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def subscribe(self, channel: str) -> Subscription:
+        """
+        Creates a subscription, to be entered with `async with`
+        :param channel: Channel to subscribe to
+        :return: Unattached subscription
+        """
+        return Subscription(self, channel)
+
+    def subscriber_count(self, channel: str) -> int:
+        """
+        Counts the local subscribers of a channel
+        :param channel: Channel to inspect
+        :return: Number of subscriptions attached in this process
+        """
+        return len(self._subscriptions.get(channel, ()))
+
+    async def attach(self, subscription: Subscription) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._subscriptions[subscription.channel].add(subscription)
+
+    async def detach(self, subscription: Subscription) -> None:
+        subscribers = self._subscriptions.get(subscription.channel)
+        if subscribers is None:
+            return
+        subscribers.discard(subscription)
+        if not subscribers:
+            del self._subscriptions[subscription.channel]
+
+    async def publish(self, channel: str, message: dict[str, Any]) -> None:
+        """
+        Publishes a message from inside the event loop
+        :param channel: Channel to publish on
+        :param message: JSON serializable event
+        """
+        self.fan_out(channel, message)
+
+    def publish_sync(self, channel: str, message: dict[str, Any]) -> None:
+        """
+        Publishes a message from synchronous code (views, services).
+        Delivery is handed over to the event loop that owns the subscriptions.
+        :param channel: Channel to publish on
+        :param message: JSON serializable event
+        """
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return  # nothing ever subscribed in this process
+        loop.call_soon_threadsafe(self.fan_out, channel, message)
+
+    def fan_out(self, channel: str, message: dict[str, Any]) -> None:
+        """
+        Buffers a message for the local subscribers of the channel.
+        The first message of a tick schedules the flush, so a burst of any size
+        reaches each socket as a single frame. Must run on the event loop.
+        :param channel: Channel the message was published on
+        :param message: Decoded event
+        """
+        if channel not in self._subscriptions:
+            return
+        pending = self._pending.get(channel)
+        if pending is not None:
+            pending.append(message)
+            return
+        self._pending[channel] = [message]
+        if self.tick_seconds and self._loop is not None:
+            self._loop.call_later(self.tick_seconds, self.flush, channel)
+        else:
+            self.flush(channel)
+
+    def flush(self, channel: str) -> None:
+        """
+        Delivers the buffered messages of a channel as one coalesced frame
+        :param channel: Channel to flush
+        """
+        messages = self._pending.pop(channel, None)
+        if not messages:
+            return
+        frame = coalesce(messages)
+        for subscription in tuple(self._subscriptions.get(channel, ())):
+            subscription.deliver(frame)
+
+    async def close(self) -> None:
+        self._subscriptions.clear()
+        self._pending.clear()
+
+
+class RedisBroker(InProcessBroker):
+    """
+    Relays events through Redis pub/sub, over the django-redis `default` pool,
+    so that an event published by any worker reaches sockets on every worker.
+    Each worker holds one Redis subscription per channel it serves, read by a
+    single listener thread, and fans out locally.
+    """
+
+    def __init__(self, tick_seconds: float = 0.0) -> None:
+        super().__init__(tick_seconds)
+        self._pubsub: Any = None  # only used by the listener thread
+        self._commands: queue.SimpleQueue[tuple[str, str, Future]] = queue.SimpleQueue()
+        self._subscribed: dict[str, Future] = {}  # by channel, done once subscribed
+        self._listener: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+
+    async def attach(self, subscription: Subscription) -> None:
+        await super().attach(subscription)
+        subscribed = self._subscribed.get(subscription.channel)
+        if subscribed is None:
+            subscribed = self._subscribed[subscription.channel] = self._command(
+                "subscribe", subscription.channel
+            )
+        try:
+            # later subscribers of the channel also wait, until Redis confirmed it
+            await asyncio.wrap_future(subscribed)
+        except (RedisError, OSError):
+            if self._subscribed.get(subscription.channel) is subscribed:
+                del self._subscribed[subscription.channel]  # retried by the next one
+            await super().detach(subscription)
+            raise
+
+    async def detach(self, subscription: Subscription) -> None:
+        await super().detach(subscription)
+        if subscription.channel not in self._subscriptions:
+            self._subscribed.pop(subscription.channel, None)
+            self._command("unsubscribe", subscription.channel)
+
+    def _command(self, action: str, channel: str) -> Future:
+        """
+        Queues a (un)subscription for the listener thread, the only user of the
+        PubSub connection as redis-py's isn't thread safe
+        :param action: "subscribe" or "unsubscribe"
+        :param channel: Channel to (un)subscribe
+        :return: Future resolved once the listener sent the command
+        """
+        future: Future = Future()
+        self._commands.put((action, channel, future))
+        with self._lock:
+            if self._listener is None or not self._listener.is_alive():
+                self._listener = threading.Thread(
+                    target=self._listen, name="realtime-listener", daemon=True
+                )
+                self._listener.start()
+        return future
+
+    def _run_commands(self) -> None:
+        while True:
+            try:
+                action, channel, future = self._commands.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                if self._pubsub is None:
+                    self._pubsub = get_redis_connection("default").pubsub(
+                        ignore_subscribe_messages=True
+                    )
+                getattr(self._pubsub, action)(channel)
+                future.set_result(None)
+            except (RedisError, OSError) as e:
+                future.set_exception(e)
+
+    async def publish(self, channel: str, message: dict[str, Any]) -> None:
+        await asyncio.to_thread(self.publish_sync, channel, message)
+
+    def publish_sync(self, channel: str, message: dict[str, Any]) -> None:
+        try:
+            get_redis_connection("default").publish(channel, json.dumps(message))
+        except RedisError as e:
+            logger.log(
+                level=logging.ERROR,
+                msg="Realtime Publish Failed",
+                extra={"channel": channel, "reason": e.args},
+            )
+
+    def _listen(self) -> None:
+        """
+        Sends the queued (un)subscriptions and hands Redis messages over to the
+        event loop, until the broker closes
+        """
+        try:
+            self._receive()
+        finally:
+            self._close_pubsub()
+
+    def _receive(self) -> None:
+        while not self._closed.is_set():
+            self._run_commands()
+            if self._pubsub is None:
+                self._closed.wait(READ_TIMEOUT_SECONDS)
+                continue
+            try:
+                message = self._pubsub.get_message(timeout=READ_TIMEOUT_SECONDS)
+            except (RedisError, OSError) as e:
+                logger.log(
+                    level=logging.WARNING,
+                    msg="Realtime Listener Disconnected",
+                    extra={"reason": e.args},
+                )
+                self._closed.wait(RETRY_SECONDS)
+                continue
+            if message is None or self._loop is None or self._loop.is_closed():
+                continue
+            channel = message["channel"]
+            if isinstance(channel, bytes):
+                channel = channel.decode()
+            self._loop.call_soon_threadsafe(
+                self.fan_out, channel, json.loads(message["data"])
+            )
+
+    async def close(self) -> None:
+        await super().close()
+        self._subscribed.clear()
+        self._closed.set()
+        if self._listener is not None:
+            await asyncio.to_thread(self._listener.join)
+
+    def _close_pubsub(self) -> None:
+        if self._pubsub is not None:
+            self._pubsub.close()
+            self._pubsub = None
+
+
+_broker: InProcessBroker | None = None
+_broker_lock = threading.Lock()
+
+
+def redis_available() -> bool:
+    """
+    Checks if the default Redis cache server answers
+    :return: True if Redis replied to a PING, else False
+    """
+    try:
+        return bool(get_redis_connection("default").ping())
+    except (RedisError, OSError):
+        return False
+
+
+def get_broker() -> InProcessBroker:
+    """
+    Gets the process wide broker, choosing the implementation on first use.
+    `settings.REALTIME_BROKER` may be "redis", "memory", "auto" (Redis when it
+    is reachable, else in-process) or the dotted path of a broker class.
+    :return: The broker instance
+    """
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = _build_broker()
+    return _broker
+
+
+def _build_broker() -> InProcessBroker:
+    backend: str = settings.REALTIME_BROKER
+    tick_seconds: float = settings.REALTIME_TICK_SECONDS
+    if "." in backend:
+        return import_string(backend)(tick_seconds)
+    if backend == "memory":
+        return InProcessBroker(tick_seconds)
+    if backend == "auto" and not redis_available():
+        logger.log(
+            level=logging.WARNING,
+            msg="Redis Unavailable, Using In-Process Realtime Broker",
+        )
+        return InProcessBroker(tick_seconds)
+    return RedisBroker(tick_seconds)
@@ -0,0 +1,151 @@
+"""
+This module stores the raw ASGI WebSocket consumers for live meetings
+"""
+
+import asyncio
+import json
+import logging
+import uuid
+from importlib import import_module
+from types import SimpleNamespace
+from typing import Any, Awaitable, Callable
+from urllib.parse import urlsplit
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.http.cookie import parse_cookie
+from django.http.request import validate_host
+
+from ..meeting import services
+from ..meeting.models import Meeting
+from . import events
+from .brokers import Frame, Subscription, get_broker
+from .replay import get_replay_buffer
+
+logger = logging.getLogger(__name__)
+
+Receive = Callable[[], Awaitable[dict[str, Any]]]
+Send = Callable[[dict[str, Any]], Awaitable[None]]
+
+CLOSE_NOT_FOUND = 4404  # application close code for an unknown meeting
+
+HOST_COMMANDS: dict[str, Callable[[uuid.UUID], Meeting | None]] = {
+    "start": services.start_meeting,
+    "next": services.advance_question,
+    "end": services.end_meeting,
+}
+
+
+def _headers(scope: dict[str, Any]) -> dict[str, str]:
+    return {
+        name.decode("latin1"): value.decode("latin1")
+        for name, value in scope.get("headers", [])
+    }
+
+
+def _is_host(scope: dict[str, Any], meeting: Meeting) -> bool:
+    """
+    Checks if the socket belongs to the host, using the Django session cookie.
+    Cross-site origins are never treated as the host.
+    :param scope: ASGI connection scope
+    :param meeting: Meeting being joined
+    :return: True if the session's user created the meeting
+    """
+    headers = _headers(scope)
+    origin = headers.get("origin")
+    if origin and not validate_host(
+        urlsplit(origin).hostname or "", settings.ALLOWED_HOSTS
+    ):
+        return False
+    session_key = parse_cookie(headers.get("cookie", "")).get(
+        settings.SESSION_COOKIE_NAME
+    )
+    if not session_key:
+        return False
+    session = import_module(settings.SESSION_ENGINE).SessionStore(session_key)
+    user = get_user(SimpleNamespace(session=session))  # type: ignore[arg-type]
+    return user.is_authenticated and user.pk == meeting.user_id
+
+
+def _authorize(
+    scope: dict[str, Any], meeting_id: uuid.UUID
+) -> tuple[dict[str, Any] | None, bool]:
+    """
+    Loads the state snapshot of a new socket, once it is subscribed. The snapshot
+    carries the ID of the latest state event (see `replay`), older ones queued
+    before it was taken are dropped.
+    :param scope: ASGI connection scope
+    :param meeting_id: ID of the meeting
+    :return: (state event or None if not found, True if the socket is the host)
+    """
+    last_id = get_replay_buffer().last_id(events.meeting_channel(meeting_id))
+    # the snapshot must not predate events the socket will miss
+    meeting = services.get_meeting(meeting_id, revalidate=True)
+    if meeting is None:
+        return None, False
+    state = events.build_event(
+        meeting_id, events.STATE, services.get_meeting_state(meeting)
+    )
+    return {**state, "id": last_id}, _is_host(scope, meeting)
+
+
+async def _send_frame(send: Send, frame: Frame) -> None:
+    await send({"type": "websocket.send", "text": json.dumps(frame)})
+
+
+async def _forward(subscription: Subscription, send: Send, after_id: int) -> None:
+    async for frame in subscription:
+        # state events the snapshot already covers
+        frame = [event for event in frame if event.get("id", after_id + 1) > after_id]
+        if frame:
+            await _send_frame(send, frame)
+
+
+async def _handle_command(meeting_id: uuid.UUID, text: str | None) -> None:
+    """
+    Runs a host control command, the resulting events reach sockets via the broker
+    :param meeting_id: ID of the meeting
+    :param text: Raw frame, e.g. `{"command": "next"}`
+    """
+    try:
+        command = json.loads(text or "").get("command")
+    except (ValueError, AttributeError):
+        return
+    handler = HOST_COMMANDS.get(command)
+    if handler is None:
+        return
+    await sync_to_async(handler)(meeting_id)
+
+
+async def meeting_socket(
+    scope: dict[str, Any], receive: Receive, send: Send, meeting_id: uuid.UUID
+) -> None:
+    """
+    Streams the events of a meeting to a single socket.
+    Every socket receives a state snapshot on connect, followed by one frame
+    (a JSON array of events) per broker tick. The host's socket may also send
+    control commands.
+    """
+    message = await receive()
+    if message["type"] != "websocket.connect":
+        return
+    channel = events.meeting_channel(meeting_id)
+    # subscribed before the snapshot, so nothing published meanwhile is lost
+    async with get_broker().subscribe(channel) as subscription:
+        state, is_host = await sync_to_async(_authorize)(scope, meeting_id)
+        if state is None:
+            await send({"type": "websocket.close", "code": CLOSE_NOT_FOUND})
+            return
+        await send({"type": "websocket.accept"})
+        await _send_frame(send, [state])
+        forwarder = asyncio.create_task(_forward(subscription, send, state["id"]))
+        try:
+            while True:
+                message = await receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                if message["type"] == "websocket.receive" and is_host:
+                    await _handle_command(meeting_id, message.get("text"))
+        finally:
+            forwarder.cancel()
@@ -0,0 +1,77 @@
+"""
+This module stores the live meeting event names and the helpers used to publish them
+"""
+
+import asyncio
+import uuid
+from typing import Any
+
+from .brokers import get_broker
+from .replay import get_replay_buffer
+
+STATE = "state"  # snapshot sent to a socket when it connects
+MEETING_STARTED = "meeting_started"
+QUESTION_ADVANCED = "question_advanced"
+MEETING_ENDED = "meeting_ended"
+NEW_RESPONSE = "new_response"  # data carries a `count`, bursts are summed per tick
+
+# Events carrying the whole meeting state, numbered with an `id` and kept for
+# clients resuming a stream (see `replay`)
+REPLAYED_EVENTS = frozenset({MEETING_STARTED, QUESTION_ADVANCED, MEETING_ENDED})
+
+
+def meeting_channel(meeting_id: uuid.UUID | str) -> str:
+    """
+    Builds the broker channel name of a meeting
+    :param meeting_id: ID of the meeting
+    :return: Channel name
+    """
+    return f"meeting:{meeting_id}"
+
+
+def build_event(
+    meeting_id: uuid.UUID | str, event: str, data: dict[str, Any] | None = None
+) -> dict[str, Any]:
+    """
+    Builds the JSON frame sent to meeting sockets
+    :param meeting_id: ID of the meeting
+    :param event: Name of the event
+    :param data: Event payload
+    :return: The event frame
+    """
+    return {"event": event, "meeting_id": str(meeting_id), "data": data or {}}
+
+
+def _numbered(channel: str, message: dict[str, Any]) -> dict[str, Any]:
+    if message["event"] not in REPLAYED_EVENTS:
+        return message
+    event_id = get_replay_buffer().append(channel, message)
+    return {**message, "id": event_id} if event_id else message
+
+
+def publish_meeting_event(
+    meeting_id: uuid.UUID | str, event: str, data: dict[str, Any] | None = None
+) -> None:
+    """
+    Publishes an event to every socket of a meeting, from synchronous code
+    :param meeting_id: ID of the meeting
+    :param event: Name of the event
+    :param data: Event payload
+    """
+    channel = meeting_channel(meeting_id)
+    get_broker().publish_sync(
+        channel, _numbered(channel, build_event(meeting_id, event, data))
+    )
+
+
+async def apublish_meeting_event(
+    meeting_id: uuid.UUID | str, event: str, data: dict[str, Any] | None = None
+) -> None:
+    """
+    Async version of `publish_meeting_event`
+    """
+    channel = meeting_channel(meeting_id)
+    message = await asyncio.to_thread(
+        _numbered, channel, build_event(meeting_id, event, data)
+    )
+    await get_broker().publish(channel, message)
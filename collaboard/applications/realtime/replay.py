@@ -0,0 +1,173 @@
+"""
+This module stores the replay buffers numbering the state events of a meeting
+(see `events.REPLAYED_EVENTS`) and keeping the latest ones, so a client that
+reconnects with the last ID it saw (SSE `Last-Event-ID`) gets what it missed.
+
+IDs increase per channel. A client whose ID fell out of the buffer, or belongs
+to a buffer that expired, gets a state snapshot instead.
+"""
+
+import json
+import logging
+import threading
+from collections import OrderedDict, deque
+from typing import Any, cast
+
+from django.conf import settings
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+
+from .brokers import redis_available
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "replay:"
+LOCAL_MAX_CHANNELS = 10_000  # least recently published channels are dropped past this
+
+# Numbers event ARGV[1] on channel KEYS[1] (the list) / KEYS[2] (its last ID)
+# and keeps the latest ARGV[2] events for ARGV[3] seconds.
+# Entries are "<id> <event JSON>"
+APPEND_SCRIPT = """
+local id = redis.call('INCR', KEYS[2])
+redis.call('RPUSH', KEYS[1], id .. ' ' .. ARGV[1])
+redis.call('LTRIM', KEYS[1], -tonumber(ARGV[2]), -1)
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+redis.call('EXPIRE', KEYS[2], ARGV[3])
+return id
+"""
+
+
+def _missed(
+    entries: list[tuple[int, dict[str, Any]]], last_id: int
+) -> list[dict[str, Any]] | None:
+    if last_id == (entries[-1][0] if entries else 0):
+        return []
+    if not entries or not entries[0][0] - 1 <= last_id < entries[-1][0]:
+        return None  # fell out of the buffer, or from another buffer's lifetime
+    return [event for event_id, event in entries if event_id > last_id]
+
+
+class ReplayBuffer:
+    """
+    In-memory replay buffers, for a single process
+    """
+
+    def __init__(self, size: int, max_channels: int = LOCAL_MAX_CHANNELS) -> None:
+        self.size = size
+        self.max_channels = max_channels
+        self._channels: OrderedDict[str, tuple[int, deque]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def append(self, channel: str, event: dict[str, Any]) -> int:
+        """
+        Numbers and keeps an event
+        :param channel: Broker channel of the meeting
+        :param event: Event (see `events.build_event`), without its ID
+        :return: The event's ID, 0 if it couldn't be numbered
+        """
+        with self._lock:
+            last_id, entries = self._channels.pop(channel, (0, None))
+            entries = entries if entries is not None else deque(maxlen=self.size)
+            entries.append((last_id + 1, {**event, "id": last_id + 1}))
+            self._channels[channel] = (last_id + 1, entries)
+            if len(self._channels) > self.max_channels:
+                self._channels.popitem(last=False)
+        return last_id + 1
+
+    def last_id(self, channel: str) -> int:
+        """
+        Gets the ID of the latest event of a channel
+        :param channel: Broker channel of the meeting
+        :return: The ID, 0 if nothing was published
+        """
+        with self._lock:
+            return self._channels.get(channel, (0, ()))[0]
+
+    def since(self, channel: str, last_id: int) -> list[dict[str, Any]] | None:
+        """
+        Gets the events published after an ID
+        :param channel: Broker channel of the meeting
+        :param last_id: Last ID the client saw
+        :return: Events oldest first, None if some aren't kept anymore
+        """
+        with self._lock:
+            entries = list(self._channels.get(channel, (0, ()))[1])
+        return _missed(entries, last_id)
+
+
+class RedisReplayBuffer(ReplayBuffer):
+    """
+    Replay buffers in Redis, numbering events across every worker.
+    When Redis fails events go out unnumbered and reads return None (a snapshot).
+    """
+
+    def __init__(self, size: int, timeout: int) -> None:
+        super().__init__(size)
+        self.timeout = timeout
+        self._script = None
+
+    def append(self, channel: str, event: dict[str, Any]) -> int:
+        try:
+            if self._script is None:
+                self._script = get_redis_connection("default").register_script(
+                    APPEND_SCRIPT
+                )
+            return int(
+                self._script(
+                    keys=[KEY_PREFIX + channel, f"{KEY_PREFIX}{channel}:id"],
+                    args=[json.dumps(event), self.size, self.timeout],
+                )
+            )
+        except RedisError as e:
+            logger.log(
+                level=logging.ERROR,
+                msg="Replay Append Failed",
+                extra={"channel": channel, "reason": e.args},
+            )
+            return 0  # published unnumbered, resuming clients get a snapshot
+
+    def last_id(self, channel: str) -> int:
+        try:
+            value = get_redis_connection("default").get(f"{KEY_PREFIX}{channel}:id")
+        except RedisError:
+            return 0
+        return int(value or 0)
+
+    def since(self, channel: str, last_id: int) -> list[dict[str, Any]] | None:
+        try:
+            raw = cast(
+                list[bytes],
+                get_redis_connection("default").lrange(KEY_PREFIX + channel, 0, -1),
+            )
+        except RedisError:
+            return None
+        entries = []
+        for entry in raw:
+            event_id, event = entry.decode().split(" ", 1)
+            entries.append((int(event_id), {**json.loads(event), "id": int(event_id)}))
+        return _missed(entries, last_id)
+
+
+_buffer: ReplayBuffer | None = None
+_buffer_lock = threading.Lock()
+
+
+def get_replay_buffer() -> ReplayBuffer:
+    """
+    Gets the process wide replay buffer, choosing it on first use.
+    `settings.REALTIME_SSE["BUFFER"]` may be "redis", "memory" or "auto".
+    :return: The buffer
+    """
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                config = settings.REALTIME_SSE
+                backend = config["BUFFER"]
+                if backend == "redis" or (backend == "auto" and redis_available()):
+                    _buffer = RedisReplayBuffer(
+                        config["REPLAY_SIZE"], config["REPLAY_TIMEOUT_SECONDS"]
+                    )
+                else:
+                    _buffer = ReplayBuffer(config["REPLAY_SIZE"])
+    return _buffer
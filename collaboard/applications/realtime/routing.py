@@ -0,0 +1,47 @@
+"""
+This module stores the ASGI routing for non-HTTP connections
+"""
+
+import re
+import uuid
+from typing import Any
+
+from asgiref.sync import sync_to_async
+
+from ..authentication import purge
+from ..meeting import scheduler
+from . import consumers
+from .brokers import get_broker
+
+MEETING_SOCKET_PATH = re.compile(r"^/ws/meeting/(?P<meeting_id>[0-9a-fA-F-]{36})/$")
+
+
+async def websocket_application(
+    scope: dict[str, Any], receive: consumers.Receive, send: consumers.Send
+) -> None:
+    match = MEETING_SOCKET_PATH.match(scope["path"])
+    try:
+        meeting_id = uuid.UUID(match["meeting_id"]) if match else None
+    except ValueError:
+        meeting_id = None
+    if meeting_id is None:
+        await receive()  # websocket.connect
+        await send({"type": "websocket.close", "code": consumers.CLOSE_NOT_FOUND})
+        return
+    await consumers.meeting_socket(scope, receive, send, meeting_id)
+
+
+async def lifespan_application(
+    scope: dict[str, Any], receive: consumers.Receive, send: consumers.Send
+) -> None:
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            # every worker runs a scheduler, due meetings are claimed atomically
+            await sync_to_async(scheduler.get_scheduler)()
+            await sync_to_async(purge.get_purger)()  # resumes interrupted purges
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await get_broker().close()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
@@ -0,0 +1,139 @@
+"""
+This module stores the Server-Sent Events stream of a meeting, the fallback for
+participants whose network blocks WebSockets.
+
+A stream subscribes to the same broker channel as the meeting sockets and sends
+the state events (`events.REPLAYED_EVENTS`) with their IDs. A reconnecting
+client sends the last ID it saw (`Last-Event-ID`) and gets the events it missed
+from the replay buffer, or a fresh state snapshot if they aren't kept anymore.
+Idle streams cost a suspended generator and a broker subscription, heartbeat
+comments keep proxies from closing them.
+"""
+
+import asyncio
+import json
+import uuid
+from typing import Any, AsyncIterator
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .. import metrics
+from ..meeting import services
+from ..meeting.models import Meeting
+from . import events
+from .brokers import Frame, get_broker
+from .replay import get_replay_buffer
+
+HEARTBEAT = ": heartbeat\n\n"
+
+open_streams = metrics.gauge("sse_streams_open", "Event streams open on this worker")
+
+
+def parse_last_event_id(value: str | None) -> int | None:
+    """
+    Reads the `Last-Event-ID` header of a reconnecting client
+    :param value: Header value
+    :return: The ID, None if missing or invalid
+    """
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+
+def format_frame(frame: Frame, event_id: int) -> str:
+    """
+    Encodes a frame as one SSE message, carrying the ID of its latest event
+    :param frame: Events of one tick, as sent to sockets
+    :param event_id: ID the client resumes from, 0 for none
+    :return: The message
+    """
+    data = json.dumps(frame, separators=(",", ":"))
+    return f"id: {event_id}\ndata: {data}\n\n" if event_id else f"data: {data}\n\n"
+
+
+def backlog(
+    meeting_id: uuid.UUID, last_event_id: int | None
+) -> tuple[Frame, int] | None:
+    """
+    Gets what a new stream starts with: the events missed since `last_event_id`,
+    or a state snapshot
+    :param meeting_id: ID of the meeting
+    :param last_event_id: Last ID the client saw, None for a first connection
+    :return: (events, ID of the latest one), None if the meeting is gone
+    """
+    channel = events.meeting_channel(meeting_id)
+    replay = get_replay_buffer()
+    if last_event_id is not None:
+        missed = replay.since(channel, last_event_id)
+        if missed is not None:
+            return missed, missed[-1]["id"] if missed else last_event_id
+    # read first, events published while the snapshot is built are streamed after
+    last_id = replay.last_id(channel)
+    meeting = services.get_meeting(meeting_id, revalidate=True)
+    if meeting is None:
+        return None
+    state = events.build_event(
+        meeting_id, events.STATE, services.get_meeting_state(meeting)
+    )
+    return [{**state, "id": last_id}], last_id
+
+
+def _ended(frame: Frame) -> bool:
+    return any(
+        event["event"] == events.MEETING_ENDED
+        or (
+            event["event"] == events.STATE
+            and event["data"]["status"] == Meeting.Status.ENDED
+        )
+        for event in frame
+    )
+
+
+async def stream(
+    meeting_id: uuid.UUID, last_event_id: int | None
+) -> AsyncIterator[str]:
+    """
+    Streams a meeting's state events until it ends or the client disconnects
+    :param meeting_id: ID of the meeting
+    :param last_event_id: Last ID the client saw, None for a first connection
+    :return: SSE messages
+    """
+    config: dict[str, Any] = settings.REALTIME_SSE
+    open_streams.inc()
+    try:
+        async with get_broker().subscribe(
+            events.meeting_channel(meeting_id)
+        ) as subscription:
+            start = await sync_to_async(backlog)(meeting_id, last_event_id)
+            if start is None:
+                return
+            frame, sent_id = start
+            yield f"retry: {config['RETRY_MILLISECONDS']}\n\n"
+            if frame:
+                yield format_frame(frame, sent_id)
+                if _ended(frame):
+                    return
+            while True:
+                try:
+                    async with asyncio.timeout(config["HEARTBEAT_SECONDS"]):
+                        frame = await anext(subscription)
+                except TimeoutError:
+                    yield HEARTBEAT
+                    continue
+                # skips response counts and events already in the backlog
+                frame = [
+                    event
+                    for event in frame
+                    if event["event"] in events.REPLAYED_EVENTS
+                    and event.get("id", sent_id + 1) > sent_id
+                ]
+                if not frame:
+                    continue
+                sent_id = max(event.get("id", sent_id) for event in frame)
+                yield format_frame(frame, sent_id)
+                if _ended(frame):
+                    return
+    finally:
+        open_streams.dec()
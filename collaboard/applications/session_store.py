@@ -0,0 +1,316 @@
+"""
+This module stores the session engine (`SESSION_ENGINE`) keeping sessions in the
+Redis cache, with optional write-behind to the `django_session` table.
+
+ - Reads are served by the cache. The database is only read on a cache miss when
+   write-behind is on, e.g. after Redis lost its data
+ - Saves that wouldn't change the stored session are skipped
+ - With write-behind, saved and deleted session keys are marked dirty and a
+   background writer copies their current cache state to the database in
+   batches; a key missing from the cache deletes its row
+ - `clear_expired` (`manage.py clearsessions`) deletes expired rows in batches
+"""
+
+import logging
+import threading
+from typing import Any, cast
+
+from django.conf import settings
+from django.contrib.sessions.backends.base import CreateError, SessionBase
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from django_redis import get_redis_connection
+
+from . import metrics
+from .realtime.brokers import redis_available
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "sessions:"
+DIRTY_KEY = "sessions:dirty"  # session keys waiting to be written to the database
+
+skipped = metrics.counter(
+    "session_saves_skipped_total", "Session saves skipped as nothing changed"
+)
+written = metrics.counter(
+    "session_rows_written_total", "Session rows written or deleted by write-behind"
+)
+write_failures = metrics.counter(
+    "session_write_failures_total", "Write-behind batches that failed"
+)
+cleared = metrics.counter("sessions_cleared_total", "Expired session rows deleted")
+
+
+class DirtySet:
+    """
+    In-memory set of dirty session keys, for a single process and tests
+    """
+
+    def __init__(self) -> None:
+        self._keys: set[str] = set()
+        self._lock = threading.Lock()
+
+    def add(self, session_key: str) -> None:
+        with self._lock:
+            self._keys.add(session_key)
+
+    def claim(self, size: int) -> list[str]:
+        """
+        Takes up to `size` keys. Keys taken by a writer that dies are only
+        written again on their next save.
+        """
+        with self._lock:
+            return [self._keys.pop() for _ in range(min(size, len(self._keys)))]
+
+    def depth(self) -> int:
+        return len(self._keys)
+
+
+class RedisDirtySet(DirtySet):
+    """
+    Redis set shared by every worker
+    """
+
+    def add(self, session_key: str) -> None:
+        get_redis_connection("default").sadd(DIRTY_KEY, session_key)
+
+    def claim(self, size: int) -> list[str]:
+        keys = cast(
+            list[bytes] | None, get_redis_connection("default").spop(DIRTY_KEY, size)
+        )
+        return [key.decode() for key in keys or []]
+
+    def depth(self) -> int:
+        return get_redis_connection("default").scard(DIRTY_KEY)
+
+
+def write_sessions(session_keys: list[str]) -> int:
+    """
+    Copies the cache state of sessions to the database in one transaction
+    :param session_keys: Dirty session keys
+    :return: Number of rows written or deleted
+    """
+    cache = caches[settings.SESSION_CACHE_ALIAS]
+    cached: dict[str, Any] = cache.get_many([KEY_PREFIX + key for key in session_keys])
+    rows = []
+    gone = []
+    for key in session_keys:
+        data = cached.get(KEY_PREFIX + key)
+        if data is None:
+            gone.append(key)
+            continue
+        store = SessionStore(key)
+        rows.append(
+            Session(
+                session_key=key,
+                session_data=store.encode(data),
+                expire_date=store.get_expiry_date(expiry=data.get("_session_expiry")),
+            )
+        )
+    with transaction.atomic():
+        Session.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=["session_key"],
+            update_fields=["session_data", "expire_date"],
+        )
+        Session.objects.filter(session_key__in=gone).delete()
+    return len(session_keys)
+
+
+class SessionWriter:
+    """
+    Background thread writing dirty sessions every `interval` seconds
+    """
+
+    def __init__(self, dirty: DirtySet, batch_size: int, interval: float) -> None:
+        self.dirty = dirty
+        self.batch_size = batch_size
+        self.interval = interval
+        self._thread: threading.Thread | None = None
+        self._start_lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    def start(self) -> None:
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self.run, name="session-writer", daemon=True
+                )
+                self._thread.start()
+
+    def run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            while self.flush() >= self.batch_size:
+                pass  # keep draining while full batches are waiting
+
+    def flush(self) -> int:
+        """
+        Writes one batch of dirty sessions
+        :return: Number of session keys claimed
+        """
+        close_old_connections()
+        keys: list[str] = []
+        try:
+            keys = self.dirty.claim(self.batch_size)
+            if keys:
+                written.inc(write_sessions(keys))
+            return len(keys)
+        except Exception as e:
+            write_failures.inc()
+            for key in keys:
+                self.dirty.add(key)  # retried on the next flush
+            logger.log(
+                level=logging.ERROR,
+                msg="Session Write Failed",
+                extra={"reason": e.args},
+            )
+            return 0
+        finally:
+            close_old_connections()
+
+
+_writer: SessionWriter | None = None
+_writer_lock = threading.Lock()
+
+
+def get_writer() -> SessionWriter:
+    """
+    Gets the process wide write-behind writer, choosing the dirty set on first use.
+    `settings.SESSION_STORE["BUFFER"]` may be "redis", "memory" or "auto".
+    :return: The writer, its thread is started on first use
+    """
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                config: dict[str, Any] = settings.SESSION_STORE
+                use_redis = config["BUFFER"] == "redis" or (
+                    config["BUFFER"] == "auto" and redis_available()
+                )
+                _writer = SessionWriter(
+                    RedisDirtySet() if use_redis else DirtySet(),
+                    batch_size=config["BATCH_SIZE"],
+                    interval=config["FLUSH_INTERVAL_SECONDS"],
+                )
+    _writer.start()
+    return _writer
+
+
+class SessionStore(SessionBase):
+    """
+    Cache-first session store, see the module docstring.
+    The async API (`aload`, `asave`, ...) comes from `SessionBase`.
+    """
+
+    def __init__(self, session_key: str | None = None) -> None:
+        self._cache = caches[settings.SESSION_CACHE_ALIAS]
+        self._write_behind: bool = settings.SESSION_STORE["WRITE_BEHIND"]
+        self._stored: bytes | None = None  # serialized data as last loaded/saved
+        super().__init__(session_key)
+
+    @property
+    def cache_key(self) -> str:
+        return KEY_PREFIX + self._get_or_create_session_key()
+
+    def _serialize(self, data: dict[str, Any]) -> bytes:
+        return self.serializer().dumps(data)
+
+    def load(self) -> dict[str, Any]:
+        data: dict[str, Any] | None = None
+        if self.session_key is not None:
+            data = self._cache.get(self.cache_key)
+            if data is None and self._write_behind:
+                data = self._load_from_db()
+        if data is None:
+            self._session_key = None
+            return {}
+        self._stored = self._serialize(data)
+        return data
+
+    def _load_from_db(self) -> dict[str, Any] | None:
+        session = Session.objects.filter(
+            session_key=self.session_key, expire_date__gt=timezone.now()
+        ).first()
+        if session is None:
+            return None
+        data: dict[str, Any] = self.decode(session.session_data)
+        self._cache.set(
+            self.cache_key, data, self.get_expiry_age(expiry=session.expire_date)
+        )
+        return data
+
+    def exists(self, session_key: str) -> bool:
+        if self._cache.has_key(KEY_PREFIX + session_key):
+            return True
+        return (
+            self._write_behind
+            and Session.objects.filter(session_key=session_key).exists()
+        )
+
+    def create(self) -> None:
+        while True:
+            self._session_key = self._get_new_session_key()
+            try:
+                self.save(must_create=True)
+            except CreateError:
+                continue  # key collision
+            self.modified = True
+            return
+
+    def save(self, must_create: bool = False) -> None:
+        if self.session_key is None:
+            return self.create()
+        data = self._get_session(no_load=must_create)
+        serialized = self._serialize(data)
+        if (
+            not must_create
+            and serialized == self._stored
+            and not settings.SESSION_SAVE_EVERY_REQUEST  # which refreshes expiry
+        ):
+            skipped.inc()
+            return
+        if must_create:
+            if not self._cache.add(self.cache_key, data, self.get_expiry_age()):
+                raise CreateError
+        else:
+            self._cache.set(self.cache_key, data, self.get_expiry_age())
+        self._stored = serialized
+        if self._write_behind:
+            get_writer().dirty.add(self.session_key)
+
+    def delete(self, session_key: str | None = None) -> None:
+        if session_key is None:
+            if self.session_key is None:
+                return
+            session_key = self.session_key
+        self._cache.delete(KEY_PREFIX + session_key)
+        if self._write_behind:
+            get_writer().dirty.add(session_key)  # the writer deletes the row
+
+    def flush(self) -> None:
+        self.clear()
+        self.delete(self.session_key)
+        self._session_key = None
+
+    @classmethod
+    def clear_expired(cls) -> None:
+        """
+        Deletes expired rows in batches of `SESSION_STORE["CLEANUP_BATCH_SIZE"]`,
+        so no single statement holds locks on a large part of the table.
+        Expired cache entries are evicted by their TTL.
+        """
+        batch_size: int = settings.SESSION_STORE["CLEANUP_BATCH_SIZE"]
+        now = timezone.now()
+        while True:
+            keys = list(
+                Session.objects.filter(expire_date__lt=now).values_list(
+                    "session_key", flat=True
+                )[:batch_size]
+            )
+            if not keys:
+                return
+            Session.objects.filter(session_key__in=keys).delete()
+            cleared.inc(len(keys))
@@ -0,0 +1,28 @@
+"""
+This module stores the settings shared by the tests and the benchmark commands
+to run without a Redis server.
+"""
+
+from typing import Any
+
+from django.conf import settings
+
+
+def fake_redis_settings() -> dict[str, Any]:
+    """
+    Settings replacing Redis with the in-process stand-ins every subsystem has
+    :return: Overrides for `override_settings`
+    """
+    return {
+        "CACHES": {
+            "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+        },
+        "REALTIME_BROKER": "memory",
+        "RESPONSE_INGEST": {**settings.RESPONSE_INGEST, "BUFFER": "memory"},
+        "COUNTERS": {**settings.COUNTERS, "BUFFER": "memory"},
+        "SESSION_STORE": {**settings.SESSION_STORE, "BUFFER": "memory"},
+        "MEETING_SCHEDULER": {**settings.MEETING_SCHEDULER, "BUFFER": "memory"},
+        "REALTIME_SSE": {**settings.REALTIME_SSE, "BUFFER": "memory"},
+        "EMAIL_QUEUE": {**settings.EMAIL_QUEUE, "BUFFER": "memory"},
+        "RATE_LIMITS": {**settings.RATE_LIMITS, "BACKEND": "memory"},
+    }
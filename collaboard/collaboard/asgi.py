@@ -2,6 +2,7 @@
 ASGI config for collaboard project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+HTTP requests are served by Django, WebSockets by the realtime app.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
@@ -13,4 +14,19 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "collaboard.settings")
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# imported after Django is set up, the realtime app depends on the ORM
+from applications.realtime.routing import (  # noqa: E402
+    lifespan_application,
+    websocket_application,
+)
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "websocket":
+        await websocket_application(scope, receive, send)
+    elif scope["type"] == "lifespan":
+        await lifespan_application(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
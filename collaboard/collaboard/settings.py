@@ -10,8 +10,10 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import importlib.util
 import os
 from pathlib import Path
+from typing import Any
 
 from django.core.exceptions import ImproperlyConfigured
 from django.http import HttpRequest
@@ -65,7 +67,11 @@ else:
 
 # Application definition
 
-PROJECT_APPS = ["applications.authentication", "applications.meeting"]
+PROJECT_APPS = [
+    "applications.authentication",
+    "applications.meeting",
+    "applications.realtime",
+]
 EXTRA_DEPENDENCY_APPS = ["django_browser_reload"]
 
 INSTALLED_APPS = [
@@ -80,10 +86,8 @@ INSTALLED_APPS = [
 if IS_DEV_ENV:
     INSTALLED_APPS.extend(EXTRA_DEPENDENCY_APPS)
 
-EXTRA_DEPENDENCY_MIDDLEWARE = [
-    "django_ratelimit.middleware.RatelimitMiddleware",
-]
 MIDDLEWARE = [
+    "applications.instrumentation.InstrumentationMiddleware",  # must stay first
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django_browser_reload.middleware.BrowserReloadMiddleware",  # Custom middleware for django-browser-reload
@@ -92,13 +96,43 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
-    *EXTRA_DEPENDENCY_MIDDLEWARE,
 ]
 
+# Request instrumentation (see `applications.instrumentation`)
+INSTRUMENTATION = {
+    "SAMPLE_RATE": 1.0,  # share of requests with queries, cache and templates timed
+    "METRICS_ALLOWED_IPS": ["127.0.0.1"],  # clients of `/metrics/`, None for anyone
+}
+
+# Rate limits (see `applications.rate_limits`), token buckets per client:
+# `LIMIT` requests at once, refilled over `PERIOD_SECONDS`. "KEY" is "ip", or
+# "session" or "participant" (the signed participant token, see below) where many
+# clients may share an IP (e.g. a classroom behind NAT)
+RATE_LIMITS = {
+    "ENABLED": True,
+    "BACKEND": "auto",  # "redis", "memory" or "auto" (Redis when reachable)
+    "ROUTES": {
+        "signup": {"LIMIT": 5, "PERIOD_SECONDS": 60 * 10, "KEY": "ip"},
+        "login": {"LIMIT": 10, "PERIOD_SECONDS": 60, "KEY": "ip"},
+        "verify_email": {"LIMIT": 20, "PERIOD_SECONDS": 60, "KEY": "ip"},
+        "join_meeting": {"LIMIT": 300, "PERIOD_SECONDS": 60, "KEY": "ip"},
+        "submit_response": {"LIMIT": 60, "PERIOD_SECONDS": 60, "KEY": "participant"},
+    },
+}
+RATE_LIMIT_CLIENT_IP = None  # client IP function, None for REMOTE_ADDR
+
 # Session definition
 SESSION_ENGINE = (
-    "django.contrib.sessions.backends.db"  # Store the session in the Database
+    "applications.session_store"  # Store the session in Redis (see `SESSION_STORE`)
 )
+SESSION_CACHE_ALIAS: str = "default"
+SESSION_STORE = {
+    "WRITE_BEHIND": True,  # copy sessions to the database for durability
+    "BUFFER": "auto",  # dirty keys: "redis", "memory" or "auto" (Redis when reachable)
+    "BATCH_SIZE": 500,  # sessions written per batch
+    "FLUSH_INTERVAL_SECONDS": 5.0,  # how far the database may lag behind Redis
+    "CLEANUP_BATCH_SIZE": 1000,  # expired rows deleted per statement
+}
 SESSION_COOKIE_AGE: int = (
     60 * 60 * 24 * 7 * 2
 )  # Cookie length stored in seconds (2 Weeks Here)
@@ -123,8 +157,7 @@ if not IS_DEV_ENV:
         """
         return request.META.get("HTTP_X_FORWARDED_FOR", "").split(",")[0].strip()
 
-    RATELIMIT_IP_META_KEY = get_client_ip
-    RATELIMIT_USE_CACHE = "default"
+    RATE_LIMIT_CLIENT_IP = get_client_ip
 
 # Redirect definition
 # TODO: Uncomment these later and delete this comment
@@ -133,7 +166,10 @@ LOGOUT_REDIRECT_URL: str = "landing"
 
 # Email definition (working via django-sendgrid package)
 SENDGRID_API_KEY = get_env_var("SENDGRID_API_KEY")
-EMAIL_BACKEND = "sendgrid_backend.SendgridBackend"
+# e.g. "django.core.mail.backends.filebased.EmailBackend" to write emails to
+# `EMAIL_FILE_PATH` instead of sending them (Django's test runner uses locmem)
+EMAIL_BACKEND = os.getenv("EMAIL_BACKEND", "sendgrid_backend.SendgridBackend")
+EMAIL_FILE_PATH = BASE_DIR / "logs" / "emails"
 DEFAULT_FROM_EMAIL = get_env_var("EMAIL_FROM_USER")
 EMAIL_FROM_USER = get_env_var("EMAIL_FROM_USER")
 
@@ -146,11 +182,30 @@ SENDGRID_TRACK_EMAIL_OPENS = True
 SENDGRID_TRACK_CLICKS_HTML = True
 SENDGRID_TRACK_CLICKS_PLAIN = True
 
+# Bounded pool hashing passwords for signup and login (see
+# `applications.authentication.hashing`)
+PASSWORD_HASHING = {
+    "WORKERS": os.cpu_count() or 1,  # threads, PBKDF2 releases the GIL
+    "MAX_PENDING": 64,  # jobs running or queued before requests get a 503
+}
+
+# Outbound email queue (see `applications.mail`)
+EMAIL_QUEUE = {
+    "BUFFER": "auto",  # "redis", "memory" or "auto" (Redis when reachable)
+    "BACKEND": None,  # backend used by the sender, None for `EMAIL_BACKEND`
+    "BATCH_SIZE": 50,  # messages sent over one backend connection
+    "INTERVAL_SECONDS": 1.0,  # time trigger, queueing a message also wakes it
+    "MAX_ATTEMPTS": 5,  # a message is dropped after this many failures
+    "RETRY_BASE_DELAY_SECONDS": 5.0,  # doubled after each failed attempt
+    "RETRY_MAX_DELAY_SECONDS": 300.0,
+}
+
 ROOT_URLCONF = "collaboard.urls"
 
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        # `DjangoTemplates` timing renders (see `applications.instrumentation`)
+        "BACKEND": "applications.instrumentation.InstrumentedTemplates",
         "DIRS": [
             BASE_DIR / "templates",  # root templates folder
         ],
@@ -167,25 +222,80 @@ TEMPLATES = [
 
 WSGI_APPLICATION = "collaboard.wsgi.application"
 
-# #TODO: `django-channels` config, make sure to uncomment when channels is ready and installed
-# ASGI_APPLICATION = "collaboard.asgi.application"
-# CHANNEL_LAYERS = {
-#     "default": {
-#         "BACKEND": "channels_redis.core.RedisChannelLayer",
-#         "CONFIG": {
-#             "hosts": [("127.0.0.1", 6379)],  # Database 0
-#         },
-#     },
-# }
+ASGI_APPLICATION = "collaboard.asgi.application"
+
+# Realtime definition (WebSockets served by `applications.realtime`)
+REALTIME_BROKER: str = "auto"  # "redis", "memory", "auto" or a broker class path
+REALTIME_TICK_SECONDS: float = (
+    0.25  # events published within a tick reach sockets as one coalesced frame
+)
+
+# Server-Sent Events, the participants' fallback when WebSockets are blocked
+# (see `applications.realtime.sse`)
+REALTIME_SSE = {
+    "HEARTBEAT_SECONDS": 15.0,  # comment sent on idle streams, below proxy timeouts
+    "RETRY_MILLISECONDS": 3000,  # client reconnection delay
+    "BUFFER": "auto",  # replay: "redis", "memory" or "auto" (Redis when reachable)
+    "REPLAY_SIZE": 20,  # state events kept per meeting for resuming clients
+    "REPLAY_TIMEOUT_SECONDS": 60 * 60 * 2,  # longer than any meeting
+}
+
+# Response ingestion definition (see `applications.meeting.ingest`)
+RESPONSE_INGEST = {
+    "BUFFER": "auto",  # "redis", "memory" or "auto" (Redis when reachable)
+    "BATCH_SIZE": 500,  # responses written per INSERT, also the size trigger
+    "FLUSH_INTERVAL_SECONDS": 1.0,  # time trigger
+    "MAX_FLUSH_ATTEMPTS": 5,  # failed writes of a batch before it's dead lettered
+}
+
+# Counter definition (see `applications.counters`)
+COUNTERS = {
+    "BUFFER": "auto",  # "redis", "memory" or "auto" (Redis when reachable)
+    "FOLD_INTERVAL_SECONDS": 5.0,  # how often buffered deltas reach the database
+}
+
+# Meeting lifecycle definition (see `applications.meeting.scheduler`)
+MEETING_SCHEDULER = {
+    "BUFFER": "auto",  # deadlines: "redis", "memory" or "auto" (Redis when reachable)
+    "BATCH_SIZE": 100,  # meetings ended per claim
+    "POLL_INTERVAL_SECONDS": 1.0,  # longest sleep, bounds lag for other processes
+    "SUMMARY_DELAY_SECONDS": 15.0,  # lets buffered responses and counters land first
+}
+
+# Background purge of deleted accounts (see `applications.authentication.purge`)
+ACCOUNT_PURGE = {
+    "CHUNK_SIZE": 1000,  # rows deleted per transaction
+    "INTERVAL_SECONDS": 60.0,  # how often purges left by another process resume
+}
+
+# Read-through cache of meetings and their questions (see `applications.caching`)
+MEETING_CACHE = {
+    "LOCAL_MAX_ENTRIES": 1024,  # meetings kept in each process' LRU
+    "LOCAL_TTL_SECONDS": 1.0,  # how long a local copy is served without revalidating
+    "TIMEOUT_SECONDS": 60 * 60 * 2,  # shared cache entries, longer than any meeting
+}
+
+# Signed participant tokens (see `applications.meeting.tokens`). To rotate keys,
+# prepend a new one to PARTICIPANT_TOKEN_KEYS (comma separated, newest first) and
+# drop the old one once MAX_AGE_SECONDS have passed
+PARTICIPANT_TOKENS = {
+    "KEYS": [key for key in os.getenv("PARTICIPANT_TOKEN_KEYS", "").split(",") if key]
+    or [SECRET_KEY],
+    "MAX_AGE_SECONDS": 60 * 60 * 12,  # longer than any meeting
+    "COOKIE_NAME": "participant_token",
+}
 
 # Logging definition
 LOGS_DIR = BASE_DIR / "logs"
 LOGS_DIR.mkdir(exist_ok=True)  # makes the logs directory if it doesn't exist yet
 
+LOG_QUEUE_SIZE: int = 10000  # records buffered per destination before dropping
+
 LOG_FILES = [
     "django.log",
     "authentication.log",
     "meeting.log",
+    "realtime.log",
     "root.log",
 ]  # Add more log files here as needed
 
@@ -211,10 +321,13 @@ LOGGING = {
             "style": "{",
         },
     },
+    "filters": {
+        "orm_guard": {"()": "applications.logs.ModelExtraFilter"},
+    },
     "handlers": {
         "django": {
             "level": "INFO",
-            "class": "logging.handlers.RotatingFileHandler",
+            "class": "applications.logs.BatchRotatingFileHandler",
             "filename": BASE_DIR / "logs" / "django.log",
             "formatter": "verbose",
             "maxBytes": 10485760,  # 10MB
@@ -222,7 +335,7 @@ LOGGING = {
         },
         "authentication": {
             "level": "INFO",
-            "class": "logging.handlers.RotatingFileHandler",
+            "class": "applications.logs.BatchRotatingFileHandler",
             "filename": BASE_DIR / "logs" / "authentication.log",
             "formatter": "json",
             "maxBytes": 10485760,  # 10MB
@@ -230,7 +343,7 @@ LOGGING = {
         },
         "root": {
             "level": "INFO",
-            "class": "logging.handlers.RotatingFileHandler",
+            "class": "applications.logs.BatchRotatingFileHandler",
             "filename": BASE_DIR / "logs" / "root.log",
             "formatter": "json",
             "maxBytes": 10485760,  # 10MB
@@ -238,36 +351,90 @@ LOGGING = {
         },
         "meeting": {
             "level": "INFO",
-            "class": "logging.handlers.RotatingFileHandler",
+            "class": "applications.logs.BatchRotatingFileHandler",
             "filename": BASE_DIR / "logs" / "meeting.log",
             "formatter": "json",
             "maxBytes": 10485760,  # 10MB
             "backupCount": 3,
         },
+        "realtime": {
+            "level": "INFO",
+            "class": "applications.logs.BatchRotatingFileHandler",
+            "filename": BASE_DIR / "logs" / "realtime.log",
+            "formatter": "json",
+            "maxBytes": 10485760,  # 10MB
+            "backupCount": 3,
+        },
         "console": {
             "level": "INFO",
             "class": "logging.StreamHandler",
             "formatter": "simple",
         },
+        # Loggers only enqueue, a listener thread per queue formats and writes
+        "django_queue": {
+            "class": "applications.logs.BoundedQueueHandler",
+            "queue": {"()": "queue.Queue", "maxsize": LOG_QUEUE_SIZE},
+            "listener": "applications.logs.BatchQueueListener",
+            "handlers": ["django", "console"],
+            "respect_handler_level": True,
+            "filters": ["orm_guard"],
+        },
+        "authentication_queue": {
+            "class": "applications.logs.BoundedQueueHandler",
+            "queue": {"()": "queue.Queue", "maxsize": LOG_QUEUE_SIZE},
+            "listener": "applications.logs.BatchQueueListener",
+            "handlers": ["authentication", "console"],
+            "respect_handler_level": True,
+            "filters": ["orm_guard"],
+        },
+        "meeting_queue": {
+            "class": "applications.logs.BoundedQueueHandler",
+            "queue": {"()": "queue.Queue", "maxsize": LOG_QUEUE_SIZE},
+            "listener": "applications.logs.BatchQueueListener",
+            "handlers": ["meeting", "console"],
+            "respect_handler_level": True,
+            "filters": ["orm_guard"],
+        },
+        "realtime_queue": {
+            "class": "applications.logs.BoundedQueueHandler",
+            "queue": {"()": "queue.Queue", "maxsize": LOG_QUEUE_SIZE},
+            "listener": "applications.logs.BatchQueueListener",
+            "handlers": ["realtime", "console"],
+            "respect_handler_level": True,
+            "filters": ["orm_guard"],
+        },
+        "root_queue": {
+            "class": "applications.logs.BoundedQueueHandler",
+            "queue": {"()": "queue.Queue", "maxsize": LOG_QUEUE_SIZE},
+            "listener": "applications.logs.BatchQueueListener",
+            "handlers": ["root", "console"],
+            "respect_handler_level": True,
+            "filters": ["orm_guard"],
+        },
     },
     "loggers": {
         "django": {
-            "handlers": ["django", "console"],
+            "handlers": ["django_queue"],
             "level": "INFO",
             "propagate": True,
         },
         "applications.authentication": {
-            "handlers": ["authentication", "console"],
+            "handlers": ["authentication_queue"],
             "level": "INFO",
             "propagate": False,
         },
         "applications.meeting": {
-            "handlers": ["meeting", "console"],
+            "handlers": ["meeting_queue"],
+            "level": "INFO",
+            "propagate": False,
+        },
+        "applications.realtime": {
+            "handlers": ["realtime_queue"],
             "level": "INFO",
             "propagate": False,
         },
         "root": {
-            "handlers": ["root", "console"],
+            "handlers": ["root_queue"],
             "level": "INFO",
             "propagate": False,
         },
@@ -277,20 +444,73 @@ LOGGING = {
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.postgresql",
-        "NAME": get_env_var("DB_NAME"),
-        "USER": get_env_var("DB_USER"),
-        "PASSWORD": get_env_var("DB_PASSWORD"),
-        "HOST": get_env_var("DB_HOST"),
-        "PORT": get_env_var("DB_PORT"),
+DATABASES: dict[str, dict[str, Any]]
+if os.getenv("DB_ENGINE") == "sqlite":  # e.g. local benchmarks (`benchmark_flows`)
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": BASE_DIR / "db.sqlite3",
+        }
+    }
+else:
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": get_env_var("DB_NAME"),
+            "USER": get_env_var("DB_USER"),
+            "PASSWORD": get_env_var("DB_PASSWORD"),
+            "HOST": get_env_var("DB_HOST"),
+            "PORT": get_env_var("DB_PORT"),
+        }
     }
+
+# Connection reuse (see `benchmark_db_connections`), the mode may be:
+#  - "pool": a psycopg 3 pool per process, needs `psycopg[binary,pool]`
+#  - "persistent": one connection per thread kept `CONN_MAX_AGE_SECONDS`,
+#    with a health check before reuse. Under ASGI prefer "pool",
+#    async views may run on threads holding a connection each
+#  - "off": a connection per request
+#  - "auto": "pool" when psycopg 3 and `psycopg_pool` are installed (Django's
+#    pool doesn't support psycopg2), else "persistent"
+DB_CONNECTIONS = {
+    "MODE": os.getenv("DB_CONNECTIONS", "auto"),
+    "POOL_MIN_SIZE": 2,  # connections kept open per process
+    "POOL_MAX_SIZE": 20,  # per process, workers x this MUST stay < max_connections
+    "POOL_TIMEOUT_SECONDS": 10.0,  # wait for a free connection before erroring
+    "POOL_MAX_LIFETIME_SECONDS": 60 * 30,  # connections are recycled after this
+    "POOL_MAX_IDLE_SECONDS": 60 * 5,  # idle connections above the minimum close
+    "CONN_MAX_AGE_SECONDS": 60,  # "persistent" mode
 }
+DB_CONNECTIONS_MODE = DB_CONNECTIONS["MODE"]
+if DB_CONNECTIONS_MODE == "auto":
+    DB_CONNECTIONS_MODE = (
+        "pool"
+        if importlib.util.find_spec("psycopg")
+        and importlib.util.find_spec("psycopg_pool")
+        else "persistent"
+    )
+if DATABASES["default"]["ENGINE"] == "django.db.backends.postgresql":
+    if DB_CONNECTIONS_MODE == "pool":
+        from psycopg_pool import ConnectionPool
+
+        DATABASES["default"]["OPTIONS"] = {
+            "pool": {
+                "min_size": DB_CONNECTIONS["POOL_MIN_SIZE"],
+                "max_size": DB_CONNECTIONS["POOL_MAX_SIZE"],
+                "timeout": DB_CONNECTIONS["POOL_TIMEOUT_SECONDS"],
+                "max_lifetime": DB_CONNECTIONS["POOL_MAX_LIFETIME_SECONDS"],
+                "max_idle": DB_CONNECTIONS["POOL_MAX_IDLE_SECONDS"],
+                "check": ConnectionPool.check_connection,  # health check on checkout
+            }
+        }
+    elif DB_CONNECTIONS_MODE == "persistent":
+        DATABASES["default"]["CONN_MAX_AGE"] = DB_CONNECTIONS["CONN_MAX_AGE_SECONDS"]
+        DATABASES["default"]["CONN_HEALTH_CHECKS"] = True
 
 CACHES = {  # configured alongside `django-redis` package
     "default": {
-        "BACKEND": "django_redis.cache.RedisCache",
+        # `RedisCache` counting hits (see `applications.instrumentation`)
+        "BACKEND": "applications.instrumentation.InstrumentedRedisCache",
         "LOCATION": "redis://127.0.0.1:6379/1",  # server port/location
         "OPTIONS": {
             "CLIENT_CLASS": "django_redis.client.DefaultClient",
@@ -305,6 +525,15 @@ CACHES = {  # configured alongside `django-redis` package
 
 # Custom User Model
 AUTH_USER_MODEL = "authentication.CustomUser"
+AUTHENTICATION_BACKENDS = [
+    "applications.authentication.backends.CachedModelBackend",
+]
+# Cache of signed in users (see `applications.authentication.backends`)
+USER_CACHE = {
+    "LOCAL_MAX_ENTRIES": 1024,  # users kept in each process' LRU
+    "LOCAL_TTL_SECONDS": 1.0,  # how long a local copy is served without revalidating
+    "TIMEOUT_SECONDS": 60 * 5,  # shared cache entries
+}
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -25,6 +25,7 @@ urlpatterns = [
     path("", views.landing, name="landing"),
     path("dashboard/", views.dashboard, name="dashboard"),
     path("account/", views.account, name="account"),
+    path("metrics/", views.metrics, name="metrics"),
     path("auth/", include("applications.authentication.urls")),
     path("meeting/", include("applications.meeting.urls")),
     path("admin/", admin.site.urls),
@@ -1,16 +1,17 @@
 import logging
 
+from applications import metrics as app_metrics
+from applications.authentication import services as auth_services
+from django.conf import settings
 from django.contrib.auth import logout
 from django.contrib.auth.decorators import login_required
-from django.http import HttpRequest, HttpResponse
+from django.http import Http404, HttpRequest, HttpResponse
 from django.shortcuts import redirect, render
 from django.views.decorators.http import require_http_methods
 
 logger = logging.getLogger(__name__)
 
 
-@login_required
-@require_http_methods(["GET", "POST"])
 @require_http_methods(["GET"])
 def landing(request: HttpRequest) -> HttpResponse:
     if request.user.is_authenticated:
@@ -28,14 +29,32 @@ def dashboard(request: HttpRequest) -> HttpResponse:
 @require_http_methods(["GET", "POST"])
 def account(request: HttpRequest) -> HttpResponse:
     if request.method == "POST":
-        user = request.user
-        request.user.delete()
-        logger.log(level=logging.INFO, msg="User deleted", extra={"user": user})
+        user_id = request.user.pk
+        auth_services.delete_account(request.user)
+        logger.log(level=logging.INFO, msg="User deleted", extra={"user_id": user_id})
         logout(request)
         return redirect("landing")
     else:
+        # the cached user's counters may lag, this page is where they're shown
+        request.user.refresh_from_db(
+            fields=["total_meetings", "total_participants", "total_responses"]
+        )
         return render(
             request=request,
             template_name="account.html",
             context={"account_deletion_failed": False},
         )
+
+
+@require_http_methods(["GET"])
+def metrics(request: HttpRequest) -> HttpResponse:
+    """
+    Prometheus scrape endpoint, only served to `INSTRUMENTATION["METRICS_ALLOWED_IPS"]`.
+    Metrics are per process, each worker must be scraped (or run a single one).
+    """
+    allowed_ips: list[str] | None = settings.INSTRUMENTATION["METRICS_ALLOWED_IPS"]
+    if allowed_ips is not None and request.META.get("REMOTE_ADDR") not in allowed_ips:
+        raise Http404()
+    return HttpResponse(
+        app_metrics.exposition(), content_type="text/plain; version=0.0.4"
+    )